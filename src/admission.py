@@ -0,0 +1,180 @@
+"""
+API 서버 admission control
+- 스레드(thread_id)별 직렬화: 같은 스레드의 요청은 한 번에 하나만 실행 (체크포인트 쓰기가 섞이지 않게)
+  같은 스레드에서 이미 기다리는 요청이 MAX_THREAD_WAITERS개면 바로 429
+- 전역 동시 실행 수 제한 + 대기열 길이 제한: 대기열이 꽉 찼거나 QUEUE_TIMEOUT 안에 자리가 안 나면 503
+- 대기열은 우선순위 순 (인터럽트 재개 요청 → 새 질문 → 배치 항목)
+- 거절 응답에는 최근 처리 시간으로 추정한 Retry-After를 같이 준다
+
+엔드포인트가 동기 함수라 대기 중인 요청도 스레드풀 스레드를 차지한다.
+MAX_CONCURRENCY + MAX_QUEUE가 스레드풀 크기(기본 40)를 넘지 않게 설정해야 /health, /metrics가 막히지 않는다.
+"""
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from typing import Any, Dict, List, Set, Tuple
+
+from src.observability import ADMISSION_REJECTED, ADMISSION_WAIT
+
+MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", "8"))
+MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", "24"))
+QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "5"))
+MAX_THREAD_WAITERS = int(os.getenv("ADMISSION_MAX_THREAD_WAITERS", "1"))
+
+# 숫자가 작을수록 먼저
+PRIORITY_RESUME = 0
+PRIORITY_CHAT = 1
+PRIORITY_BATCH = 2
+PRIORITY_NAMES = {PRIORITY_RESUME: "resume", PRIORITY_CHAT: "chat", PRIORITY_BATCH: "batch"}
+
+# 처리 시간 이동평균 가중치 (Retry-After 추정용)
+SERVICE_TIME_ALPHA = 0.2
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, status_code: int, reason: str, message: str, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code
+        self.reason = reason
+        self.message = message
+        self.retry_after = retry_after
+
+
+class Ticket:
+    """입장한 요청의 자리. release()는 여러 번 불러도 한 번만 반납된다"""
+
+    def __init__(self, controller: "AdmissionController", thread_id: str):
+        self._controller = controller
+        self.thread_id = thread_id
+        self.started = time.monotonic()
+        self._released = False
+        self._lock = threading.Lock()
+
+    def release(self):
+        with self._lock:
+            if self._released:
+                return
+            self._released = True
+        self._controller._release(self)
+
+
+class AdmissionController:
+    def __init__(
+        self,
+        max_concurrency: int = MAX_CONCURRENCY,
+        max_queue: int = MAX_QUEUE,
+        queue_timeout: float = QUEUE_TIMEOUT,
+        max_thread_waiters: int = MAX_THREAD_WAITERS,
+    ):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.max_thread_waiters = max_thread_waiters
+        self._cond = threading.Condition()
+        self._active = 0
+        self._queue: List[Tuple[int, int]] = []  # (priority, 순번) 힙
+        self._seq = itertools.count()
+        self._running_threads: Set[str] = set()
+        self._thread_waiters: Dict[str, int] = {}
+        self._avg_service_time = 1.0
+
+    def _retry_after(self) -> int:
+        # 지금 대기열이 빠지는 데 걸릴 대략적인 시간
+        waves = (len(self._queue) + 1) / max(1, self.max_concurrency)
+        return max(1, math.ceil(self._avg_service_time * waves))
+
+    def _reject(self, status_code: int, reason: str, message: str) -> AdmissionRejected:
+        ADMISSION_REJECTED.inc(reason=reason)
+        return AdmissionRejected(status_code, reason, message, self._retry_after())
+
+    def acquire(self, thread_id: str, priority: int = PRIORITY_CHAT) -> Ticket:
+        """
+        자리가 날 때까지 최대 queue_timeout 동안 기다린 뒤 Ticket 반환, 안 되면 AdmissionRejected
+        - 스레드 자리를 먼저 잡고 전역 자리를 잡는다 (같은 스레드를 기다리는 동안 전역 자리를 차지하지 않게)
+        """
+        start = time.monotonic()
+        deadline = start + self.queue_timeout
+        with self._cond:
+            self._wait_for_thread(thread_id, deadline)
+            try:
+                self._wait_for_slot(priority, deadline)
+            except AdmissionRejected:
+                self._running_threads.discard(thread_id)
+                self._cond.notify_all()
+                raise
+            self._active += 1
+        ADMISSION_WAIT.observe(time.monotonic() - start, priority=PRIORITY_NAMES.get(priority, str(priority)))
+        return Ticket(self, thread_id)
+
+    def _wait_for_thread(self, thread_id: str, deadline: float):
+        if thread_id not in self._running_threads:
+            self._running_threads.add(thread_id)
+            return
+        waiters = self._thread_waiters.get(thread_id, 0)
+        if waiters >= self.max_thread_waiters:
+            raise self._reject(429, "thread_busy", f"Thread {thread_id} already has a request in progress.")
+        self._thread_waiters[thread_id] = waiters + 1
+        try:
+            while thread_id in self._running_threads:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise self._reject(429, "thread_busy", f"Thread {thread_id} already has a request in progress.")
+                self._cond.wait(left)
+            self._running_threads.add(thread_id)
+        finally:
+            self._thread_waiters[thread_id] -= 1
+            if not self._thread_waiters[thread_id]:
+                del self._thread_waiters[thread_id]
+
+    def _wait_for_slot(self, priority: int, deadline: float):
+        if self._active < self.max_concurrency and not self._queue:
+            return
+        if len(self._queue) >= self.max_queue:
+            raise self._reject(503, "queue_full", "Server is busy. Try again later.")
+        entry = (priority, next(self._seq))
+        heapq.heappush(self._queue, entry)
+        try:
+            # 대기열 맨 앞(우선순위가 가장 높고 가장 먼저 온 요청)만 빈 자리를 가져간다
+            while not (self._active < self.max_concurrency and self._queue[0] == entry):
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    raise self._reject(503, "queue_timeout", "Server is busy. Try again later.")
+                self._cond.wait(left)
+        finally:
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._cond.notify_all()
+
+    def _release(self, ticket: Ticket):
+        elapsed = time.monotonic() - ticket.started
+        with self._cond:
+            self._active -= 1
+            self._running_threads.discard(ticket.thread_id)
+            self._avg_service_time += SERVICE_TIME_ALPHA * (elapsed - self._avg_service_time)
+            self._cond.notify_all()
+
+    def acquire_with_retry(self, thread_id: str, priority: int = PRIORITY_BATCH, attempts: int = 5) -> Ticket:
+        """거절되면 Retry-After만큼 쉬었다가 다시 시도 (배치 항목처럼 기다려도 되는 요청용)"""
+        for attempt in range(attempts):
+            try:
+                return self.acquire(thread_id, priority)
+            except AdmissionRejected as e:
+                if attempt == attempts - 1:
+                    raise
+                time.sleep(e.retry_after)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "active": self._active,
+                "queued": len(self._queue),
+                "max_concurrency": self.max_concurrency,
+                "max_queue": self.max_queue,
+                "avg_service_seconds": round(self._avg_service_time, 3),
+            }
+
+
+admission = AdmissionController()
@@ -0,0 +1,149 @@
+"""
+여러 (thread_id, message)를 한 번에 돌리는 배치 채팅 (회귀 점검, 추천 미리 만들기 등)
+- 같은 에이전트(바인딩 캐시, 검색 캐시, 도구 single-flight)를 공유하면서 최대 concurrency개 스레드를 동시에 실행
+- 같은 thread_id의 항목은 입력 순서대로 이어서 실행 (여러 턴짜리 대화 스크립트)
+- 끝나는 대로 항목별 결과(응답, 지연시간, 토큰 사용량)를 하나씩 내보낸다
+
+실행 예:
+    python -m src.agent.batch --input prompts.jsonl --output results.jsonl --concurrency 8
+    (입력 한 줄: {"thread_id": "t1", "message": "오늘 비 오는데 국물 요리 추천해줘"})
+"""
+import argparse
+import json
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Generator, Iterable, List, Optional, Tuple
+
+from langchain_core.callbacks import UsageMetadataCallbackHandler
+from pydantic import BaseModel, Field
+
+DEFAULT_CONCURRENCY = 4
+
+
+class BatchItem(BaseModel):
+    thread_id: str
+    message: str
+    user_id: Optional[str] = None
+    # True면 message를 직전 인터럽트에 대한 답으로 보내 재개
+    resume: bool = False
+
+
+class BatchRequest(BaseModel):
+    items: List[BatchItem]
+    concurrency: int = Field(default=DEFAULT_CONCURRENCY, ge=1, le=32)
+    budget_seconds: Optional[float] = None
+
+
+def usage_summary(usage_by_model: Dict[str, Dict[str, Any]]) -> Dict[str, Any]:
+    """모델별 usage_metadata를 합쳐서 항목 하나의 토큰 사용량으로 정리"""
+    summary = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0, "cached_input_tokens": 0}
+    for usage in usage_by_model.values():
+        summary["input_tokens"] += usage.get("input_tokens", 0)
+        summary["output_tokens"] += usage.get("output_tokens", 0)
+        summary["total_tokens"] += usage.get("total_tokens", 0)
+        summary["cached_input_tokens"] += (usage.get("input_token_details") or {}).get("cache_read", 0)
+    summary["models"] = {model: usage.get("total_tokens", 0) for model, usage in usage_by_model.items()}
+    return summary
+
+
+def run_item(agent, index: int, item: BatchItem, budget: Optional[float] = None, admit: Optional[Callable[[str], Any]] = None) -> Dict[str, Any]:
+    record: Dict[str, Any] = {"index": index, "thread_id": item.thread_id, "message": item.message}
+    usage = UsageMetadataCallbackHandler()
+    queued = time.perf_counter()
+    ticket = None
+    try:
+        ticket = admit(item.thread_id) if admit else None
+        start = time.perf_counter()
+        record["wait_ms"] = round((start - queued) * 1000, 1)
+        run = agent.resume_chat if item.resume else agent.chat
+        response = run(item.message, thread_id=item.thread_id, budget=budget, user_id=item.user_id, callbacks=[usage])
+        record["response"] = response
+        record["interrupted"] = response.startswith("[INTERRUPT]")
+        record["latency_ms"] = round((time.perf_counter() - start) * 1000, 1)
+    except Exception as e:
+        record["error"] = str(e)
+    finally:
+        if ticket is not None:
+            ticket.release()
+    record["usage"] = usage_summary(usage.usage_metadata)
+    return record
+
+
+def _group_by_thread(items: Iterable[Any]) -> List[List[Tuple[int, BatchItem]]]:
+    groups: Dict[str, List[Tuple[int, BatchItem]]] = {}
+    for index, raw in enumerate(items):
+        item = raw if isinstance(raw, BatchItem) else BatchItem.model_validate(raw)
+        groups.setdefault(item.thread_id, []).append((index, item))
+    return list(groups.values())
+
+
+def run_batch(
+    agent,
+    items: Iterable[Any],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    budget: Optional[float] = None,
+    admit: Optional[Callable[[str], Any]] = None,
+) -> Generator[Dict[str, Any], None, None]:
+    """
+    항목별 결과를 끝나는 순서대로 yield ("index"로 입력 순서를 알 수 있다)
+    - admit: 항목 실행 직전에 thread_id로 호출, release()가 있는 자리를 반환 (서버 admission control 연동)
+    - 제너레이터를 중간에 닫으면 아직 시작하지 않은 항목은 실행하지 않는다
+    """
+    groups = _group_by_thread(items)
+    total = sum(len(group) for group in groups)
+    results: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    stop = threading.Event()
+
+    def run_group(group: List[Tuple[int, BatchItem]]):
+        for index, item in group:
+            if stop.is_set():
+                return
+            results.put(run_item(agent, index, item, budget, admit))
+
+    executor = ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="batch")
+    for group in groups:
+        executor.submit(run_group, group)
+    try:
+        for _ in range(total):
+            yield results.get()
+    finally:
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSONL 배치 채팅")
+    parser.add_argument("--input", required=True, help='한 줄에 {"thread_id", "message"[, "user_id", "resume"]}')
+    parser.add_argument("--output", default=None, help="결과 JSONL (없으면 표준 출력)")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    parser.add_argument("--budget", type=float, default=None, help="항목별 시간 예산 (초)")
+    args = parser.parse_args()
+
+    from src.agent.bot import make_agent
+
+    with open(args.input, "r", encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+
+    agent = make_agent()
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    failed = 0
+    tokens = 0
+    start = time.perf_counter()
+    try:
+        for record in agent.batch_chat(items, concurrency=args.concurrency, budget=args.budget):
+            failed += "error" in record
+            tokens += record["usage"]["total_tokens"]
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    elapsed = time.perf_counter() - start
+    print(f"{len(items)} items, {failed} failed, {tokens} tokens, {elapsed:.1f}s", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
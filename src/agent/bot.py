@@ -1,58 +1,171 @@
 import os
 import json
-from typing import TypedDict, Annotated, List, Literal, Generator, Dict, Any
+import threading
+from typing import TypedDict, Annotated, Callable, Iterable, List, Literal, Generator, Dict, Any, Optional
 from dotenv import load_dotenv
 
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, ToolMessage
+from langchain_core.messages import SystemMessage, HumanMessage, AIMessage, AIMessageChunk, ToolMessage
+from langchain_core.runnables import RunnableConfig
 from langgraph.graph import StateGraph, END
 from langgraph.graph.message import add_messages
 from langgraph.checkpoint.memory import MemorySaver
 from langgraph.types import interrupt, Command
 
 from src.agent.tool_registry import ToolRegistry, register_default_tools
+from src.agent.tool_selector import ToolSelector, latest_turn
+from src.agent.cascade import FAST_MODEL, MODEL_CASCADE, STRONG_MODEL, ModelCascade
+from src.agent.singleflight import SingleFlight
+from src.agent.batch import DEFAULT_CONCURRENCY, run_batch
 from src.agent.memory_extractor import extract_and_save_memory
+from src.tools.memory_tools import DEFAULT_USER_ID, load_profile_memories, profile_version
+from src.agent.deadline import (
+    FINAL_ANSWER_RESERVE, deadline_from_config, deadline_scope, is_exhausted, new_deadline, remaining,
+)
+from src.observability import COALESCED_CALLS, get_logger, log_event, observe_node
 
 load_dotenv()
 
+logger = get_logger("agent.bot")
+
+# 새 스레드의 첫 턴은 대화 기록이 없어서 같은 사용자/같은 질문이면 답도 같다 → 동시에 들어오면 한 번만 실행
+CHAT_COALESCING = os.getenv("CHAT_COALESCING", "1") == "1"
+
 
 # LangGraph의 상태를 정의한다
 class AgentState(TypedDict):
     messages: Annotated[List, add_messages]
     google_search_count: int
+    # 이번 턴에만 유효한 시스템 안내 (검색 계속/중단 등). 대화 기록 대신 프롬프트 맨 뒤에 붙는다
+    turn_notes: List[str]
+    # 스레드 시작 시 불러온 프로필 기억과 그때의 사용자/버전 (프로필 기억이 바뀌면 다시 불러온다)
+    profile_memories: List[str]
+    profile_user_id: str
+    profile_version: Optional[str]
+
+
+def user_id_from_config(config: Optional[RunnableConfig]) -> str:
+    return ((config or {}).get("configurable") or {}).get("user_id") or DEFAULT_USER_ID
+
+
+DEADLINE_NOTE = "[시스템] 응답 시간 예산이 거의 소진되었습니다. 도구를 더 호출하지 말고 지금까지의 정보로 바로 답변하세요."
 
 
 class LangGraphAgent:
-    def __init__(self, model: str = "gpt-4o-mini"):
-        self.registry = register_default_tools()
+    def __init__(
+        self,
+        model: str = "gpt-4o-mini",
+        llm=None,
+        registry: ToolRegistry = None,
+        extract_memory: bool = True,
+        profile_loader: Callable[[str], List[str]] = None,
+        profile_versioner: Callable[[str], str] = None,
+        fast_model: Optional[str] = None,
+        fast_llm=None,
+    ):
+        """
+        Args:
+            model: 사용할 OpenAI 모델 이름 (캐스케이드를 쓰면 strong 단계 모델)
+            llm: 직접 주입할 채팅 모델 (부하 테스트용 가짜 모델 등). 없으면 ChatOpenAI 사용
+            registry: 직접 주입할 도구 레지스트리. 없으면 기본 도구 등록
+            extract_memory: 대화 후 장기 기억 추출(OpenAI 호출) 여부
+            profile_loader: user_id를 받아 프로필 기억을 불러오는 함수. 없으면 memory_store에서 profile 타입 조회
+            profile_versioner: user_id를 받아 프로필 버전을 돌려주는 함수. 없으면 memory_store 메타데이터로 계산
+            fast_model: 도구 라우팅 단계에 먼저 쓸 싼 모델 이름 (없으면 캐스케이드 없이 model만 사용)
+            fast_llm: 직접 주입할 fast 단계 채팅 모델 (fast_model보다 우선)
+        """
+        self.registry = registry or register_default_tools()
         self.api_key = os.getenv("OPENAI_API_KEY")
-        self.llm = ChatOpenAI(model=model, api_key=self.api_key, temperature=0, streaming=True)
-        self.tools_schema = self.registry.list_openai_tools()
-        self.llm_with_tools = self.llm.bind_tools(self.tools_schema)
+        self.llm = llm or ChatOpenAI(model=model, api_key=self.api_key, temperature=0, streaming=True)
+        if fast_llm is None and fast_model:
+            # logprobs는 fast 답변의 확신도 검사(CASCADE_MIN_CONFIDENCE)에 쓴다
+            fast_llm = ChatOpenAI(model=fast_model, api_key=self.api_key, temperature=0, streaming=True, logprobs=True)
+        self.fast_llm = fast_llm
+        self.extract_memory = extract_memory
+        self.profile_loader = profile_loader or load_profile_memories
+        self.profile_versioner = profile_versioner or profile_version
+        # 턴마다 관련 도구만 골라 바인딩 (조합별 바인딩 결과는 캐시)
+        self.tool_selector = ToolSelector(self.registry)
+        # fast 모델이 있으면 fast → (필요할 때만) strong 순서로 호출
+        self.cascade = ModelCascade(self.llm, self.registry, fast_llm=self.fast_llm)
+        self.first_turns = SingleFlight()
 
         self.system_prompt = """
         당신은 사용자의 상황과 기분에 맞춰 요리를 추천해주는 AI 셰프봇입니다.
-        - 사용자의 취향이나 알레르기 정보를 기억(read_memory)하고 활용하세요.
+        - 사용자의 취향/알레르기 등 프로필은 [사용자 프로필]로 이미 제공됩니다. 프로필에 없는 과거 대화나 기억이 필요할 때만 read_memory를 사용하세요.
+        - 레시피/지식 검색은 여러 질문을 queries 리스트로 묶어 한 번의 호출로 검색하세요. 같은 도구를 표현만 바꿔 여러 번 호출하지 마세요.
         - RAG(레시피/지식 검색)에 정보가 없거나, 재료 대체법 등 모르는 내용이 있으면 '구글 검색' 툴을 적극적으로 사용하세요.
         - 항상 친절하고 구체적으로 답변하세요.
         """
         
         self.graph = self._build_graph()
 
-    def call_model(self, state: AgentState):
-        messages = state["messages"]
-        
-        # 시스템 프롬프트 추가
-        if not messages or not isinstance(messages[0], SystemMessage):
-            messages = [SystemMessage(content=self.system_prompt)] + messages
-            
-        response = self.llm_with_tools.invoke(messages)
+    def _prompt_prefix(self, profile: List[str]) -> List[SystemMessage]:
+        # 매 호출마다 바이트 단위로 같은 정적 접두부 (프로바이더 프롬프트 캐시 대상)
+        # 프로필은 새 프로필 기억이 저장될 때만 바뀌므로 접두부에 고정
+        prefix = [SystemMessage(content=self.system_prompt)]
+        if profile:
+            prefix.append(SystemMessage(content="[사용자 프로필]\n" + "\n".join(f"- {p}" for p in profile)))
+        return prefix
+
+    def load_profile(self, state: AgentState, config: RunnableConfig):
+        """
+        턴 시작 노드: 스레드에 프로필이 없거나 그 사이 프로필 기억이 바뀌었을 때만 다시 불러온다
+        - 매 턴 read_memory 왕복(LLM 1회 + 임베딩 1회) 대신 메타데이터로 만든 버전 비교만 한다
+        """
+        user_id = user_id_from_config(config)
+        try:
+            version = self.profile_versioner(user_id)
+        except Exception as e:
+            # 버전을 못 읽으면 캐시된 프로필을 믿지 않고 다시 불러온다
+            log_event(logger, "profile_version_error", user_id=user_id, error=str(e))
+            version = None
+        if (
+            version is not None
+            and state.get("profile_user_id") == user_id
+            and state.get("profile_version") == version
+            and state.get("profile_memories") is not None
+        ):
+            return {}
+        try:
+            profile = self.profile_loader(user_id)
+        except Exception as e:
+            log_event(logger, "profile_load_error", user_id=user_id, error=str(e))
+            profile = []
+        return {"profile_memories": profile, "profile_user_id": user_id, "profile_version": version}
+
+    def build_messages(self, state: AgentState, notes: List[str]) -> List[Any]:
+        """
+        [정적 접두부] + [대화 기록] + [이번 턴 안내] 순서로 프롬프트 구성
+        - 대화 기록 중간에는 SystemMessage를 넣지 않는다 (예전 스레드에 남은 것도 제외)
+        """
+        history = [m for m in state["messages"] if not isinstance(m, SystemMessage)]
+        tail = [SystemMessage(content="\n".join(notes))] if notes else []
+        return self._prompt_prefix(state.get("profile_memories") or []) + history + tail
+
+    def call_model(self, state: AgentState, config: RunnableConfig):
+        deadline = deadline_from_config(config)
+        notes = list(state.get("turn_notes") or [])
+
+        user_text, used_tools = latest_turn(state["messages"])
+        tool_names = self.tool_selector.select(user_text, used_tools)
+
+        # 남은 예산이 최종 답변 한 번 분량밖에 없으면 도구 라운드를 건너뛰고 답변을 강제
+        final = is_exhausted(deadline, FINAL_ANSWER_RESERVE)
+        if final:
+            notes.append(DEADLINE_NOTE)
+        messages = self.build_messages(state, notes)
+
+        response = self.cascade.invoke(tool_names, messages, deadline, final=final)
         
         return {"messages": [response]}
 
-    def run_tools(self, state: AgentState):
+    def run_tools(self, state: AgentState, config: RunnableConfig):
         last_message = state["messages"][-1]
         tool_calls = last_message.tool_calls
+        deadline = deadline_from_config(config)
+        # 메모리 도구의 user_id는 LLM이 아니라 스레드 설정에서 채운다
+        injected = {"user_id": user_id_from_config(config)}
         
         results = []
         for tool_call in tool_calls:
@@ -60,10 +173,16 @@ class LangGraphAgent:
             tool_args = tool_call["args"]
             tool_id = tool_call["id"]
             
-            try:
-                tool_output = self.registry.call(tool_name, tool_args)
-            except Exception as e:
-                tool_output = f"Error: {str(e)}"
+            # 예산이 이미 소진되었으면 남은 도구는 실행하지 않는다 (tool_call_id 짝은 맞춰서 응답)
+            if is_exhausted(deadline):
+                tool_output = {"error": "Request deadline exceeded. Tool skipped."}
+            else:
+                try:
+                    # 도구 내부의 HTTP 타임아웃이 남은 예산을 볼 수 있도록 컨텍스트 설정
+                    with deadline_scope(deadline):
+                        tool_output = self.registry.call(tool_name, tool_args, injected=injected)
+                except Exception as e:
+                    tool_output = f"Error: {str(e)}"
 
             content = json.dumps(tool_output, ensure_ascii=False)
 
@@ -85,12 +204,16 @@ class LangGraphAgent:
             return "tools"
         return END
     
-    def check_interrupt(self, state: AgentState):
+    def check_interrupt(self, state: AgentState, config: RunnableConfig):
         """
         인터럽트 체크 노드
         - 검색 횟수가 3회를 초과하면 interrupt() 호출
+        - 응답 예산이 소진된 상태라면 사용자에게 묻지 않고 바로 최종 답변 단계로 넘어간다
         """
         current_count = state.get("google_search_count", 0)
+
+        if is_exhausted(deadline_from_config(config), FINAL_ANSWER_RESERVE):
+            return {"messages": []}
         
         # 검색 횟수가 3회를 초과하면 interrupt 발생
         if current_count > 3:
@@ -106,16 +229,13 @@ class LangGraphAgent:
             if user_input:
                 user_response = str(user_input).strip().lower()
                 
+                notes = list(state.get("turn_notes") or [])
                 # 사용자가 계속 진행을 선택한 경우
                 if user_response in ["continue", "yes", "네", "계속", "y", "ㅇㅇ", "응", "ok"]:
-                    return {"messages": [SystemMessage(
-                        content="[시스템] 사용자가 검색 계속 진행을 승인했습니다."
-                    )]}
+                    return {"turn_notes": notes + ["[시스템] 사용자가 검색 계속 진행을 승인했습니다."]}
                 else:
                     # 중단을 선택한 경우
-                    return {"messages": [SystemMessage(
-                        content="[시스템] 사용자가 검색 중단을 선택했습니다. 현재 정보로만 답변하세요."
-                    )]}
+                    return {"turn_notes": notes + ["[시스템] 사용자가 검색 중단을 선택했습니다. 현재 정보로만 답변하세요."]}
         
         # 정상 진행
         return {"messages": []}
@@ -124,11 +244,13 @@ class LangGraphAgent:
         workflow = StateGraph(AgentState)
 
         # 노드 추가
-        workflow.add_node("agent", self.call_model)
-        workflow.add_node("tools", self.run_tools)
-        workflow.add_node("check_interrupt", self.check_interrupt)
+        workflow.add_node("load_profile", observe_node("load_profile", self.load_profile))
+        workflow.add_node("agent", observe_node("call_model", self.call_model))
+        workflow.add_node("tools", observe_node("run_tools", self.run_tools))
+        workflow.add_node("check_interrupt", observe_node("check_interrupt", self.check_interrupt))
 
-        workflow.set_entry_point("agent")
+        workflow.set_entry_point("load_profile")
+        workflow.add_edge("load_profile", "agent")
         
         # agent → tools 또는 END
         workflow.add_conditional_edges(
@@ -150,17 +272,29 @@ class LangGraphAgent:
         
         return workflow.compile(checkpointer=memory)
 
-    def chat(self, user_text: str, thread_id: str = "default_thread") -> str:
+    def _config(self, thread_id: str, budget: Optional[float] = None, user_id: Optional[str] = None, callbacks: Optional[List[Any]] = None) -> Dict[str, Any]:
+        # 요청마다 새 마감시간을 잡아 그래프 전체(노드/도구/LLM 타임아웃)에 전달
+        config: Dict[str, Any] = {"configurable": {
+            "thread_id": thread_id,
+            "user_id": user_id or DEFAULT_USER_ID,
+            "deadline": new_deadline(budget),
+        }}
+        # 요청 단위로 LLM 호출을 관찰할 콜백 (예: batch_chat의 토큰 사용량 집계)
+        if callbacks:
+            config["callbacks"] = callbacks
+        return config
+
+    def chat(self, user_text: str, thread_id: str = "default_thread", budget: Optional[float] = None, user_id: Optional[str] = None, callbacks: Optional[List[Any]] = None) -> str:
         """
         일반 채팅 메서드
         
         Returns:
             str: AI의 응답 또는 interrupt 정보
         """
-        config = {"configurable": {"thread_id": thread_id}}
+        config = self._config(thread_id, budget, user_id, callbacks)
         
         result = self.graph.invoke(
-            {"messages": [HumanMessage(content=user_text)]},
+            {"messages": [HumanMessage(content=user_text)], "turn_notes": []},
             config
         )
         
@@ -176,23 +310,72 @@ class LangGraphAgent:
             if isinstance(last_msg, AIMessage):
                 final_response = last_msg.content
         
-        if final_response:
-            extract_and_save_memory(user_text, final_response)
+        if final_response and self.extract_memory:
+            extract_and_save_memory(user_text, final_response, user_id=config["configurable"]["user_id"])
         
         return final_response
     
-    def resume_chat(self, user_response: str, thread_id: str = "default_thread") -> str:
+    def chat_coalesced(self, user_text: str, thread_id: str = "default_thread", budget: Optional[float] = None, user_id: Optional[str] = None) -> str:
+        """
+        chat과 같지만, 새 스레드의 첫 턴이면 같은 사용자/같은 질문으로 실행 중인 요청의 결과를 같이 받는다
+        - 공유받은 답은 이 스레드의 대화 기록으로 넣어서 다음 턴이 자연스럽게 이어진다
+        - 인터럽트는 실행한 스레드에만 걸려 있으므로, 공유받은 결과가 인터럽트면 직접 다시 실행한다
+        """
+        config = self._config(thread_id, budget, user_id)
+        # 이미 대화가 있는 스레드는 기록에 따라 답이 달라지므로 합치지 않는다
+        if not CHAT_COALESCING or self.graph.get_state(config).values:
+            return self.chat(user_text, thread_id=thread_id, budget=budget, user_id=user_id)
+
+        key = (config["configurable"]["user_id"], " ".join(user_text.split()))
+        answer, shared = self.first_turns.do(
+            key,
+            lambda: self.chat(user_text, thread_id=thread_id, budget=budget, user_id=user_id),
+            remaining(deadline_from_config(config)),
+        )
+        if not shared:
+            return answer
+        if not answer or answer.startswith("[INTERRUPT]"):
+            return self.chat(user_text, thread_id=thread_id, budget=budget, user_id=user_id)
+
+        self.graph.update_state(
+            config,
+            {"messages": [HumanMessage(content=user_text), AIMessage(content=answer)]},
+            as_node="agent",
+        )
+        COALESCED_CALLS.inc(scope="chat", name="first_turn")
+        log_event(logger, "chat_coalesced", thread_id=thread_id)
+        return answer
+    
+    def batch_chat(
+        self,
+        items: Iterable[Any],
+        concurrency: int = DEFAULT_CONCURRENCY,
+        budget: Optional[float] = None,
+        admit: Optional[Callable[[str], Any]] = None,
+    ) -> Generator[Dict[str, Any], None, None]:
+        """
+        여러 (thread_id, message) 항목을 최대 concurrency개씩 동시에 실행하고 끝나는 대로 결과를 반환
+        - items: BatchItem 또는 {"thread_id", "message", "user_id"?, "resume"?} dict
+        - 같은 thread_id의 항목은 순서대로 이어서 실행
+        - 결과: {"index", "thread_id", "message", "response", "interrupted", "latency_ms", "wait_ms", "usage"} (실패 시 "error")
+        """
+        yield from run_batch(self, items, concurrency=concurrency, budget=budget, admit=admit)
+    
+    def resume_chat(self, user_response: str, thread_id: str = "default_thread", budget: Optional[float] = None, user_id: Optional[str] = None, callbacks: Optional[List[Any]] = None) -> str:
         """
         인터럽트 후 재개 메서드
         
         Args:
             user_response: 사용자의 응답 (continue 또는 stop)
             thread_id: 스레드 ID
+            budget: 요청 전체 시간 예산 (초). 없으면 REQUEST_BUDGET_SECONDS
+            user_id: 장기 기억을 나눠 저장/조회할 사용자 ID. 없으면 DEFAULT_USER_ID
+            callbacks: LLM 호출을 관찰할 콜백 (선택)
             
         Returns:
             str: AI의 최종 응답
         """
-        config = {"configurable": {"thread_id": thread_id}}
+        config = self._config(thread_id, budget, user_id, callbacks)
         
         # Command(resume=...)로 재개
         result = self.graph.invoke(
@@ -214,79 +397,94 @@ class LangGraphAgent:
         
         return final_response
     
-    def chat_stream(self, user_text: str, thread_id: str = "default_thread") -> Generator[Dict[str, Any], None, None]:
+    def _stream_events(
+        self,
+        graph_input: Any,
+        config: Dict[str, Any],
+        outcome: Dict[str, Any],
+        cancel: Optional[threading.Event] = None,
+    ) -> Generator[Dict[str, Any], None, None]:
         """
-        스트리밍 버전
-        
-        Yields:
-            dict: 각 노드의 실행 결과
+        그래프를 messages + updates 모드로 실행하면서 UI용 이벤트로 변환
+        - messages: call_model의 LLM 토큰 조각 → {"type": "token", "content": 이번에 추가된 텍스트}
+        - updates: 노드 결과 → tool_call / tool_result / ai_message(완성된 답변) / system_message / interrupt / search_count
+        - outcome에 final_response / interrupted / cancelled를 기록 (호출한 쪽에서 메모리 저장 여부 판단)
+        - cancel이 설정되면 (예: SSE 클라이언트 연결 끊김) 그래프 스트림을 닫아서 다음 노드/LLM 호출을 하지 않는다
         """
-        config = {"configurable": {"thread_id": thread_id}}
-        
-        final_response = ""
-        interrupted = False
-        
-        for event in self.graph.stream(
-            {"messages": [HumanMessage(content=user_text)]},
-            config,
-            stream_mode="updates"
-        ):
-            for node_name, update_value in event.items():
-                
-                # interrupt 체크
-                if "__interrupt__" in update_value:
-                    interrupted = True
-                    interrupt_info = update_value["__interrupt__"][0].value
+        stream = self.graph.stream(graph_input, config, stream_mode=["messages", "updates"])
+        try:
+            yield from self._convert_stream(stream, outcome, cancel)
+        finally:
+            stream.close()
+
+    def _convert_stream(self, stream, outcome: Dict[str, Any], cancel: Optional[threading.Event]) -> Generator[Dict[str, Any], None, None]:
+        for mode, payload in stream:
+            if cancel is not None and cancel.is_set():
+                outcome["cancelled"] = True
+                return
+
+            if mode == "messages":
+                chunk, metadata = payload
+                if metadata.get("langgraph_node") == "agent" and isinstance(chunk, AIMessageChunk) and chunk.content:
+                    yield {"node": "agent", "type": "token", "content": chunk.content}
+                continue
+
+            for node_name, update_value in payload.items():
+
+                # interrupt 체크 (updates 모드에서는 "__interrupt__" 키로 Interrupt 튜플이 온다)
+                if node_name == "__interrupt__":
+                    outcome["interrupted"] = True
                     yield {
                         "node": node_name,
                         "type": "interrupt",
-                        "content": interrupt_info
+                        "content": update_value[0].value
                     }
                     continue
+
+                # 아무것도 바꾸지 않은 노드 (예: 프로필이 이미 최신인 load_profile)
+                if not isinstance(update_value, dict):
+                    continue
                 
-                if "messages" in update_value:
-                    messages = update_value["messages"]
-                    
-                    for msg in messages:
-                        # AIMessage 처리
-                        if isinstance(msg, AIMessage):
-                            if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                                for tool_call in msg.tool_calls:
-                                    yield {
-                                        "node": node_name,
-                                        "type": "tool_call",
-                                        "tool_name": tool_call["name"],
-                                        "tool_args": tool_call["args"]
-                                    }
-                            elif msg.content:
+                for msg in update_value.get("messages", []):
+                    # AIMessage 처리
+                    if isinstance(msg, AIMessage):
+                        if hasattr(msg, 'tool_calls') and msg.tool_calls:
+                            for tool_call in msg.tool_calls:
                                 yield {
                                     "node": node_name,
-                                    "type": "ai_message",
-                                    "content": msg.content
+                                    "type": "tool_call",
+                                    "tool_name": tool_call["name"],
+                                    "tool_args": tool_call["args"]
                                 }
-                                final_response = msg.content
-                        
-                        # ToolMessage 처리
-                        elif isinstance(msg, ToolMessage):
-                            try:
-                                tool_result = json.loads(msg.content)
-                            except:
-                                tool_result = msg.content
-                            
-                            yield {
-                                "node": node_name,
-                                "type": "tool_result",
-                                "tool_name": msg.name,
-                                "result": tool_result
-                            }
-                        
-                        # SystemMessage 처리
-                        elif isinstance(msg, SystemMessage):
+                        elif msg.content:
                             yield {
                                 "node": node_name,
-                                "type": "system_message",
+                                "type": "ai_message",
                                 "content": msg.content
                             }
+                            outcome["final_response"] = msg.content
+                    
+                    # ToolMessage 처리
+                    elif isinstance(msg, ToolMessage):
+                        try:
+                            tool_result = json.loads(msg.content)
+                        except:
+                            tool_result = msg.content
+                        
+                        yield {
+                            "node": node_name,
+                            "type": "tool_result",
+                            "tool_name": msg.name,
+                            "result": tool_result
+                        }
+
+                # 이번 턴 안내 (검색 계속/중단)
+                if update_value.get("turn_notes"):
+                    yield {
+                        "node": node_name,
+                        "type": "system_message",
+                        "content": update_value["turn_notes"][-1]
+                    }
                 
                 # google_search_count 업데이트
                 if "google_search_count" in update_value:
@@ -295,81 +493,71 @@ class LangGraphAgent:
                         "type": "search_count",
                         "count": update_value["google_search_count"]
                     }
+
+    def chat_stream(
+        self,
+        user_text: str,
+        thread_id: str = "default_thread",
+        budget: Optional[float] = None,
+        user_id: Optional[str] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Generator[Dict[str, Any], None, None]:
+        """
+        스트리밍 버전
+        
+        Args:
+            cancel: 설정되면 다음 이벤트에서 스트림을 중단 (메모리 저장도 하지 않음)
+
+        Yields:
+            dict: 각 노드의 실행 결과와 답변 토큰 조각
+        """
+        config = self._config(thread_id, budget, user_id)
+        outcome: Dict[str, Any] = {"final_response": "", "interrupted": False, "cancelled": False}
+
+        yield from self._stream_events(
+            {"messages": [HumanMessage(content=user_text)], "turn_notes": []},
+            config,
+            outcome,
+            cancel,
+        )
         
-        # interrupt가 아닌 경우에만 메모리 저장
-        if final_response and not interrupted:
-            extract_and_save_memory(user_text, final_response)
+        # interrupt/취소가 아닌 경우에만 메모리 저장
+        if outcome["final_response"] and not outcome["interrupted"] and not outcome["cancelled"] and self.extract_memory:
+            extract_and_save_memory(user_text, outcome["final_response"], user_id=config["configurable"]["user_id"])
     
-    def stream_resume(self, user_response: str, thread_id: str = "default_thread") -> Generator[Dict[str, Any], None, None]:
+    def stream_resume(
+        self,
+        user_response: str,
+        thread_id: str = "default_thread",
+        budget: Optional[float] = None,
+        user_id: Optional[str] = None,
+        cancel: Optional[threading.Event] = None,
+    ) -> Generator[Dict[str, Any], None, None]:
         """
         인터럽트 후 재개 스트리밍
         
         Args:
             user_response: 사용자의 응답
             thread_id: 스레드 ID
+            budget: 요청 전체 시간 예산 (초). 없으면 REQUEST_BUDGET_SECONDS
+            user_id: 장기 기억을 나눠 저장/조회할 사용자 ID. 없으면 DEFAULT_USER_ID
+            cancel: 설정되면 다음 이벤트에서 스트림을 중단
             
         Yields:
-            dict: 각 노드의 실행 결과
+            dict: 각 노드의 실행 결과와 답변 토큰 조각
         """
-        config = {"configurable": {"thread_id": thread_id}}
-        
-        for event in self.graph.stream(
-            Command(resume=user_response),
-            config,
-            stream_mode="updates"
-        ):
-            for node_name, update_value in event.items():
-                
-                # interrupt 체크
-                if "__interrupt__" in update_value:
-                    interrupt_info = update_value["__interrupt__"][0].value
-                    yield {
-                        "node": node_name,
-                        "type": "interrupt",
-                        "content": interrupt_info
-                    }
-                    continue
-                
-                if "messages" in update_value:
-                    messages = update_value["messages"]
-                    
-                    for msg in messages:
-                        if isinstance(msg, AIMessage):
-                            if hasattr(msg, 'tool_calls') and msg.tool_calls:
-                                for tool_call in msg.tool_calls:
-                                    yield {
-                                        "node": node_name,
-                                        "type": "tool_call",
-                                        "tool_name": tool_call["name"],
-                                        "tool_args": tool_call["args"]
-                                    }
-                            elif msg.content:
-                                yield {
-                                    "node": node_name,
-                                    "type": "ai_message",
-                                    "content": msg.content
-                                }
-                        
-                        elif isinstance(msg, ToolMessage):
-                            try:
-                                tool_result = json.loads(msg.content)
-                            except:
-                                tool_result = msg.content
-                            
-                            yield {
-                                "node": node_name,
-                                "type": "tool_result",
-                                "tool_name": msg.name,
-                                "result": tool_result
-                            }
-                        
-                        elif isinstance(msg, SystemMessage):
-                            yield {
-                                "node": node_name,
-                                "type": "system_message",
-                                "content": msg.content
-                            }
+        config = self._config(thread_id, budget, user_id)
+        outcome: Dict[str, Any] = {"final_response": "", "interrupted": False, "cancelled": False}
+
+        yield from self._stream_events(Command(resume=user_response), config, outcome, cancel)
 
 
 def make_agent(model: str = "gpt-4o-mini") -> LangGraphAgent:
+    # AGENT_LLM_BACKEND=stub 이면 OpenAI 없이 가짜 LLM + 스텁 도구로 구성 (부하 테스트용)
+    if os.getenv("AGENT_LLM_BACKEND", "openai") == "stub":
+        from src.benchmark.stubs import make_stub_agent
+        return make_stub_agent()
+    # MODEL_CASCADE=1 이면 라우팅 단계는 AGENT_FAST_MODEL, 도구 결과 종합과 에스컬레이션은 AGENT_STRONG_MODEL
+    if MODEL_CASCADE:
+        return LangGraphAgent(model=STRONG_MODEL, fast_model=FAST_MODEL)
     return LangGraphAgent(model=model)
\ No newline at end of file
@@ -0,0 +1,124 @@
+"""
+모델 캐스케이드: call_model의 라우팅 단계는 싼/빠른 모델(fast)로 먼저 처리하고, 필요할 때만 강한 모델(strong)로 올린다
+- 도구 결과를 종합하는 단계(마지막 메시지가 ToolMessage)와 예산이 소진되어 바로 답해야 하는 경우(final)는
+  fast를 건너뛰고 strong 한 번만 호출
+- 그 외 단계(도구 라우팅, 도구 없이 끝나는 턴)는 fast 결과를 검사해서 통과하면 그대로 사용
+  - tool_calls: 도구 이름/인자가 입력 스키마 검증을 통과해야 한다
+  - 답변: 비어 있거나 길이 초과로 잘리지 않았고, logprobs가 있으면 평균 토큰 확률이 CASCADE_MIN_CONFIDENCE 이상
+- 검사에 실패하면 strong으로 다시 호출
+
+fast 단계는 토큰 스트리밍에서 제외한다(nostream). 버려질 수도 있는 답변이 화면에 먼저 찍히지 않게 하기 위함이고,
+fast로 확정된 답변도 updates의 ai_message로는 그대로 전달된다.
+"""
+import math
+import os
+import time
+from typing import Any, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langgraph.constants import TAG_NOSTREAM
+from pydantic import ValidationError
+
+from src.agent.deadline import FINAL_ANSWER_RESERVE, MIN_TIMEOUT, is_exhausted, remaining
+from src.agent.tool_registry import ToolRegistry
+from src.agent.tool_selector import BoundModelCache
+from src.observability import CASCADE_ESCALATIONS, get_logger, log_event, record_llm_usage, record_tier_usage
+
+logger = get_logger("agent.cascade")
+
+MODEL_CASCADE = os.getenv("MODEL_CASCADE", "0") == "1"
+FAST_MODEL = os.getenv("AGENT_FAST_MODEL", "gpt-4o-mini")
+STRONG_MODEL = os.getenv("AGENT_STRONG_MODEL", "gpt-4o")
+# fast 답변의 평균 토큰 확률(logprobs의 기하평균)이 이보다 낮으면 strong으로 올린다 (logprobs가 없으면 검사하지 않음)
+CASCADE_MIN_CONFIDENCE = float(os.getenv("CASCADE_MIN_CONFIDENCE", "0.6"))
+
+FAST = "fast"
+STRONG = "strong"
+
+
+def needs_synthesis(messages: List[Any]) -> bool:
+    # 직전 단계가 도구 실행이면 이번 호출은 도구 결과를 종합하는 단계
+    return bool(messages) and isinstance(messages[-1], ToolMessage)
+
+
+def answer_confidence(response: AIMessage) -> Optional[float]:
+    """logprobs가 있으면 답변 토큰 확률의 기하평균, 없으면 None"""
+    logprobs = (response.response_metadata or {}).get("logprobs") or {}
+    tokens = logprobs.get("content") if isinstance(logprobs, dict) else None
+    values = [token["logprob"] for token in tokens or [] if token.get("logprob") is not None]
+    if not values:
+        return None
+    return math.exp(sum(values) / len(values))
+
+
+def check_tool_calls(response: AIMessage, registry: ToolRegistry) -> Optional[str]:
+    # 파싱에 실패한 호출, 등록되지 않은 도구, 입력 스키마에 맞지 않는 인자는 모두 실패
+    if getattr(response, "invalid_tool_calls", None):
+        return "invalid_args"
+    names = registry.tool_names()
+    for call in response.tool_calls:
+        if call["name"] not in names:
+            return "unknown_tool"
+        try:
+            registry.get(call["name"]).input_model.model_validate(call["args"])
+        except ValidationError:
+            return "invalid_args"
+    return None
+
+
+def escalation_reason(response: AIMessage, registry: ToolRegistry) -> Optional[str]:
+    """fast 응답을 strong으로 다시 처리해야 하는 이유 (None이면 그대로 사용)"""
+    if response.tool_calls or getattr(response, "invalid_tool_calls", None):
+        return check_tool_calls(response, registry)
+    if not str(response.content).strip():
+        return "empty"
+    if (response.response_metadata or {}).get("finish_reason") == "length":
+        return "truncated"
+    confidence = answer_confidence(response)
+    if confidence is not None and confidence < CASCADE_MIN_CONFIDENCE:
+        return "low_confidence"
+    return None
+
+
+class ModelCascade:
+    def __init__(self, strong_llm, registry: ToolRegistry, fast_llm=None):
+        """
+        Args:
+            strong_llm: 최종 답변/에스컬레이션용 모델 (캐스케이드를 쓰지 않으면 이 모델만 사용)
+            registry: 도구 스키마 바인딩과 tool_calls 검증에 쓰는 레지스트리
+            fast_llm: 라우팅/짧은 턴용 모델. 없으면 캐스케이드 없이 strong만 호출
+        """
+        self.registry = registry
+        self.strong = BoundModelCache(strong_llm, registry)
+        self.fast = BoundModelCache(fast_llm, registry) if fast_llm is not None else None
+
+    @property
+    def enabled(self) -> bool:
+        return self.fast is not None
+
+    def _call(self, tier: str, llm, messages: List[Any], deadline: Optional[float], tool_names: Tuple[str, ...] = ()) -> AIMessage:
+        # LLM 타임아웃도 남은 예산을 넘지 않도록 설정
+        left = remaining(deadline)
+        if left is not None:
+            llm = llm.bind(timeout=max(MIN_TIMEOUT, left))
+        if tier == FAST:
+            llm = llm.with_config(tags=[TAG_NOSTREAM])
+        start = time.perf_counter()
+        response = llm.invoke(messages)
+        record_llm_usage(response, tool_set=",".join(tool_names))
+        record_tier_usage(tier, response, time.perf_counter() - start)
+        return response
+
+    def invoke(self, tool_names: Tuple[str, ...], messages: List[Any], deadline: Optional[float], final: bool = False) -> AIMessage:
+        if self.fast is not None and not final and not needs_synthesis(messages):
+            response = self._call(FAST, self.fast.get(tool_names), messages, deadline, tool_names)
+            reason = escalation_reason(response, self.registry)
+            if reason is None:
+                return response
+            # strong을 한 번 더 부를 시간이 없으면 fast 결과로 마무리
+            if is_exhausted(deadline, FINAL_ANSWER_RESERVE):
+                CASCADE_ESCALATIONS.inc(reason=reason, outcome="skipped_no_budget")
+                return response
+            CASCADE_ESCALATIONS.inc(reason=reason, outcome="escalated")
+            log_event(logger, "cascade_escalate", reason=reason)
+        return self._call(STRONG, self.strong.get(tool_names, final=final), messages, deadline, tool_names)
@@ -0,0 +1,72 @@
+"""
+요청 단위 마감시간(deadline)과 지연시간 예산
+- chat 호출 시 config["configurable"]["deadline"]에 절대 시각(epoch 초)을 넣어 그래프 전체에 전달
+- 각 노드/도구는 남은 예산으로 HTTP·LLM 타임아웃을 정하고, 예산이 부족하면 도구 라운드를 건너뛴다
+"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Optional
+
+# 요청 하나가 쓸 수 있는 전체 시간 (초)
+DEFAULT_REQUEST_BUDGET = float(os.getenv("REQUEST_BUDGET_SECONDS", "60"))
+# 남은 시간이 이보다 적으면 도구를 더 부르지 않고 최종 답변을 강제한다 (LLM 한 번 왕복 분량)
+FINAL_ANSWER_RESERVE = float(os.getenv("FINAL_ANSWER_RESERVE_SECONDS", "8"))
+# 타임아웃이 0에 가깝게 잡혀서 무조건 실패하는 것을 막는 최소값
+MIN_TIMEOUT = 0.5
+
+# run_tools 가 실행하는 도구들이 현재 요청의 마감시간을 볼 수 있도록 컨텍스트에 보관
+_current_deadline: ContextVar[Optional[float]] = ContextVar("current_deadline", default=None)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+def new_deadline(budget: Optional[float] = None) -> float:
+    return time.time() + (DEFAULT_REQUEST_BUDGET if budget is None else budget)
+
+
+def deadline_from_config(config: Optional[Dict[str, Any]]) -> Optional[float]:
+    if not config:
+        return None
+    return (config.get("configurable") or {}).get("deadline")
+
+
+def remaining(deadline: Optional[float]) -> Optional[float]:
+    # 마감시간이 없으면 None (무제한)
+    if deadline is None:
+        return None
+    return deadline - time.time()
+
+
+def is_exhausted(deadline: Optional[float], reserve: float = 0.0) -> bool:
+    left = remaining(deadline)
+    return left is not None and left <= reserve
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[float]):
+    token = _current_deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _current_deadline.reset(token)
+
+
+def current_remaining() -> Optional[float]:
+    return remaining(_current_deadline.get())
+
+
+def timeout_for(default: float) -> float:
+    """
+    도구의 기본 타임아웃과 남은 예산 중 작은 값을 반환
+    예산이 이미 소진되었으면 DeadlineExceeded
+    """
+    left = current_remaining()
+    if left is None:
+        return default
+    if left <= 0:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return max(MIN_TIMEOUT, min(default, left))
@@ -1,13 +1,36 @@
+"""
+대화에서 장기 기억을 추출해서 저장
+- OpenAI 클라이언트(동기/비동기)는 프로세스당 하나만 만들어 커넥션 풀을 재사용한다
+- 여러 대화를 한 번의 structured output 요청으로 추출하는 배치 API와, 저장된 대화 로그 백필 명령 제공
+
+실행 예:
+    python -m src.agent.memory_extractor backfill --input data/logs/conversations.jsonl --batch-size 20
+"""
+import argparse
+import asyncio
+import json
 import os
-from openai import OpenAI
+import logging
+import threading
+from openai import AsyncOpenAI, OpenAI
 from pydantic import BaseModel, Field
-from typing import List, Literal, Optional
+from typing import Any, Dict, List, Literal, Optional, Tuple
 from dotenv import load_dotenv
 
-from src.tools.memory_tools import write_memory, WriteMemoryInput
+from src.tools.memory_tools import DEFAULT_USER_ID, write_memory, WriteMemoryInput
+from src.observability import MEMORY_EXTRACT_LATENCY, MEMORY_EXTRACT_RESULTS, get_logger, log_event
 
 load_dotenv()
 
+logger = get_logger("agent.memory_extractor")
+
+EXTRACTOR_MODEL = os.getenv("MEMORY_EXTRACTOR_MODEL", "gpt-4o-mini")
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+# 배치 요청 하나에 넣을 대화 수 / 백필 시 동시에 보낼 배치 요청 수
+EXTRACT_BATCH_SIZE = 20
+BACKFILL_CONCURRENCY = 4
+
 # 메모리 추출 결과 스키마 (이러한 형태로 저장됨)
 class MemoryExtractionResult(BaseModel):
     should_write_memory: bool = Field(description="메모리에 저장할 가치가 있는지 여부")
@@ -16,6 +39,13 @@ class MemoryExtractionResult(BaseModel):
     content: Optional[str] = Field(description="저장할 핵심 내용 요약")
     tags: Optional[List[str]] = Field(description="관련 태그")
 
+# 배치 추출용: 어떤 대화의 결과인지 index로 구분
+class IndexedMemoryExtraction(MemoryExtractionResult):
+    index: int = Field(description="[CONVERSATION n]의 n")
+
+class MemoryExtractionBatch(BaseModel):
+    results: List[IndexedMemoryExtraction] = Field(description="대화마다 하나씩의 추출 결과")
+
 EXTRACTOR_SYSTEM_PROMPT = """
 당신은 메모리 추출 어시스턴트입니다.
 역할:
@@ -35,39 +65,209 @@ MemoryExtractionResult 스키마와 일치하는 JSON 객체를 반환하세요.
 """
 
 
-def extract_and_save_memory(user_input: str, final_answer: str):
-    client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
-    
+BATCH_EXTRACTOR_SYSTEM_PROMPT = EXTRACTOR_SYSTEM_PROMPT + """
+여러 개의 대화가 [CONVERSATION n] 형식으로 주어집니다.
+각 대화를 서로 독립적으로 판단하고, 모든 n에 대해 index=n인 결과를 하나씩 results에 담아 반환하세요.
+"""
+
+
+# ---------------------------------------------------------------------------
+# 공용 OpenAI 클라이언트 (처음 쓸 때 생성, 이후 재사용)
+# ---------------------------------------------------------------------------
+
+_client: Optional[OpenAI] = None
+_async_client: Optional[AsyncOpenAI] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> OpenAI:
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = OpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+    return _client
+
+
+def get_async_client() -> AsyncOpenAI:
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                _async_client = AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=OPENAI_TIMEOUT, max_retries=OPENAI_MAX_RETRIES)
+    return _async_client
+
+
+# ---------------------------------------------------------------------------
+# 단건 추출
+# ---------------------------------------------------------------------------
+
+def _single_messages(user_input: str, final_answer: str) -> List[Dict[str, str]]:
     # 사용자 입력과 최종 답변을 기반으로 메모리 추출
     conversation_snippet = f"User: {user_input}\nAssistant: {final_answer}"
-    
+    return [
+        {"role": "system", "content": EXTRACTOR_SYSTEM_PROMPT},
+        {"role": "user", "content": f"[CONVERSATION]\n{conversation_snippet}"} # 사용자와 LLM 간 대화를 모두 보고 메모리를 추출
+    ]
+
+
+def is_writable(result: MemoryExtractionResult) -> bool:
+    # 저장하겠다고 해도 내용이나 타입이 비어 있으면 저장할 수 없다
+    return bool(result.should_write_memory and result.content and result.memory_type)
+
+
+def save_extraction(result: MemoryExtractionResult, user_id: str = DEFAULT_USER_ID) -> Optional[str]:
+    if not is_writable(result):
+        MEMORY_EXTRACT_RESULTS.inc(outcome="skipped")
+        log_event(logger, "memory_skipped", user_id=user_id)
+        return None
+
+    MEMORY_EXTRACT_RESULTS.inc(outcome="saved")
+    log_event(logger, "memory_extracted", user_id=user_id, content=result.content, memory_type=result.memory_type)
+    write_input = WriteMemoryInput(
+        content=result.content,
+        memory_type=result.memory_type,
+        importance=result.importance or 3,
+        tags=result.tags or [],
+        user_id=user_id
+    )
+    return write_memory(write_input) # 메모리 저장 도구를 호출
+
 
+def extract_and_save_memory(user_input: str, final_answer: str, user_id: str = DEFAULT_USER_ID):
     try:
-        completion = client.beta.chat.completions.parse(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": EXTRACTOR_SYSTEM_PROMPT},
-                {"role": "user", "content": f"[CONVERSATION]\n{conversation_snippet}"} # 사용자와 LLM 간 대화를 모두 보고 메모리를 추출
-            ],
-            response_format=MemoryExtractionResult,
-        )
-        
-        result = completion.choices[0].message.parsed
-        
-        if result.should_write_memory:
-            print(f"Content: {result.content}")
-            
-            write_input = WriteMemoryInput(
-                content=result.content,
-                memory_type=result.memory_type,
-                importance=result.importance,
-                tags=result.tags
+        with MEMORY_EXTRACT_LATENCY.time(mode="single"):
+            completion = get_client().beta.chat.completions.parse(
+                model=EXTRACTOR_MODEL,
+                messages=_single_messages(user_input, final_answer),
+                response_format=MemoryExtractionResult,
             )
-            
-            save_result = write_memory(write_input) # 메모리 저장 도구를 호출
-            
-        else:
-            print("No important information to save")
-            
+        save_extraction(completion.choices[0].message.parsed, user_id)
     except Exception as e:
-        print(f"Error: {e}")
\ No newline at end of file
+        MEMORY_EXTRACT_RESULTS.inc(outcome="error")
+        log_event(logger, "memory_extract_error", level=logging.ERROR, error=str(e))
+
+
+# ---------------------------------------------------------------------------
+# 배치 추출: 여러 (사용자 입력, 답변) 쌍을 요청 한 번으로
+# ---------------------------------------------------------------------------
+
+def _batch_messages(pairs: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+    conversations = "\n\n".join(
+        f"[CONVERSATION {i}]\nUser: {user_input}\nAssistant: {final_answer}"
+        for i, (user_input, final_answer) in enumerate(pairs)
+    )
+    return [
+        {"role": "system", "content": BATCH_EXTRACTOR_SYSTEM_PROMPT},
+        {"role": "user", "content": conversations},
+    ]
+
+
+def _align(batch: Optional[MemoryExtractionBatch], size: int) -> List[MemoryExtractionResult]:
+    # 모델이 빠뜨린 대화는 저장하지 않음으로 채운다
+    empty = MemoryExtractionResult(should_write_memory=False, memory_type=None, importance=None, content=None, tags=None)
+    results = [empty] * size
+    for item in (batch.results if batch else []):
+        if 0 <= item.index < size:
+            results[item.index] = MemoryExtractionResult(**item.model_dump(exclude={"index"}))
+    return results
+
+
+async def aextract_memories_batch(pairs: List[Tuple[str, str]]) -> List[MemoryExtractionResult]:
+    """
+    여러 대화에서 한 번의 요청으로 기억을 추출 (입력 순서대로 결과 반환)
+    - 시스템 프롬프트와 스키마를 대화마다 반복해서 보내지 않아 토큰과 왕복 횟수가 줄어든다
+    """
+    if not pairs:
+        return []
+    with MEMORY_EXTRACT_LATENCY.time(mode="batch"):
+        completion = await get_async_client().beta.chat.completions.parse(
+            model=EXTRACTOR_MODEL,
+            messages=_batch_messages(pairs),
+            response_format=MemoryExtractionBatch,
+        )
+    return _align(completion.choices[0].message.parsed, len(pairs))
+
+
+# ---------------------------------------------------------------------------
+# 대화 로그 백필
+# ---------------------------------------------------------------------------
+
+def load_conversation_log(path: str) -> List[Dict[str, Any]]:
+    """JSONL: 한 줄에 {"user_id": ..., "user": 사용자 입력, "assistant": 답변}"""
+    records = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line:
+                record = json.loads(line)
+                records.append({
+                    "user_id": record.get("user_id") or DEFAULT_USER_ID,
+                    "user": record["user"],
+                    "assistant": record["assistant"],
+                })
+    return records
+
+
+async def backfill(
+    records: List[Dict[str, Any]],
+    batch_size: int = EXTRACT_BATCH_SIZE,
+    concurrency: int = BACKFILL_CONCURRENCY,
+    dry_run: bool = False,
+) -> Dict[str, int]:
+    semaphore = asyncio.Semaphore(concurrency)
+    chunks = [records[i:i + batch_size] for i in range(0, len(records), batch_size)]
+
+    async def run_chunk(chunk: List[Dict[str, Any]]) -> List[MemoryExtractionResult]:
+        async with semaphore:
+            try:
+                return await aextract_memories_batch([(r["user"], r["assistant"]) for r in chunk])
+            except Exception as e:
+                MEMORY_EXTRACT_RESULTS.inc(len(chunk), outcome="error")
+                log_event(logger, "memory_backfill_error", level=logging.ERROR, size=len(chunk), error=str(e))
+                return []
+
+    chunk_results = await asyncio.gather(*(run_chunk(chunk) for chunk in chunks))
+
+    stats = {"conversations": len(records), "requests": len(chunks), "saved": 0, "skipped": 0, "failed": 0}
+    for chunk, results in zip(chunks, chunk_results):
+        if not results:
+            stats["failed"] += len(chunk)
+            continue
+        for record, result in zip(chunk, results):
+            if dry_run:
+                if is_writable(result):
+                    stats["saved"] += 1
+                    print(f"[{record['user_id']}] ({result.memory_type}, {result.importance}) {result.content}")
+                else:
+                    stats["skipped"] += 1
+            elif save_extraction(result, record["user_id"]):
+                stats["saved"] += 1
+            else:
+                # save_extraction은 저장할 수 없는 결과(내용/타입 누락 포함)에 None을 돌려준다
+                stats["skipped"] += 1
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="장기 기억 추출")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    fill = sub.add_parser("backfill", help="저장된 대화 로그(JSONL)에서 기억을 배치로 추출해 저장")
+    fill.add_argument("--input", required=True, help="JSONL 경로 (user_id, user, assistant)")
+    fill.add_argument("--batch-size", type=int, default=EXTRACT_BATCH_SIZE, help="요청 하나에 넣을 대화 수")
+    fill.add_argument("--concurrency", type=int, default=BACKFILL_CONCURRENCY, help="동시에 보낼 요청 수")
+    fill.add_argument("--dry-run", action="store_true", help="저장하지 않고 추출 결과만 출력")
+
+    args = parser.parse_args()
+    if args.command == "backfill":
+        records = load_conversation_log(args.input)
+        stats = asyncio.run(backfill(records, args.batch_size, args.concurrency, args.dry_run))
+        print(
+            f"대화 {stats['conversations']}개 / 요청 {stats['requests']}회: "
+            f"저장 {stats['saved']}, 건너뜀 {stats['skipped']}, 실패 {stats['failed']}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+도구 호출 보호 장치
+- CircuitBreaker: 연속 실패가 쌓이면 일정 시간 동안 호출을 즉시 거절 (느린/죽은 의존성에 매달리지 않음)
+- Bulkhead: 도구별 동시 실행 수 제한. 자리가 없으면 오래 기다리지 않고 바로 거절
+"""
+import threading
+import time
+from typing import Optional
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int = 5, recovery_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._trial_in_flight = False
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._trial_in_flight:
+                # 복구 확인용 시험 호출은 한 번에 하나만
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._state = CLOSED
+            self._failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._trial_in_flight = False
+
+    def release_trial(self):
+        # allow()로 시험 호출 자리를 받았지만 실제로 호출하지 못한 경우(예: bulkhead 거절) 자리만 돌려준다
+        with self._lock:
+            self._trial_in_flight = False
+
+
+class Bulkhead:
+    def __init__(self, max_concurrency: Optional[int]):
+        self.max_concurrency = max_concurrency
+        self._semaphore = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+
+    def acquire(self, timeout: float) -> bool:
+        if self._semaphore is None:
+            return True
+        return self._semaphore.acquire(timeout=max(0.0, timeout))
+
+    def release(self):
+        if self._semaphore is not None:
+            self._semaphore.release()
@@ -0,0 +1,55 @@
+"""
+같은 요청이 동시에 여러 번 들어오면 한 번만 실행하고 결과를 나눠주는 single-flight
+- 먼저 온 호출(leader)이 실행하고, 실행 중에 들어온 같은 key의 호출은 결과를 기다린다
+- 실행이 끝나면 key를 지우므로 결과를 캐시하지는 않는다 (동시에 겹친 요청끼리만 합친다)
+"""
+import threading
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+
+    def do(self, key: Hashable, fn: Callable[[], Any], timeout: Optional[float] = None) -> Tuple[Any, bool]:
+        """
+        fn()의 결과와 공유 여부(True면 다른 호출의 결과를 받은 것)를 반환
+        - leader의 예외는 기다리던 호출에도 그대로 전달된다
+        - timeout: 기다리는 쪽의 최대 대기 시간 (넘으면 TimeoutError, leader는 계속 실행)
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not leader:
+            if not call.done.wait(timeout):
+                raise TimeoutError(f"Timed out after {timeout:.1f}s waiting for an in-flight call")
+            if call.error is not None:
+                raise call.error
+            return call.result, True
+
+        try:
+            call.result = fn()
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+            call.done.set()
+        return call.result, False
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
@@ -0,0 +1,102 @@
+"""
+비동기 도구 핸들러(async_handler)를 실행하는 프로세스 공용 이벤트 루프
+- 그래프의 도구 노드는 동기 코드라서, 코루틴은 이 루프를 도는 전용 스레드에 넘기고 결과를 기다린다
+- 루프가 하나뿐이라 비동기 HTTP 클라이언트(http_client.get_async_client)가 호출 사이에 keep-alive 커넥션을 재사용한다
+- 호출한 스레드의 contextvars(요청 마감시간 등)를 Task가 그대로 이어받는다
+"""
+import asyncio
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable, Coroutine, Optional
+
+from src.observability import get_logger, log_event
+
+logger = get_logger("agent.tool_loop")
+
+
+class LoopCall:
+    """루프에서 실행 중인 코루틴 하나. future로 결과를 기다리고, cancel()로 Task를 취소한다"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.future: Future = Future()
+        self._loop = loop
+        self._task: Optional[asyncio.Task] = None
+        self._cancelled = False
+
+    def cancel(self):
+        self._loop.call_soon_threadsafe(self._cancel_on_loop)
+
+    def _cancel_on_loop(self):
+        # 시작 전/후 모두 루프 스레드에서만 다루므로 잠금이 필요 없다
+        self._cancelled = True
+        if self._task is not None:
+            self._task.cancel()
+
+
+class ToolLoop:
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def _ensure_loop(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="tool-loop", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+
+    def submit(self, coro: Coroutine[Any, Any, Any], on_done: Optional[Callable[[], None]] = None) -> LoopCall:
+        """
+        코루틴을 루프에서 실행
+        - on_done: Task가 실제로 끝났을 때(취소 포함) 루프 스레드에서 한 번 호출 (bulkhead 자리 반납 등)
+        - 결과/예외는 call.future로 받는다. 취소된 경우 future도 취소 상태가 된다
+        """
+        loop = self._ensure_loop()
+        call = LoopCall(loop)
+
+        def settle(task: asyncio.Task):
+            if on_done is not None:
+                on_done()
+            if task.cancelled():
+                call.future.cancel()
+            elif task.exception() is not None:
+                call.future.set_exception(task.exception())
+            else:
+                call.future.set_result(task.result())
+
+        def start():
+            if call._cancelled:
+                coro.close()
+                if on_done is not None:
+                    on_done()
+                call.future.cancel()
+                return
+            # start는 call_soon_threadsafe가 잡아둔 호출 스레드의 컨텍스트에서 실행되므로 Task도 같은 컨텍스트를 쓴다
+            call._task = loop.create_task(coro)
+            call._task.add_done_callback(settle)
+
+        loop.call_soon_threadsafe(start)
+        return call
+
+    def shutdown(self, cleanup: Optional[Callable[[], Coroutine[Any, Any, Any]]] = None, timeout: float = 5.0):
+        """cleanup 코루틴(예: 비동기 HTTP 클라이언트 정리)을 루프에서 실행한 뒤 루프를 멈춘다"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        if cleanup is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(cleanup(), loop).result(timeout)
+            except Exception as e:
+                log_event(logger, "tool_loop_cleanup_error", error=str(e))
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout)
+        if not loop.is_running():
+            loop.close()
+
+
+tool_loop = ToolLoop()
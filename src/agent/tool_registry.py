@@ -1,22 +1,90 @@
-
-from typing import Any, Callable, Dict, List
+from typing import Any, Awaitable, Callable, Dict, List, Optional
 from pydantic import BaseModel
+from concurrent.futures import ThreadPoolExecutor
+import contextvars
 import json
+import os
+import time
 
 from src.rag.retriever import search_recipe, RecipeSearchInput
 from src.tools.memory_tools import read_memory, write_memory, ReadMemoryInput, WriteMemoryInput
-from src.tools.search_tool import search_google, SearchInput
-from src.tools.weather_tool import get_current_weather
+from src.tools.search_tool import search_google, async_search_google, SearchInput
+from src.tools.weather_tool import get_current_weather, get_weather_by_city
 from src.tools.weather_tool import GetWeatherInput
+from src.tools.recipe_tool import recommend_recipe, RecommendRecipeInput, RecommendForMoodInput, weather_category
 from src.tools.time_tool import get_current_time, GetTimeInput
 from src.tools.calculator_tool import calculate, CalculatorInput
+from src.tools.scale_tool import scale_recipe, ScaleRecipeInput
 from src.rag.pdf_retriever import search_food_knowledge, KnowledgeSearchInput
+from src.agent.deadline import current_remaining
+from src.agent.resilience import Bulkhead, CircuitBreaker
+from src.agent.singleflight import SingleFlight
+from src.agent.tool_loop import tool_loop
+from src.observability import COALESCED_CALLS, TOOL_CALLS, TOOL_ERRORS, TOOL_LATENCY, TOOL_REJECTED, get_logger, log_event
+
+logger = get_logger("agent.tools")
+
+# 동시 실행 제한(bulkhead)이 없는 도구가 타임아웃을 걸고 실행할 때 쓰는 공용 워커 풀
+# bulkhead가 있는 도구는 자리 수만큼의 전용 워커를 따로 쓴다 (register_tool 참고)
+TOOL_WORKERS = int(os.getenv("TOOL_WORKERS", "32"))
+# 동시 실행 자리가 날 때까지 기다리는 최대 시간 (이보다 오래 걸리면 바로 거절)
+BULKHEAD_WAIT = float(os.getenv("TOOL_BULKHEAD_WAIT_SECONDS", "0.5"))
+
+_executor = ThreadPoolExecutor(max_workers=TOOL_WORKERS, thread_name_prefix="tool")
 
 class ToolSpec(BaseModel):
     name: str
     description: str
     input_model: Any
-    handler: Callable[[Any], Dict[str, Any]]
+    handler: Optional[Callable[[Any], Any]] = None
+    # 비동기 핸들러. 있으면 이쪽을 우선 사용하고 공용 도구 이벤트 루프(tool_loop)에서 실행
+    async_handler: Optional[Callable[[Any], Awaitable[Any]]] = None
+    # 도구별 최대 동시 실행 수 (None이면 제한 없음)
+    max_concurrency: Optional[int] = None
+    # 도구별 실행 타임아웃 (초, None이면 요청 마감시간만 적용)
+    timeout: Optional[float] = None
+    # 연속 실패 몇 번에 서킷을 열지, 몇 초 후 다시 시도할지
+    failure_threshold: int = 5
+    recovery_timeout: float = 30.0
+    # 예외/타임아웃이 아닌 반환값 중 의존성 장애로 볼 결과 (서킷 브레이커 실패로 기록)
+    # 잘못된 식, 없는 레시피 같은 입력 오류는 넣지 않는다. 레지스트리는 모든 세션이 공유하므로 한 사용자의 입력이 도구를 막게 된다
+    failure_check: Optional[Callable[[Any], bool]] = None
+    # 사용자 메시지에 이 단어가 있으면 해당 턴에 도구 스키마를 바인딩 (tool_selector 참고)
+    keywords: List[str] = []
+    # 같은 이름+인자로 이미 실행 중인 호출이 있으면 그 결과를 같이 받는다 (부작용이 있는 도구는 False)
+    coalesce: bool = True
+
+class PipelineStep(BaseModel):
+    """
+    합성 도구의 한 단계
+    - handler는 지금까지의 컨텍스트(입력 필드 + 이전 단계 결과)를 받아 결과를 반환
+    - 결과는 컨텍스트의 name 키에 저장되어 다음 단계에서 사용할 수 있다
+    """
+    name: str
+    handler: Callable[[Dict[str, Any]], Any]
+    # 최종 도구 결과에 포함할지 여부 (중간 계산용 단계는 False)
+    output: bool = True
+
+# 단계 목록을 등록 시점에 하나의 핸들러로 묶는다 (LLM 왕복 없이 서버에서 연쇄 실행)
+def compile_pipeline(steps: List[PipelineStep]) -> Callable[[Any], Dict[str, Any]]:
+    steps = list(steps)
+    output_keys = [step.name for step in steps if step.output]
+
+    def run_pipeline(input_data: BaseModel) -> Dict[str, Any]:
+        context: Dict[str, Any] = input_data.model_dump()
+        for step in steps:
+            context[step.name] = step.handler(context)
+        return {key: context[key] for key in output_keys}
+
+    return run_pipeline
+
+# 도구 결과가 실패를 나타내는지 판단 (도구마다 에러 표현 방식이 달라서 모아서 처리, 메트릭/로그용)
+def is_error_result(result: Any) -> bool:
+    if isinstance(result, dict):
+        return "error" in result
+    if isinstance(result, str):
+        return result.startswith(("Error", "Search error"))
+    return False
 
 def as_openai_tool_spec(spec: ToolSpec) -> Dict[str, Any]:
     schema = spec.input_model.model_json_schema()
@@ -30,58 +98,232 @@ def as_openai_tool_spec(spec: ToolSpec) -> Dict[str, Any]:
         },
     }
 
+# 도구 타임아웃과 요청의 남은 예산 중 작은 값
+def _effective_timeout(spec: ToolSpec) -> Optional[float]:
+    left = current_remaining()
+    if spec.timeout is None:
+        return left
+    if left is None:
+        return spec.timeout
+    return min(spec.timeout, left)
+
+def _timeout_error(name: str, timeout: Optional[float]) -> Dict[str, Any]:
+    if timeout is None:
+        return {"error": f"Tool {name} timed out"}
+    return {"error": f"Tool {name} timed out after {timeout:.1f}s"}
+
+# 검증된 입력 기준의 single-flight key (injected된 user_id도 포함되므로 사용자끼리는 합쳐지지 않는다)
+def _flight_key(name: str, input_data: BaseModel) -> Any:
+    return name, json.dumps(input_data.model_dump(mode="json"), ensure_ascii=False, sort_keys=True)
+
 class ToolRegistry:
     def __init__(self):
         self._tools: Dict[str, ToolSpec] = {}
+        self._bulkheads: Dict[str, Bulkhead] = {}
+        self._breakers: Dict[str, CircuitBreaker] = {}
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._flights = SingleFlight()
 
     def register_tool(self, spec: ToolSpec):
+        if spec.handler is None and spec.async_handler is None:
+            raise ValueError(f"Tool {spec.name} needs a handler or an async_handler")
         self._tools[spec.name] = spec
+        self._bulkheads[spec.name] = Bulkhead(spec.max_concurrency)
+        self._breakers[spec.name] = CircuitBreaker(spec.failure_threshold, spec.recovery_timeout)
+        # 멈춘 의존성(예: Chroma)이 워커를 다 차지해도 다른 도구는 계속 실행되도록 bulkhead마다 전용 워커
+        # 자리가 실행이 끝날 때 반납되므로 워커 수 = 자리 수면 제출된 작업이 큐에서 기다리지 않는다
+        previous = self._executors.get(spec.name)
+        if previous is not None and previous is not _executor:
+            previous.shutdown(wait=False)
+        self._executors[spec.name] = (
+            ThreadPoolExecutor(max_workers=spec.max_concurrency, thread_name_prefix=f"tool-{spec.name}")
+            if spec.max_concurrency
+            else _executor
+        )
+
+    def register_pipeline(self, name: str, description: str, input_model: Any, steps: List[PipelineStep], **spec_kwargs):
+        # 합성 도구도 일반 도구와 똑같이 타임아웃/bulkhead/서킷 브레이커를 적용받는다
+        self.register_tool(ToolSpec(
+            name=name,
+            description=description,
+            input_model=input_model,
+            handler=compile_pipeline(steps),
+            **spec_kwargs
+        ))
+
+    def tool_names(self) -> List[str]:
+        return list(self._tools)
+
+    def get(self, name: str) -> ToolSpec:
+        return self._tools[name]
+
+    def list_openai_tools(self, names: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        # names를 주면 그 도구들만
+        # 프롬프트 캐시 접두부가 등록 순서에 따라 바뀌지 않도록 항상 이름순으로 정렬
+        specs = [spec for spec in self._tools.values() if names is None or spec.name in names]
+        return [as_openai_tool_spec(spec) for spec in sorted(specs, key=lambda s: s.name)]
+
+    def _reject(self, name: str, reason: str, message: str) -> Dict[str, Any]:
+        TOOL_REJECTED.inc(tool=name, reason=reason)
+        log_event(logger, "tool_rejected", tool=name, reason=reason)
+        return {"error": message}
+
+    def _admit(self, name: str) -> Optional[Dict[str, Any]]:
+        # 서킷이 열려 있으면 의존성에 붙지 않고 즉시 실패
+        if not self._breakers[name].allow():
+            return self._reject(name, "circuit_open", f"Tool {name} is temporarily unavailable. Try again later or answer without it.")
+        return None
 
-    def list_openai_tools(self) -> List[Dict[str, Any]]:
-        return [as_openai_tool_spec(spec) for spec in self._tools.values()]
+    def _finish(self, spec: ToolSpec, start: float, result: Any, crashed: bool = False) -> Any:
+        """
+        crashed: 핸들러 예외 또는 타임아웃
+        서킷 브레이커에는 의존성 장애(crashed 또는 failure_check)만 실패로 기록한다
+        """
+        name = spec.name
+        elapsed = time.perf_counter() - start
+        failed = crashed or is_error_result(result)
+        breaker = self._breakers[name]
+        if crashed or (spec.failure_check is not None and spec.failure_check(result)):
+            breaker.record_failure()
+        else:
+            breaker.record_success()
 
-    def call(self, name: str, args: Dict[str, Any]) -> Dict[str, Any]:
+        TOOL_LATENCY.observe(elapsed, tool=name)
+        TOOL_CALLS.inc(tool=name, status="error" if failed else "ok")
+        if failed:
+            TOOL_ERRORS.inc(tool=name)
+            log_event(logger, "tool_error", tool=name, elapsed_ms=round(elapsed * 1000, 1), error=str(result)[:200])
+        else:
+            log_event(logger, "tool_done", tool=name, elapsed_ms=round(elapsed * 1000, 1))
+        return result
+
+    def _validate(self, spec: ToolSpec, args: Dict[str, Any], injected: Optional[Dict[str, Any]]) -> Any:
+        # injected: LLM이 아니라 호출하는 쪽이 채우는 값 (예: user_id). 입력 모델에 있는 필드만 덮어쓴다
+        fields = spec.input_model.model_fields
+        extra = {k: v for k, v in (injected or {}).items() if k in fields and v is not None}
+        return spec.input_model(**{**args, **extra})
+
+    def call(self, name: str, args: Dict[str, Any], injected: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
         if name not in self._tools:
             return {"error": f"Tool {name} not found"}
         
         spec = self._tools[name]
         try:
-            input_data = spec.input_model(**args)
-    
-            return spec.handler(input_data)
+            input_data = self._validate(spec, args, injected)
         except Exception as e:
             return {"error": f"Tool execution failed: {str(e)}"}
-        
+
+        if not spec.coalesce:
+            return self._execute(spec, input_data)
+
+        # 같은 호출이 이미 실행 중이면 bulkhead 자리를 잡지 않고 그 결과를 기다린다
+        timeout = _effective_timeout(spec)
+        try:
+            result, shared = self._flights.do(_flight_key(name, input_data), lambda: self._execute(spec, input_data), timeout)
+        except TimeoutError:
+            return _timeout_error(name, timeout)
+        if shared:
+            COALESCED_CALLS.inc(scope="tool", name=name)
+        return result
+
+    def _execute(self, spec: ToolSpec, input_data: Any) -> Any:
+        name = spec.name
+        rejected = self._admit(name)
+        if rejected:
+            return rejected
+
+        bulkhead = self._bulkheads[name]
+        timeout = _effective_timeout(spec)
+        wait = BULKHEAD_WAIT if timeout is None else min(BULKHEAD_WAIT, timeout)
+        if not bulkhead.acquire(wait):
+            # half-open 시험 호출 자리를 받았다면 돌려줘야 다음 호출이 다시 시험할 수 있다
+            self._breakers[name].release_trial()
+            return self._reject(name, "busy", f"Tool {name} is busy. Try again later or answer without it.")
+
+        start = time.perf_counter()
+        # 타임아웃이 없고 동기 핸들러만 있으면 호출한 스레드에서 바로 실행
+        if timeout is None and spec.async_handler is None:
+            crashed = False
+            try:
+                result = spec.handler(input_data)
+            except Exception as e:
+                crashed = True
+                result = {"error": f"Tool execution failed: {str(e)}"}
+            finally:
+                bulkhead.release()
+            return self._finish(spec, start, result, crashed)
+
+        # 비동기 핸들러는 공용 이벤트 루프에서, 동기 핸들러는 도구 전용 워커 스레드에서 실행하고 타임아웃까지만 기다린다
+        # 자리는 실제 실행이 끝날 때 반납되므로, 멈춘 의존성은 자기 bulkhead만 차지한다
+        call = None
+        if spec.async_handler is not None:
+            call = tool_loop.submit(spec.async_handler(input_data), on_done=bulkhead.release)
+            future = call.future
+        else:
+            ctx = contextvars.copy_context()
+            future = self._executors[name].submit(ctx.run, spec.handler, input_data)
+            future.add_done_callback(lambda _: bulkhead.release())
+        crashed = False
+        try:
+            result = future.result(timeout=timeout)
+        except Exception as e:
+            crashed = True
+            # 핸들러가 직접 던진 TimeoutError와 구분하려고, 아직 끝나지 않았을 때만 타임아웃으로 본다
+            if not future.done():
+                if call is not None:
+                    # 코루틴은 취소할 수 있다 (자리는 Task가 실제로 끝날 때 반납)
+                    call.cancel()
+                result = _timeout_error(name, timeout)
+            else:
+                result = {"error": f"Tool execution failed: {str(e)}"}
+        return self._finish(spec, start, result, crashed)
+
 
 def register_default_tools() -> ToolRegistry:
     reg = ToolRegistry()
 
     reg.register_tool(ToolSpec(
         name="search_recipe",
-        description="사용자의 상황, 기분, 재료 등을 고려하여 적절한 레시피를 검색합니다.",
+        description="사용자의 상황, 기분, 재료 등을 고려하여 적절한 레시피를 검색합니다. 여러 표현으로 찾아보고 싶다면 여러 번 호출하지 말고 queries 리스트에 모아 한 번에 검색하세요.",
         input_model=RecipeSearchInput,
-        handler=lambda input_data: {"results": search_recipe(input_data)}
+        handler=lambda input_data: {"results": search_recipe(input_data)},
+        max_concurrency=8,
+        timeout=15,
+        keywords=["레시피", "요리", "만드는", "만들", "메뉴", "recipe"],
     ))
 
     reg.register_tool(ToolSpec(
         name="read_memory",
         description="사용자의 취향, 과거 대화, 특정 지식 등 저장된 기억을 검색합니다.",
         input_model=ReadMemoryInput,
-        handler=read_memory
+        handler=read_memory,
+        max_concurrency=8,
+        timeout=10,
+        keywords=["기억", "취향", "알레르기", "memory"],
     ))
 
     reg.register_tool(ToolSpec(
         name="write_memory",
         description="사용자에 대한 정보나 중요한 대화 내용을 장기 기억에 저장합니다.",
         input_model=WriteMemoryInput,
-        handler=write_memory
+        handler=write_memory,
+        max_concurrency=8,
+        timeout=10,
+        coalesce=False,
+        keywords=["기억해", "저장", "알레르기", "싫어", "좋아해", "못 먹", "remember"],
     ))
 
     reg.register_tool(ToolSpec(
         name="search_google",
         description="Google 검색을 통해 최신 정보, 재료 시세, 대체 재료, 요리 팁 등을 찾아줍니다.",
         input_model=SearchInput,
-        handler=search_google
+        handler=search_google,
+        async_handler=async_search_google,
+        max_concurrency=4,
+        timeout=12,
+        # 키 미설정/쿼터 소진 안내는 장애가 아니고, HTTP 호출 실패만 장애로 본다
+        failure_check=lambda result: isinstance(result, str) and result.startswith("Search error"),
+        keywords=["검색", "찾아", "최신", "가격", "시세", "대체", "search"],
     ))
     
     reg.register_tool(ToolSpec(
@@ -89,6 +331,9 @@ def register_default_tools() -> ToolRegistry:
         description="현재 날씨 정보를 조회합니다.",
         input_model=GetWeatherInput,
         handler=get_current_weather,
+        max_concurrency=4,
+        timeout=10,
+        keywords=["날씨", "기온", "비가", "눈이", "더운", "추운", "weather"],
     ))
 
     reg.register_tool(ToolSpec(
@@ -96,20 +341,54 @@ def register_default_tools() -> ToolRegistry:
         description="현재 날짜와 시간을 알려줍니다.",
         input_model=GetTimeInput,
         handler=get_current_time,
+        keywords=["시간", "몇 시", "날짜", "요일", "time"],
     ))
 
     reg.register_tool(ToolSpec(
         name="calculate",
-        description="간단한 사칙연산(+, -, *, /)을 수행합니다. 예: '10 + 5'",
+        description="계산식을 한 번에 계산합니다. 괄호, 분수('1/2쪽'), 범위('1~1.5개'), 단위('300g')를 그대로 쓸 수 있으니 여러 번 나눠 호출하지 말고 하나의 식으로 보내세요. 예: '(1~1.5개) * 5 / 2'",
         input_model=CalculatorInput,
         handler=calculate,
+        keywords=["계산", "더하", "곱하", "나누", "합계", "총 ", "칼로리"],
+    ))
+
+    reg.register_tool(ToolSpec(
+        name="scale_recipe",
+        description="레시피 ID와 원하는 인분 수를 받아 모든 재료 분량을 한 번에 환산합니다. 인분 조절에는 calculate 대신 이 도구를 사용하세요.",
+        input_model=ScaleRecipeInput,
+        handler=scale_recipe,
+        keywords=["인분", "인원", "명이", "명 ", "배로", "분량", "servings"],
     ))
 
     reg.register_tool(ToolSpec(
         name="search_food_knowledge",
-        description="요리 재료의 효능, 영양 성분, 요리 용어 등 '지식'적인 내용이 궁금할 때 PDF 문서를 검색합니다.",
+        description="요리 재료의 효능, 영양 성분, 요리 용어 등 '지식'적인 내용이 궁금할 때 PDF 문서를 검색합니다. 궁금한 점이 여러 개라면 queries 리스트에 모아 한 번에 검색하세요.",
         input_model=KnowledgeSearchInput,
-        handler=lambda input_data: {"results": search_food_knowledge(input_data)}
+        handler=lambda input_data: {"results": search_food_knowledge(input_data)},
+        max_concurrency=8,
+        timeout=15,
+        keywords=["효능", "영양", "성분", "용어", "건강", "칼로리", "보관", "손질"],
     ))
+
+
+    # 날씨 조회 → 기분+날씨 규칙 추천 → 레시피 DB 검색을 한 번의 도구 호출로 처리
+    reg.register_pipeline(
+        name="recommend_for_mood",
+        description="도시와 기분을 받아 현재 날씨 조회, 날씨/기분 기반 메뉴 추천, 레시피 검색까지 한 번에 수행합니다. 날씨와 기분을 고려한 추천이 필요하면 get_weather와 search_recipe를 따로 부르지 말고 이 도구를 사용하세요.",
+        input_model=RecommendForMoodInput,
+        steps=[
+            PipelineStep(name="weather", handler=lambda ctx: get_weather_by_city(ctx["city"])),
+            PipelineStep(name="recommendation", handler=lambda ctx: recommend_recipe(
+                RecommendRecipeInput(mood=ctx["mood"], weather=ctx["weather"])
+            )),
+            PipelineStep(name="recipes", handler=lambda ctx: search_recipe(RecipeSearchInput(queries=[
+                ctx["recommendation"]["recipe"]["name"],
+                f"{weather_category(ctx['weather'])} 날 {ctx['mood']} 기분에 어울리는 요리",
+            ]))),
+        ],
+        max_concurrency=4,
+        timeout=20,
+        keywords=["기분", "우울", "피곤", "행복", "스트레스", "날씨", "추천"],
+    )
     
     return reg
@@ -0,0 +1,85 @@
+"""
+턴마다 필요한 도구만 골라서 LLM에 바인딩
+- 도구 스키마는 매 호출마다 프롬프트 토큰으로 다시 전송되므로, 관련 없는 도구는 빼고 보낸다
+- 사용자 메시지에 ToolSpec.keywords 가 들어 있으면 해당 도구를 추가 (항상 포함되는 기본 도구는 CORE_TOOLS)
+- 같은 조합에 대해서는 bind_tools 결과를 캐시해서 재사용
+
+프롬프트 캐시와의 관계:
+- OpenAI는 도구 스키마를 메시지보다 앞에 넣으므로, 조합이 바뀌면 시스템 프롬프트/프로필/대화 기록까지 캐시 접두부가 끊긴다
+- 조합은 이름순으로 정렬해서 같은 조합끼리는 바이트열이 같지만, 조합이 여러 개면 캐시도 조합마다 따로 데워진다
+- 스키마를 덜 보내서 아끼는 토큰보다 캐시 할인(대화 기록이 긴 스레드, 긴 프로필)이 더 크면 TOOL_SELECTION=0 으로
+  전체 도구를 항상 같은 순서로 바인딩한다
+- 어느 쪽이 나은지는 도구 조합별 캐시 적중(chefbot_llm_tool_set_tokens_total, 부하 테스트의 tool_sets)으로 판단
+"""
+import os
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, HumanMessage
+
+from src.agent.tool_registry import ToolRegistry
+from src.observability import TOOL_SELECTION_SIZE
+
+# 키워드가 없어도 항상 보내는 도구 (셰프봇의 기본 동작: 레시피 검색 → 모르면 구글)
+# 프로필 기억은 시스템 프롬프트에 미리 들어가므로 read_memory는 키워드가 있을 때만
+CORE_TOOLS = ("search_recipe", "search_google")
+
+# TOOL_SELECTION=0 이면 항상 전체 도구를 바인딩 (도구 접두부가 고정되어 프롬프트 캐시 적중이 우선일 때)
+TOOL_SELECTION_ENABLED = os.getenv("TOOL_SELECTION", "1") != "0"
+
+
+def latest_turn(messages: List[Any]) -> Tuple[str, List[str]]:
+    """마지막 사용자 메시지와, 그 이후 이번 턴에서 이미 호출된 도구 이름들"""
+    used: List[str] = []
+    for msg in reversed(messages):
+        if isinstance(msg, HumanMessage):
+            return str(msg.content), used
+        if isinstance(msg, AIMessage):
+            used.extend(call["name"] for call in msg.tool_calls or [])
+    return "", used
+
+
+class ToolSelector:
+    def __init__(self, registry: ToolRegistry, core: Iterable[str] = CORE_TOOLS, enabled: bool = TOOL_SELECTION_ENABLED):
+        self.registry = registry
+        self.core = [name for name in core if name in registry.tool_names()]
+        self.enabled = enabled
+
+    def select(self, text: str, used: Iterable[str] = ()) -> Tuple[str, ...]:
+        all_names = self.registry.tool_names()
+        if not self.enabled:
+            return tuple(sorted(all_names))
+
+        text = text.lower()
+        selected = set(self.core) | {name for name in used if name in all_names}
+        for name in all_names:
+            if any(keyword in text for keyword in self.registry.get(name).keywords):
+                selected.add(name)
+        # 이름순으로 정렬해서 같은 조합은 항상 같은 키, 같은 스키마 바이트열이 되도록
+        return tuple(sorted(selected))
+
+
+class BoundModelCache:
+    """도구 조합별로 bind_tools 한 모델(일반 / 도구 호출 금지)을 캐시"""
+
+    def __init__(self, llm, registry: ToolRegistry):
+        self.llm = llm
+        self.registry = registry
+        self._models: Dict[Tuple[str, ...], Tuple[Any, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, names: Tuple[str, ...], final: bool = False) -> Any:
+        models: Optional[Tuple[Any, Any]] = self._models.get(names)
+        if models is None:
+            with self._lock:
+                models = self._models.get(names)
+                if models is None:
+                    schema = self.registry.list_openai_tools(names)
+                    # 예산이 소진되었을 때 사용: 같은 도구 스키마를 유지하되 도구 호출은 금지
+                    models = (self.llm.bind_tools(schema), self.llm.bind_tools(schema, tool_choice="none"))
+                    self._models[names] = models
+        TOOL_SELECTION_SIZE.observe(len(names))
+        return models[1] if final else models[0]
+
+    def __len__(self) -> int:
+        return len(self._models)
@@ -1,6 +1,7 @@
 from pathlib import Path
-from typing import List, Optional, Tuple, Any, Generator
+from typing import Dict, List, Optional, Tuple, Any, Generator
 import sys
+import uuid
 
 import gradio as gr
 
@@ -19,21 +20,25 @@ INTRO_MD = """
 """
 
 
-# 에이전트 객체 확인 및 생성
-def _ensure_agent(agent_state: Any) -> Any:
-    return agent_state or make_agent()
+# 프로세스 전체에서 하나의 에이전트(그래프/도구/LLM 클라이언트)를 공유하고,
+# 브라우저 세션마다 thread_id만 따로 둬서 대화 기록(체크포인트)을 나눈다
+agent = make_agent()
+
+
+def new_session() -> Dict[str, Any]:
+    return {"thread_id": f"gradio-{uuid.uuid4().hex}", "pending_interrupt": False}
 
 
 # 스트리밍 메시지 처리 함수
 def handle_message_stream(
-    user_message: str, history: ChatHistory, agent_state: Optional[Any]
-) -> Generator[Tuple[ChatHistory, Any, str], None, None]:
+    user_message: str, history: ChatHistory, session: Optional[Dict[str, Any]]
+) -> Generator[Tuple[ChatHistory, Dict[str, Any], str], None, None]:
     
     if not user_message or not user_message.strip():
         raise gr.Error("메시지를 입력해주세요.")
 
     history = history or []
-    agent = _ensure_agent(agent_state)
+    session = session or new_session()
 
     # 사용자 메시지 추가
     history = history + [(user_message, "")]
@@ -41,49 +46,63 @@ def handle_message_stream(
     try:
         accumulated_response = ""
         tool_info = ""
+
+        # 직전 턴이 인터럽트(검색 한도 확인)로 멈췄다면 이번 메시지를 그 답으로 보내서 재개
+        if session["pending_interrupt"]:
+            session["pending_interrupt"] = False
+            events = agent.stream_resume(user_message.strip(), thread_id=session["thread_id"])
+        else:
+            events = agent.chat_stream(user_message.strip(), thread_id=session["thread_id"])
         
-        for chunk in agent.chat_stream(user_message.strip()): # agent의 chat_stream에서 넘어오는 청크의 타입을 분석
+        for chunk in events: # agent의 chat_stream에서 넘어오는 청크의 타입을 분석
+
+            # 답변 토큰 스트리밍: 새로 온 조각만 붙여서 바로 보여준다
+            if chunk["type"] == "token":
+                accumulated_response += chunk["content"]
+                updated_history = history[:-1] + [(user_message, accumulated_response)]
+                yield updated_history, session, ""
             
-            # AI 메시지 스트리밍
-            if chunk["type"] == "ai_message": # 에이전트의 메세지로 accumulated_response에 누적되며 실시간으로 출력된다. 
+            # 완성된 AI 메시지 (토큰을 이어붙인 결과를 최종본으로 교체)
+            elif chunk["type"] == "ai_message":
                 accumulated_response = chunk["content"]
                 updated_history = history[:-1] + [(user_message, accumulated_response)]
-                yield updated_history, agent, ""
+                yield updated_history, session, ""
             
             # 도구 호출 표시
             elif chunk["type"] == "tool_call": # 에이전트가 외부 도구를 호출했음을 알리며 내부 활동을 사용자에게 알린다. 
                 tool_name = chunk["tool_name"]
                 tool_info = f"\n\n🔧 [{tool_name} 실행 중...]"
                 updated_history = history[:-1] + [(user_message, accumulated_response + tool_info)]
-                yield updated_history, agent, ""
-            
-            # elif chunk["type"] == "tool_result":
-            #     tool_name = chunk["tool_name"]
-            #     tool_info = f"\n\n[{tool_name} 완료]"
-            #     updated_history = history[:-1] + [(user_message, accumulated_response + tool_info)]
-            #     yield updated_history, agent, ""
+                yield updated_history, session, ""
             
-            # 시스템 메시지 (인터럽트)
-            elif chunk["type"] == "system_message": # Google 검색 한도 초과와 같은 Interrupt 또는 시스템 메세지를 처리한다. 
+            # 인터럽트: 질문을 보여주고 다음 입력을 재개 응답으로 사용
+            elif chunk["type"] == "interrupt":
+                session["pending_interrupt"] = True
                 accumulated_response = chunk["content"]
                 updated_history = history[:-1] + [(user_message, accumulated_response)]
-                yield updated_history, agent, ""
+                yield updated_history, session, ""
+            
+            # 시스템 메시지
+            elif chunk["type"] == "system_message": # 검색 계속/중단 같은 이번 턴 안내를 처리한다. 
+                tool_info = f"\n\nℹ️ {chunk['content']}"
+                updated_history = history[:-1] + [(user_message, accumulated_response + tool_info)]
+                yield updated_history, session, ""
             
             # 중요한 점은 return아 아니라 yield를 사용하여 스트리밍 방식으로 결과를 반환한다는 것임.
         
         # 최종 응답
         final_history = history[:-1] + [(user_message, accumulated_response)]
-        yield final_history, agent, ""
+        yield final_history, session, ""
         
     except Exception as exc:
         error_msg = f"❌ 응답 생성 중 문제가 발생했습니다: {exc}"
         error_history = history[:-1] + [(user_message, error_msg)]
-        yield error_history, agent, ""
+        yield error_history, session, ""
 
 
-# 대화 초기화 함수
-def reset_conversation() -> Tuple[ChatHistory, None, str]:
-    return [], None, ""
+# 대화 초기화 함수: 새 thread_id를 발급해서 이전 대화 기록과 분리
+def reset_conversation() -> Tuple[ChatHistory, Dict[str, Any], str]:
+    return [], new_session(), ""
 
 
 def build_interface() -> gr.Blocks:
@@ -100,7 +119,7 @@ def build_interface() -> gr.Blocks:
             placeholder="예) 오늘 비 오는데 따뜻한 국물 요리 추천해줘",
             lines=3,
         )
-        agent_state = gr.State(None)
+        session_state = gr.State(new_session)
 
         with gr.Row():
             send_btn = gr.Button("전송", variant="primary")
@@ -108,18 +127,18 @@ def build_interface() -> gr.Blocks:
 
         send_btn.click(
             fn=handle_message_stream,
-            inputs=[user_input, chatbot, agent_state],
-            outputs=[chatbot, agent_state, user_input],
+            inputs=[user_input, chatbot, session_state],
+            outputs=[chatbot, session_state, user_input],
         )
         user_input.submit(
             fn=handle_message_stream,
-            inputs=[user_input, chatbot, agent_state],
-            outputs=[chatbot, agent_state, user_input],
+            inputs=[user_input, chatbot, session_state],
+            outputs=[chatbot, session_state, user_input],
         )
         reset_btn.click(
             fn=reset_conversation,
             inputs=None,
-            outputs=[chatbot, agent_state, user_input],
+            outputs=[chatbot, session_state, user_input],
         )
 
     return demo
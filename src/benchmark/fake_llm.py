@@ -0,0 +1,167 @@
+"""
+부하 테스트용 가짜 채팅 모델
+- OpenAI를 호출하지 않고, 미리 정해둔 tool_calls 스크립트를 순서대로 재생한 뒤 최종 답변을 반환
+- 응답 지연시간(latency/jitter)을 설정해서 실제 LLM 왕복 시간을 흉내낸다
+- stream()으로 부르면 최종 답변을 어절 단위 조각으로 나눠 보낸다 (토큰 스트리밍 확인용)
+- 같은 입력에는 항상 같은 출력을 내므로(결정적) 여러 스레드에서 동시에 써도 된다
+- 이전 요청과 앞부분(도구 스키마 + 메시지)이 같으면 그만큼을 cache_read 토큰으로 보고해서 프롬프트 캐시를 흉내낸다
+"""
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional, Set
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+# 스크립트에 도구 이름만 적었을 때 사용할 기본 인자
+DEFAULT_TOOL_ARGS: Dict[str, Dict[str, Any]] = {
+    "search_recipe": {"query": "비 오는 날 따뜻한 국물 요리"},
+    "search_food_knowledge": {"query": "마늘의 효능"},
+    "search_google": {"query": "버터 대체 재료"},
+    "read_memory": {"query": "사용자 취향과 알레르기"},
+    "write_memory": {"content": "매운 음식을 좋아함", "memory_type": "profile", "importance": 3},
+    "get_weather": {"location": "Seoul"},
+    "get_current_time": {},
+    "calculate": {"expression": "2 * 3"},
+    "recommend_for_mood": {"city": "Seoul", "mood": "우울"},
+    "scale_recipe": {"recipe_id": "6876357", "servings": 5},
+}
+
+# 기본 시나리오: 날씨 확인 → 레시피 검색 → 최종 답변
+DEFAULT_SCRIPT: List[List[str]] = [["get_weather"], ["search_recipe"]]
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class ScriptedChatModel(BaseChatModel):
+    """
+    script의 i번째 항목은 "마지막 HumanMessage 이후 i번째 AI 턴"에서 호출할 도구 목록이다.
+    스크립트를 다 쓰면 final_answer를 반환한다.
+    """
+    script: List[List[Any]] = DEFAULT_SCRIPT
+    final_answer: str = "오늘 같은 날에는 따뜻한 김치찌개를 추천드려요. (stub)"
+    latency: float = 0.05
+    jitter: float = 0.0
+    seed: Optional[int] = None
+    # response_metadata의 model_name으로 보고할 이름 (캐스케이드 fast/strong 구분용)
+    label: str = "scripted-stub"
+    # 지정하면 최종 답변에 이 확률의 토큰 logprobs를 붙인다 (캐스케이드 확신도 검사 확인용)
+    confidence: Optional[float] = None
+
+    _seen_prefixes: Set[str] = PrivateAttr(default_factory=set)
+    _cache_lock: threading.Lock = PrivateAttr(default_factory=threading.Lock)
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted-stub"
+
+    def bind_tools(self, tools, **kwargs):
+        # 도구 스키마는 무시하고 그대로 전달만 한다 (실제 ChatOpenAI와 같은 사용법 유지)
+        return self.bind(tools=tools, **kwargs)
+
+    def _turn_index(self, messages: List[BaseMessage]) -> int:
+        index = 0
+        for msg in reversed(messages):
+            if isinstance(msg, HumanMessage):
+                break
+            if isinstance(msg, AIMessage):
+                index += 1
+        return index
+
+    def _tool_call(self, step: Any) -> Dict[str, Any]:
+        if isinstance(step, str):
+            name, args = step, DEFAULT_TOOL_ARGS.get(step, {})
+        else:
+            name, args = step["name"], step.get("args", DEFAULT_TOOL_ARGS.get(step["name"], {}))
+        return {"name": name, "args": dict(args), "id": f"call_{uuid.uuid4().hex[:12]}", "type": "tool_call"}
+
+    def _sleep(self):
+        delay = self.latency
+        if self.jitter:
+            rng = random.Random(self.seed) if self.seed is not None else random
+            delay += rng.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _cached_tokens(self, messages: List[BaseMessage], tools: Any) -> int:
+        """메시지 단위로 앞부분 해시를 기록해 두고, 이전에 본 가장 긴 접두부의 토큰 수를 반환"""
+        digest = hashlib.sha256(json.dumps(tools or [], ensure_ascii=False, sort_keys=True).encode())
+        cached = 0
+        prefix_tokens = _approx_tokens(json.dumps(tools)) if tools else 0
+        with self._cache_lock:
+            for msg in messages:
+                digest.update(f"{msg.type}:{msg.content}".encode())
+                prefix_tokens += _approx_tokens(str(msg.content))
+                key = digest.hexdigest()
+                if key in self._seen_prefixes:
+                    cached = prefix_tokens
+                else:
+                    self._seen_prefixes.add(key)
+        return cached
+
+    def _respond(self, messages: List[BaseMessage], **kwargs: Any) -> AIMessage:
+        self._sleep()
+
+        turn = self._turn_index(messages)
+        # tool_choice="none" 으로 바인딩된 경우(예산 소진 등)에는 바로 최종 답변
+        if turn < len(self.script) and kwargs.get("tool_choice") != "none":
+            message = AIMessage(content="", tool_calls=[self._tool_call(step) for step in self.script[turn]])
+            output_text = ""
+        else:
+            message = AIMessage(content=self.final_answer)
+            output_text = self.final_answer
+
+        tools = kwargs.get("tools")
+        input_tokens = sum(_approx_tokens(str(m.content)) for m in messages)
+        if tools:
+            input_tokens += _approx_tokens(json.dumps(tools))
+        output_tokens = _approx_tokens(output_text) if output_text else 10 * len(message.tool_calls)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+            "input_token_details": {"cache_read": self._cached_tokens(messages, tools)},
+        }
+        message.response_metadata = {"model_name": self.label}
+        if self.confidence is not None and output_text:
+            logprob = math.log(self.confidence)
+            message.response_metadata["logprobs"] = {
+                "content": [{"token": word, "logprob": logprob} for word in output_text.split(" ")],
+            }
+        return message
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._respond(messages, **kwargs))])
+
+    def _stream(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs: Any) -> Iterator[ChatGenerationChunk]:
+        """
+        스트리밍 흉내: 최종 답변은 어절 단위 조각으로, tool_calls는 한 조각으로 내보낸다
+        - 토큰 사용량은 OpenAI(stream_usage)처럼 마지막 조각에만 붙인다
+        """
+        message = self._respond(messages, **kwargs)
+        if message.tool_calls:
+            tool_call_chunks = [
+                {"name": call["name"], "args": json.dumps(call["args"], ensure_ascii=False), "id": call["id"], "index": i}
+                for i, call in enumerate(message.tool_calls)
+            ]
+            pieces = [AIMessageChunk(content="", tool_call_chunks=tool_call_chunks)]
+        else:
+            words = message.content.split(" ")
+            pieces = [AIMessageChunk(content=word if i == 0 else " " + word) for i, word in enumerate(words)]
+        pieces[-1].usage_metadata = message.usage_metadata
+        pieces[-1].response_metadata = message.response_metadata
+
+        for piece in pieces:
+            chunk = ChatGenerationChunk(message=piece)
+            if run_manager is not None:
+                run_manager.on_llm_new_token(piece.content, chunk=chunk)
+            yield chunk
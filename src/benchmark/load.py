@@ -0,0 +1,273 @@
+"""
+에이전트 부하 테스트 (OpenAI/Google/기상청 호출 없음)
+- 가짜 LLM(ScriptedChatModel) + 스텁 도구로 /chat 과 chat_stream 을 동시성 단계별로 호출
+- 처리량(req/s), 지연시간 p50/p95/p99, 노드별(call_model/run_tools/check_interrupt) 시간 측정
+- 프로세스 내 실행이면 LLM 토큰 수와 프롬프트 캐시 적중 비율(cached_input / input)도 기록 (바인딩한 도구 조합별 비율 포함)
+- MODEL_CASCADE=1 이면 fast/strong 단계별 호출 수, 토큰, 평균 지연시간도 기록
+
+실행 예:
+    python -m src.benchmark.load --concurrency 1,4,16 --requests 100
+    STUB_LLM_LATENCY=0.3 STUB_LLM_SCRIPT="get_weather;search_recipe" python -m src.benchmark.load --targets stream
+    python -m src.benchmark.load --url http://localhost:8000   # AGENT_LLM_BACKEND=stub 으로 띄운 서버 대상
+"""
+import argparse
+import functools
+import json
+import os
+import threading
+import time
+import uuid
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+# 서버/에이전트를 import 하기 전에 스텁 백엔드를 켠다
+os.environ.setdefault("AGENT_LLM_BACKEND", "stub")
+os.environ.setdefault("OPENAI_API_KEY", "sk-stub")
+
+from src.benchmark.retrieval import percentile
+from src.agent.cascade import FAST, STRONG
+from src.observability import LLM_TIER_LATENCY, LLM_TIER_TOKENS, LLM_TOKENS, LLM_TOOL_SET_TOKENS
+
+OUTPUT_DIR = "data/benchmark/"
+NODE_NAMES = ["load_profile", "call_model", "run_tools", "check_interrupt"]
+
+PROMPTS = [
+    "오늘 비 오는데 따뜻한 국물 요리 추천해줘",
+    "냉장고에 감자랑 양파밖에 없어",
+    "스트레스 받는데 매운 거 먹고 싶어",
+    "간단한 아침 메뉴 알려줘",
+]
+
+
+class NodeTimer:
+    """그래프 노드 실행 시간을 스레드 안전하게 수집"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def wrap(self, name: str, fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = (time.perf_counter() - start) * 1000
+                with self._lock:
+                    self.samples[name].append(elapsed)
+        return wrapper
+
+    def reset(self):
+        with self._lock:
+            self.samples = defaultdict(list)
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            samples = {name: list(values) for name, values in self.samples.items()}
+        return {
+            name: {
+                "calls": len(values),
+                "mean_ms": sum(values) / len(values),
+                "p50_ms": percentile(values, 50),
+                "p95_ms": percentile(values, 95),
+            }
+            for name, values in samples.items() if values
+        }
+
+
+# 에이전트의 노드 메서드를 타이머로 감싸고 그래프를 다시 컴파일한다
+def instrument_nodes(agent, timer: NodeTimer):
+    for name in NODE_NAMES:
+        setattr(agent, name, timer.wrap(name, getattr(agent, name)))
+    agent.graph = agent._build_graph()
+    return agent
+
+
+def tool_set_snapshot() -> Dict[str, Dict[str, float]]:
+    tool_sets: Dict[str, Dict[str, float]] = defaultdict(lambda: {"input": 0.0, "cached_input": 0.0})
+    for labels, value in LLM_TOOL_SET_TOKENS.series():
+        tool_sets[labels["tools"]][labels["direction"]] = value
+    return dict(tool_sets)
+
+
+def token_snapshot() -> Dict[str, float]:
+    snapshot = {d: LLM_TOKENS.value(direction=d) for d in ("input", "cached_input", "output")}
+    # 캐스케이드 단계별 호출 수 / 토큰 / 지연시간 합계
+    for tier in (FAST, STRONG):
+        latency_sum, calls = LLM_TIER_LATENCY.totals(tier=tier)
+        snapshot[f"{tier}_calls"] = calls
+        snapshot[f"{tier}_latency_s"] = latency_sum
+        snapshot[f"{tier}_tokens"] = sum(LLM_TIER_TOKENS.value(tier=tier, direction=d) for d in ("input", "output"))
+    return snapshot
+
+
+def token_delta(before: Dict[str, float]) -> Dict[str, float]:
+    after = token_snapshot()
+    delta = {d: after[d] - before[d] for d in after}
+    delta["cached_ratio"] = delta["cached_input"] / delta["input"] if delta["input"] else 0.0
+    for tier in (FAST, STRONG):
+        calls = delta[f"{tier}_calls"]
+        delta[f"{tier}_mean_ms"] = delta.pop(f"{tier}_latency_s") / calls * 1000 if calls else 0.0
+    return delta
+
+
+def tool_set_delta(before: Dict[str, Dict[str, float]]) -> Dict[str, Dict[str, float]]:
+    # 도구 조합별 입력/캐시 토큰과 적중 비율 (이번 단계에서 쓰인 조합만)
+    delta = {}
+    for tools, after in tool_set_snapshot().items():
+        prev = before.get(tools, {"input": 0.0, "cached_input": 0.0})
+        entry = {d: after[d] - prev[d] for d in after}
+        if entry["input"]:
+            entry["cached_ratio"] = entry["cached_input"] / entry["input"]
+            delta[tools] = entry
+    return delta
+
+
+def make_chat_caller(url: str = None) -> Callable[[str, str], None]:
+    if url:
+        import requests
+
+        session = requests.Session()
+
+        def call_remote(message: str, thread_id: str):
+            response = session.post(f"{url.rstrip('/')}/chat", json={"message": message, "thread_id": thread_id}, timeout=120)
+            response.raise_for_status()
+            if response.json()["message"].startswith("Error:"):
+                raise RuntimeError(response.json()["message"])
+        return call_remote
+
+    from fastapi.testclient import TestClient
+    from src import server
+
+    client = TestClient(server.app)
+
+    def call_local(message: str, thread_id: str):
+        response = client.post("/chat", json={"message": message, "thread_id": thread_id})
+        response.raise_for_status()
+        if response.json()["message"].startswith("Error:"):
+            raise RuntimeError(response.json()["message"])
+    return call_local
+
+
+def make_stream_caller(agent) -> Callable[[str, str], None]:
+    def call_stream(message: str, thread_id: str):
+        for _ in agent.chat_stream(message, thread_id=thread_id):
+            pass
+    return call_stream
+
+
+def run_level(call: Callable[[str, str], None], concurrency: int, total: int) -> Dict[str, Any]:
+    latencies_ms: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def one(i: int):
+        message = PROMPTS[i % len(PROMPTS)]
+        thread_id = f"load-{uuid.uuid4().hex[:8]}"
+        start = time.perf_counter()
+        try:
+            call(message, thread_id)
+            elapsed = (time.perf_counter() - start) * 1000
+            with lock:
+                latencies_ms.append(elapsed)
+        except Exception as e:
+            with lock:
+                errors.append(str(e))
+
+    wall_start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    wall = time.perf_counter() - wall_start
+
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": len(errors),
+        "error_samples": errors[:3],
+        "wall_s": wall,
+        "throughput_rps": len(latencies_ms) / wall if wall else 0.0,
+        "latency_ms": {
+            "p50": percentile(latencies_ms, 50),
+            "p95": percentile(latencies_ms, 95),
+            "p99": percentile(latencies_ms, 99),
+            "max": max(latencies_ms) if latencies_ms else 0.0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="스텁 LLM 기반 에이전트 부하 테스트")
+    parser.add_argument("--concurrency", default="1,4,16", help="동시성 단계 (쉼표 구분)")
+    parser.add_argument("--requests", type=int, default=50, help="단계별 요청 수")
+    parser.add_argument("--targets", default="chat,stream", help="chat(/chat 엔드포인트), stream(chat_stream)")
+    parser.add_argument("--url", default=None, help="외부 서버 URL (지정하면 /chat 을 HTTP로 호출)")
+    parser.add_argument("--output", default=None, help="결과 JSON 경로")
+    args = parser.parse_args()
+
+    levels = [int(c) for c in args.concurrency.split(",") if c.strip()]
+    targets = [t.strip() for t in args.targets.split(",") if t.strip()]
+    timer = NodeTimer()
+
+    report: Dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "llm_latency_s": float(os.getenv("STUB_LLM_LATENCY", "0.05")),
+        "tool_latency_s": float(os.getenv("STUB_TOOL_LATENCY", "0.02")),
+        "script": os.getenv("STUB_LLM_SCRIPT", "default"),
+        "results": [],
+    }
+
+    for target in targets:
+        if target == "chat":
+            call = make_chat_caller(args.url)
+            if not args.url:
+                from src import server
+                instrument_nodes(server.agent, timer)
+        elif target == "stream":
+            from src.benchmark.stubs import make_stub_agent
+            call = make_stream_caller(instrument_nodes(make_stub_agent(), timer))
+        else:
+            raise ValueError(f"Unknown target: {target}")
+
+        for concurrency in levels:
+            timer.reset()
+            tokens_before = token_snapshot()
+            tool_sets_before = tool_set_snapshot()
+            result = run_level(call, concurrency, args.requests)
+            result["target"] = target
+            result["nodes"] = timer.summary()
+            if not (target == "chat" and args.url):
+                result["tokens"] = token_delta(tokens_before)
+                result["tool_sets"] = tool_set_delta(tool_sets_before)
+            report["results"].append(result)
+
+            latency = result["latency_ms"]
+            print(
+                f"[{target}] c={concurrency} n={result['requests']} err={result['errors']} "
+                f"{result['throughput_rps']:.1f} req/s p50={latency['p50']:.0f}ms "
+                f"p95={latency['p95']:.0f}ms p99={latency['p99']:.0f}ms"
+            )
+            if "tokens" in result:
+                tokens = result["tokens"]
+                print(f"    tokens in={tokens['input']:.0f} cached={tokens['cached_input']:.0f} ({tokens['cached_ratio']:.0%}) out={tokens['output']:.0f}")
+                if tokens["fast_calls"]:
+                    print("    " + " ".join(
+                        f"{tier}: calls={tokens[f'{tier}_calls']:.0f} tokens={tokens[f'{tier}_tokens']:.0f} mean={tokens[f'{tier}_mean_ms']:.1f}ms"
+                        for tier in (FAST, STRONG)
+                    ))
+                for tools, entry in sorted(result["tool_sets"].items()):
+                    print(f"    tools[{tools}] in={entry['input']:.0f} cached={entry['cached_input']:.0f} ({entry['cached_ratio']:.0%})")
+            for node, stats in result["nodes"].items():
+                print(f"    {node:<16} calls={stats['calls']:<5} mean={stats['mean_ms']:.1f}ms p95={stats['p95_ms']:.1f}ms")
+
+    output = args.output or os.path.join(OUTPUT_DIR, f"load_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"결과 저장: {output}")
+
+
+if __name__ == "__main__":
+    main()
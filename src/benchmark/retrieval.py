@@ -0,0 +1,224 @@
+"""
+검색(RAG) 벤치마크
+- recipes.json과 지식 PDF에서 질의를 자동 생성
+- search_recipe / search_food_knowledge 의 recall@k, MRR, 지연시간(p50/p95/p99) 측정
+- 결과는 JSON으로 저장해서 인덱싱/임베딩 변경 전후를 숫자로 비교한다
+
+실행 예:
+    python -m src.benchmark.retrieval
+    python -m src.benchmark.retrieval --recipe-backend src.rag.retriever:search_recipe --output data/benchmark/run.json
+"""
+import argparse
+import importlib
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+RECIPE_DATA_PATH = "data/raw/recipes.json"
+KNOWLEDGE_PATH = "data/knowledge/"
+OUTPUT_DIR = "data/benchmark/"
+
+DEFAULT_RECIPE_BACKEND = "src.rag.retriever:search_recipe"
+DEFAULT_KNOWLEDGE_BACKEND = "src.rag.pdf_retriever:search_food_knowledge"
+
+# 두 검색 도구 모두 최대 TOP_K(3)개만 돌려주므로 그보다 큰 k는 재지 않는다
+K_VALUES = [1, 3]
+
+
+# "module.path:function" 형식의 문자열로 검색 함수를 불러온다
+def load_backend(path: str) -> Callable:
+    module_name, _, attr = path.partition(":")
+    module = importlib.import_module(module_name)
+    return getattr(module, attr)
+
+
+def _clean_keyword(keyword: str) -> str:
+    return keyword.lstrip("#").replace("/", " ")
+
+
+def _normalize_text(text: str) -> str:
+    return re.sub(r"\s+", " ", text or "").strip()
+
+
+# recipes.json에서 (질의, 정답 recipe_id) 목록 생성
+def build_recipe_queries(path: str = RECIPE_DATA_PATH) -> List[Dict[str, Any]]:
+    with open(path, "r", encoding="utf-8") as f:
+        recipes = json.load(f)
+
+    queries = []
+    for recipe in recipes:
+        recipe_id = recipe["recipe_id"]
+        ingredient_names = [ing["name"] for ing in recipe["ingredients"] if ing["name"].strip()][:4]
+        keywords = [_clean_keyword(k) for k in recipe["keywords"]]
+
+        queries.append({"kind": "name", "query": recipe["name"], "expected": recipe_id})
+        if ingredient_names:
+            queries.append({
+                "kind": "ingredients",
+                "query": f"{', '.join(ingredient_names)}로 만드는 요리",
+                "expected": recipe_id,
+            })
+        if keywords and ingredient_names:
+            queries.append({
+                "kind": "keywords",
+                "query": f"{' '.join(keywords)} {ingredient_names[0]}",
+                "expected": recipe_id,
+            })
+    return queries
+
+
+# 지식 PDF 청크에서 문장 일부를 잘라 질의로 사용한다 (정답 = 해당 문장을 포함하는 청크)
+def build_knowledge_queries(path: str = KNOWLEDGE_PATH, per_chunk_every: int = 3, seed: int = 42) -> List[Dict[str, Any]]:
+    from langchain_community.document_loaders import PyPDFDirectoryLoader
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    documents = PyPDFDirectoryLoader(path).load()
+    # pdf_builder.py와 같은 분할 기준
+    chunks = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200).split_documents(documents)
+
+    rng = random.Random(seed)
+    queries = []
+    for idx, chunk in enumerate(chunks):
+        if idx % per_chunk_every:
+            continue
+        sentences = [s for s in re.split(r"(?<=[.!?다])\s+", _normalize_text(chunk.page_content)) if len(s) >= 20]
+        if not sentences:
+            continue
+        sentence = rng.choice(sentences)[:120]
+        queries.append({
+            "kind": "pdf_sentence",
+            "query": sentence,
+            "expected": sentence,
+            "source": os.path.basename(chunk.metadata.get("source", "")),
+        })
+    return queries
+
+
+def recipe_rank(results: List[Dict[str, Any]], expected: str) -> Optional[int]:
+    for rank, item in enumerate(results, start=1):
+        if (item.get("metadata") or {}).get("recipe_id") == expected:
+            return rank
+    return None
+
+
+def knowledge_rank(results: List[Dict[str, Any]], expected: str) -> Optional[int]:
+    needle = _normalize_text(expected)
+    for rank, item in enumerate(results, start=1):
+        if needle in _normalize_text(item.get("content", "")):
+            return rank
+    return None
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[idx]
+
+
+def run_suite(
+    name: str,
+    search_fn: Callable,
+    input_model: Any,
+    queries: List[Dict[str, Any]],
+    rank_fn: Callable[[List[Dict[str, Any]], str], Optional[int]],
+    warmup: int = 3,
+) -> Dict[str, Any]:
+    # 모델 로딩/캐시 워밍업은 측정에서 제외
+    for q in queries[:warmup]:
+        search_fn(input_model(query=q["query"]))
+
+    latencies_ms = []
+    ranks = []
+    per_kind: Dict[str, List[Optional[int]]] = {}
+    for q in queries:
+        start = time.perf_counter()
+        results = search_fn(input_model(query=q["query"]))
+        latencies_ms.append((time.perf_counter() - start) * 1000)
+
+        rank = rank_fn(results, q["expected"])
+        ranks.append(rank)
+        per_kind.setdefault(q["kind"], []).append(rank)
+
+    def _quality(rank_list: List[Optional[int]]) -> Dict[str, float]:
+        total = len(rank_list) or 1
+        summary = {f"recall@{k}": sum(1 for r in rank_list if r and r <= k) / total for k in K_VALUES}
+        summary["mrr"] = sum(1 / r for r in rank_list if r) / total
+        summary["queries"] = len(rank_list)
+        return summary
+
+    return {
+        "suite": name,
+        "quality": _quality(ranks),
+        "quality_by_kind": {kind: _quality(r) for kind, r in per_kind.items()},
+        "latency_ms": {
+            "mean": sum(latencies_ms) / len(latencies_ms) if latencies_ms else 0.0,
+            "p50": percentile(latencies_ms, 50),
+            "p95": percentile(latencies_ms, 95),
+            "p99": percentile(latencies_ms, 99),
+            "max": max(latencies_ms) if latencies_ms else 0.0,
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="레시피/지식 검색 벤치마크")
+    parser.add_argument("--recipe-backend", default=DEFAULT_RECIPE_BACKEND)
+    parser.add_argument("--knowledge-backend", default=DEFAULT_KNOWLEDGE_BACKEND)
+    parser.add_argument("--suites", default="recipe,knowledge", help="실행할 스위트 (쉼표 구분)")
+    parser.add_argument("--limit", type=int, default=0, help="스위트당 최대 질의 수 (0이면 전체)")
+    parser.add_argument("--output", default=None, help="결과 JSON 경로")
+    args = parser.parse_args()
+
+    suites = [s.strip() for s in args.suites.split(",") if s.strip()]
+    report: Dict[str, Any] = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "backends": {},
+        "results": [],
+    }
+
+    if "recipe" in suites:
+        from src.rag.retriever import RecipeSearchInput
+
+        queries = build_recipe_queries()
+        if args.limit:
+            queries = queries[:args.limit]
+        report["backends"]["recipe"] = args.recipe_backend
+        report["results"].append(
+            run_suite("search_recipe", load_backend(args.recipe_backend), RecipeSearchInput, queries, recipe_rank)
+        )
+
+    if "knowledge" in suites:
+        from src.rag.pdf_retriever import KnowledgeSearchInput
+
+        queries = build_knowledge_queries()
+        if args.limit:
+            queries = queries[:args.limit]
+        report["backends"]["knowledge"] = args.knowledge_backend
+        report["results"].append(
+            run_suite("search_food_knowledge", load_backend(args.knowledge_backend), KnowledgeSearchInput, queries, knowledge_rank)
+        )
+
+    output = args.output or os.path.join(OUTPUT_DIR, f"retrieval_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+
+    for result in report["results"]:
+        quality = result["quality"]
+        latency = result["latency_ms"]
+        recalls = " ".join(f"recall@{k}={quality[f'recall@{k}']:.3f}" for k in K_VALUES)
+        print(
+            f"[{result['suite']}] n={quality['queries']} {recalls} mrr={quality['mrr']:.3f} "
+            f"p50={latency['p50']:.1f}ms p95={latency['p95']:.1f}ms p99={latency['p99']:.1f}ms"
+        )
+    print(f"결과 저장: {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""
+외부 API를 대신하는 스텁 핸들러
+- search_google, 기상청 날씨 API, 메모리(OpenAI 임베딩) 도구를 고정 응답 + 설정 가능한 지연으로 교체
+- make_stub_agent(): 가짜 LLM + 스텁 도구로 구성된 LangGraphAgent 생성 (OpenAI 호출 0회, cascade=True면 fast/strong 두 모델)
+"""
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from src.tools.search_tool import SearchInput
+from src.tools.weather_tool import GetWeatherInput
+from src.tools.memory_tools import ReadMemoryInput, WriteMemoryInput
+from src.benchmark.fake_llm import ScriptedChatModel, DEFAULT_SCRIPT
+
+STUB_TOOL_LATENCY = float(os.getenv("STUB_TOOL_LATENCY", "0.02"))
+
+
+def _sleep(latency: Optional[float]):
+    delay = STUB_TOOL_LATENCY if latency is None else latency
+    if delay > 0:
+        time.sleep(delay)
+
+
+def make_stub_search_google(latency: Optional[float] = None):
+    def stub_search_google(input: SearchInput) -> str:
+        _sleep(latency)
+        return f"- {input.query} (stub): 검색 결과 예시입니다.\n\n- 참고 자료 (stub): 두 번째 결과입니다."
+    return stub_search_google
+
+
+def make_stub_weather(latency: Optional[float] = None):
+    def stub_get_current_weather(input: GetWeatherInput) -> Dict[str, Any]:
+        _sleep(latency)
+        return {
+            "status": "stub",
+            "location": input.location,
+            "temperature": "12C",
+            "humidity": "80%",
+            "precipitation": "Rain",
+            "wind_speed": "3.0m/s",
+            "sky_status": "Rain",
+        }
+    return stub_get_current_weather
+
+
+def make_stub_read_memory(latency: Optional[float] = None):
+    def stub_read_memory(input: ReadMemoryInput) -> str:
+        _sleep(latency)
+        return '[{"content": "매운 음식을 좋아함", "type": "profile", "tags": "취향", "importance": 3}]'
+    return stub_read_memory
+
+
+def make_stub_profile_loader(latency: Optional[float] = None):
+    def stub_load_profile_memories(user_id: str) -> List[str]:
+        _sleep(latency)
+        return ["매운 음식을 좋아함", "땅콩 알레르기 있음"]
+    return stub_load_profile_memories
+
+
+def stub_profile_version(user_id: str) -> str:
+    return "stub"
+
+
+def make_stub_write_memory(latency: Optional[float] = None):
+    def stub_write_memory(input: WriteMemoryInput) -> str:
+        _sleep(latency)
+        return "Memory saved. (ID: stub)"
+    return stub_write_memory
+
+
+# 외부 네트워크를 타는 도구들의 핸들러만 스텁으로 교체 (스키마/설명은 그대로 유지)
+def install_stub_tools(registry, latency: Optional[float] = None):
+    stub_handlers = {
+        "search_google": make_stub_search_google(latency),
+        "get_weather": make_stub_weather(latency),
+        "read_memory": make_stub_read_memory(latency),
+        "write_memory": make_stub_write_memory(latency),
+    }
+    for name, handler in stub_handlers.items():
+        spec = registry._tools.get(name)
+        if spec is not None:
+            # 실제 API를 부르는 비동기 핸들러도 떼어낸다 (있으면 그쪽이 우선 실행됨)
+            registry.register_tool(spec.model_copy(update={"handler": handler, "async_handler": None}))
+    return registry
+
+
+def _script_from_env() -> List[List[str]]:
+    # 예: STUB_LLM_SCRIPT="get_weather;search_recipe,search_food_knowledge"
+    raw = os.getenv("STUB_LLM_SCRIPT")
+    if not raw:
+        return DEFAULT_SCRIPT
+    return [[name.strip() for name in turn.split(",") if name.strip()] for turn in raw.split(";") if turn.strip()]
+
+
+def make_stub_agent(
+    script: Optional[List[List[Any]]] = None,
+    llm_latency: Optional[float] = None,
+    tool_latency: Optional[float] = None,
+    cascade: Optional[bool] = None,
+    fast_script: Optional[List[List[Any]]] = None,
+    fast_confidence: Optional[float] = None,
+):
+    """
+    cascade=True(기본값은 MODEL_CASCADE)면 지연시간이 짧은 fast 가짜 모델을 하나 더 붙인다
+    - fast_script로 fast 단계만 다른 tool_calls(예: 스키마에 맞지 않는 인자)를 내게 해서 에스컬레이션을 확인할 수 있다
+    - fast_confidence(기본값은 STUB_FAST_CONFIDENCE)로 fast 답변의 logprobs를 정해서 확신도 검사를 확인할 수 있다
+    """
+    from src.agent.bot import LangGraphAgent
+    from src.agent.cascade import MODEL_CASCADE
+    from src.agent.tool_registry import register_default_tools
+
+    script = script if script is not None else _script_from_env()
+    latency = float(os.getenv("STUB_LLM_LATENCY", "0.05")) if llm_latency is None else llm_latency
+    jitter = float(os.getenv("STUB_LLM_JITTER", "0"))
+    llm = ScriptedChatModel(script=script, latency=latency, jitter=jitter, label="scripted-strong")
+
+    if fast_confidence is None and os.getenv("STUB_FAST_CONFIDENCE"):
+        fast_confidence = float(os.environ["STUB_FAST_CONFIDENCE"])
+    fast_llm = None
+    if MODEL_CASCADE if cascade is None else cascade:
+        fast_llm = ScriptedChatModel(
+            script=fast_script if fast_script is not None else script,
+            latency=float(os.getenv("STUB_FAST_LLM_LATENCY", str(latency / 3))),
+            jitter=jitter,
+            final_answer="김치찌개 어떠세요? (fast stub)",
+            label="scripted-fast",
+            confidence=fast_confidence,
+        )
+
+    registry = install_stub_tools(register_default_tools(), latency=tool_latency)
+    return LangGraphAgent(
+        llm=llm,
+        registry=registry,
+        extract_memory=False,
+        profile_loader=make_stub_profile_loader(tool_latency),
+        profile_versioner=stub_profile_version,
+        fast_llm=fast_llm,
+    )
@@ -0,0 +1,295 @@
+"""
+지연시간/카운터 메트릭과 구조화 로그
+- 외부 의존성 없이 Counter / Histogram 을 구현하고 Prometheus 텍스트 포맷으로 내보낸다
+- 서버의 /metrics 엔드포인트가 render_prometheus() 결과를 그대로 반환
+- log_event()는 한 줄 JSON 로그를 남긴다 (print 대체)
+"""
+import functools
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(key: LabelKey, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(key) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in pairs) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str):
+        self.name = name
+        self.help = help_text
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(_label_key(labels), 0.0)
+
+    def series(self) -> List[Tuple[Dict[str, str], float]]:
+        # 지금까지 기록된 라벨 조합과 값 (부하 테스트 리포트용)
+        with self._lock:
+            return [(dict(key), value) for key, value in self._values.items()]
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(sorted(buckets))
+        # label key -> [bucket counts..., sum, count]
+        self._values: Dict[LabelKey, List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            state = self._values.setdefault(key, [0.0] * (len(self.buckets) + 2))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+            state[-2] += value
+            state[-1] += 1
+
+    def totals(self, **labels) -> Tuple[float, float]:
+        # (합계, 개수)
+        with self._lock:
+            state = self._values.get(_label_key(labels))
+        return (state[-2], state[-1]) if state else (0.0, 0.0)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for i, bound in enumerate(self.buckets):
+                    lines.append(f"{self.name}_bucket{_format_labels(key, ('le', str(bound)))} {state[i]}")
+                lines.append(f"{self.name}_bucket{_format_labels(key, ('le', '+Inf'))} {state[-1]}")
+                lines.append(f"{self.name}_sum{_format_labels(key)} {state[-2]}")
+                lines.append(f"{self.name}_count{_format_labels(key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        with self._lock:
+            return self._metrics.setdefault(name, Counter(name, help_text))
+
+    def histogram(self, name: str, help_text: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        with self._lock:
+            return self._metrics.setdefault(name, Histogram(name, help_text, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# 그래프 / 도구
+NODE_LATENCY = REGISTRY.histogram("chefbot_node_latency_seconds", "LangGraph node execution time")
+TOOL_LATENCY = REGISTRY.histogram("chefbot_tool_latency_seconds", "ToolRegistry call time")
+TOOL_CALLS = REGISTRY.counter("chefbot_tool_calls_total", "Tool calls by tool and status")
+TOOL_ERRORS = REGISTRY.counter("chefbot_tool_errors_total", "Tool calls that returned an error")
+COALESCED_CALLS = REGISTRY.counter("chefbot_coalesced_calls_total", "Calls served by an identical in-flight call (scope=tool/chat)")
+TOOL_REJECTED = REGISTRY.counter("chefbot_tool_rejected_total", "Tool calls rejected by circuit breaker or bulkhead")
+TOOL_SELECTION_SIZE = REGISTRY.histogram(
+    "chefbot_tool_selection_size", "Number of tool schemas bound per LLM call", buckets=(1, 2, 3, 4, 5, 6, 8, 10, 12, 16)
+)
+
+# LLM
+LLM_TOKENS = REGISTRY.counter("chefbot_llm_tokens_total", "LLM tokens by direction (input/cached_input/output)")
+LLM_CACHE_RATIO = REGISTRY.histogram(
+    "chefbot_llm_cached_token_ratio", "Share of prompt tokens served from the provider prompt cache per call",
+    buckets=(0.0, 0.1, 0.25, 0.5, 0.75, 0.9, 1.0),
+)
+# 바인딩한 도구 조합별 입력/캐시 토큰: 도구 스키마가 프롬프트 맨 앞에 들어가므로 조합이 바뀌면 캐시 접두부가 끊긴다
+LLM_TOOL_SET_TOKENS = REGISTRY.counter(
+    "chefbot_llm_tool_set_tokens_total", "LLM prompt tokens by bound tool set and direction (input/cached_input)"
+)
+
+# 모델 캐스케이드 (fast → strong)
+LLM_TIER_CALLS = REGISTRY.counter("chefbot_llm_tier_calls_total", "call_model LLM calls by cascade tier (fast/strong)")
+LLM_TIER_TOKENS = REGISTRY.counter("chefbot_llm_tier_tokens_total", "LLM tokens by cascade tier and direction (input/output)")
+LLM_TIER_LATENCY = REGISTRY.histogram("chefbot_llm_tier_latency_seconds", "LLM call time by cascade tier")
+CASCADE_ESCALATIONS = REGISTRY.counter("chefbot_cascade_escalations_total", "Fast-tier responses sent to the strong tier by reason and outcome")
+
+# 임베딩 / 벡터 DB
+EMBEDDING_LATENCY = REGISTRY.histogram("chefbot_embedding_latency_seconds", "Embedding call time")
+EMBEDDING_TEXTS = REGISTRY.counter("chefbot_embedding_texts_total", "Texts sent to the embedding model")
+CHROMA_LATENCY = REGISTRY.histogram("chefbot_chroma_query_latency_seconds", "Chroma collection query time")
+
+# 메모리 추출 / 저장
+MEMORY_EXTRACT_LATENCY = REGISTRY.histogram("chefbot_memory_extract_latency_seconds", "Memory extractor time")
+MEMORY_EXTRACT_RESULTS = REGISTRY.counter("chefbot_memory_extract_total", "Memory extractor outcomes")
+MEMORY_WRITES = REGISTRY.counter("chefbot_memory_writes_total", "write_memory outcomes (inserted/merged)")
+MEMORY_COMPACTED = REGISTRY.counter("chefbot_memory_compacted_total", "Memories removed by compaction")
+MEMORY_EVICTED = REGISTRY.counter("chefbot_memory_evicted_total", "Episodic memories evicted by reason (ttl/cap)")
+
+# 서버 admission control / 스트리밍 (SSE)
+ADMISSION_WAIT = REGISTRY.histogram("chefbot_admission_wait_seconds", "Time admitted requests waited for a thread/global slot")
+ADMISSION_REJECTED = REGISTRY.counter("chefbot_admission_rejected_total", "Requests rejected by admission control (thread_busy/queue_full/queue_timeout)")
+STREAM_REQUESTS = REGISTRY.counter("chefbot_stream_requests_total", "SSE chat streams by endpoint and outcome (completed/interrupted/cancelled/error)")
+
+# 캐시 / 외부 API 쿼터
+CACHE_REQUESTS = REGISTRY.counter("chefbot_cache_requests_total", "Cache lookups by cache and result (hit/miss)")
+GOOGLE_SEARCH_REQUESTS = REGISTRY.counter("chefbot_google_search_requests_total", "Outbound Google Custom Search API calls")
+GOOGLE_QUOTA_DENIED = REGISTRY.counter("chefbot_google_quota_denied_total", "Google searches refused by the shared quota manager")
+
+
+def render_prometheus() -> str:
+    return REGISTRY.render()
+
+
+def record_cache(cache: str, hit: bool):
+    CACHE_REQUESTS.inc(cache=cache, result="hit" if hit else "miss")
+
+
+def record_llm_usage(message: Any, tool_set: Optional[str] = None, **labels) -> Optional[float]:
+    """
+    AIMessage.usage_metadata 가 있으면 입력/출력 토큰 수를 누적
+    - input_token_details.cache_read(프롬프트 캐시로 처리된 입력 토큰)도 따로 세고, 호출별 비율을 반환
+    - tool_set(바인딩한 도구 이름들)이 있으면 도구 조합별 입력/캐시 토큰도 누적
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    if usage.get("output_tokens"):
+        LLM_TOKENS.inc(usage["output_tokens"], direction="output", **labels)
+    input_tokens = usage.get("input_tokens")
+    if not input_tokens:
+        return None
+
+    cached = (usage.get("input_token_details") or {}).get("cache_read") or 0
+    LLM_TOKENS.inc(input_tokens, direction="input", **labels)
+    LLM_TOKENS.inc(cached, direction="cached_input", **labels)
+    if tool_set is not None:
+        LLM_TOOL_SET_TOKENS.inc(input_tokens, tools=tool_set, direction="input")
+        LLM_TOOL_SET_TOKENS.inc(cached, tools=tool_set, direction="cached_input")
+    ratio = cached / input_tokens
+    LLM_CACHE_RATIO.observe(ratio, **labels)
+    return ratio
+
+
+def record_tier_usage(tier: str, message: Any, elapsed: float):
+    # 캐스케이드 단계별 호출 수/지연시간/토큰 (전체 합계는 record_llm_usage의 LLM_TOKENS)
+    usage = getattr(message, "usage_metadata", None) or {}
+    LLM_TIER_CALLS.inc(tier=tier)
+    LLM_TIER_LATENCY.observe(elapsed, tier=tier)
+    if usage.get("input_tokens"):
+        LLM_TIER_TOKENS.inc(usage["input_tokens"], tier=tier, direction="input")
+    if usage.get("output_tokens"):
+        LLM_TIER_TOKENS.inc(usage["output_tokens"], tier=tier, direction="output")
+
+
+def observe_node(name: str, fn: Callable) -> Callable:
+    # LangGraph가 config 인자 여부를 판단할 수 있도록 시그니처는 functools.wraps로 보존
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        with NODE_LATENCY.time(node=name):
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class InstrumentedEmbeddings(Embeddings):
+    """임베딩 모델을 감싸서 호출 시간과 텍스트 수를 기록"""
+
+    def __init__(self, inner: Embeddings, backend: str):
+        self.inner = inner
+        self.backend = backend
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        EMBEDDING_TEXTS.inc(len(texts), backend=self.backend)
+        with EMBEDDING_LATENCY.time(backend=self.backend, kind="documents"):
+            return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        EMBEDDING_TEXTS.inc(backend=self.backend)
+        with EMBEDDING_LATENCY.time(backend=self.backend, kind="query"):
+            return self.inner.embed_query(text)
+
+
+# ---------------------------------------------------------------------------
+# 구조화 로그
+# ---------------------------------------------------------------------------
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)),
+            "level": record.levelname,
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", {}) or {})
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+_logging_configured = False
+_logging_lock = threading.Lock()
+
+
+def get_logger(name: str) -> logging.Logger:
+    global _logging_configured
+    with _logging_lock:
+        if not _logging_configured:
+            root = logging.getLogger("chefbot")
+            handler = logging.StreamHandler(sys.stdout)
+            handler.setFormatter(JsonFormatter())
+            root.addHandler(handler)
+            root.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+            root.propagate = False
+            _logging_configured = True
+    return logging.getLogger(f"chefbot.{name}")
+
+
+def log_event(logger: logging.Logger, event: str, level: int = logging.INFO, **fields):
+    logger.log(level, event, extra={"fields": fields})
@@ -0,0 +1,59 @@
+"""
+여러 질의를 한 번의 임베딩 배치 + 한 번의 Chroma 쿼리로 검색하는 헬퍼
+"""
+from typing import Any, Dict, List
+
+from src.observability import CHROMA_LATENCY
+
+
+# 빈 문자열과 중복 질의를 제거 (입력 순서는 유지)
+def normalize_queries(queries: List[str]) -> List[str]:
+    seen = set()
+    unique = []
+    for q in queries:
+        q = (q or "").strip()
+        if q and q not in seen:
+            seen.add(q)
+            unique.append(q)
+    return unique
+
+
+def multi_query_search(vector_db, embeddings, queries: List[str], k: int) -> List[Dict[str, Any]]:
+    """
+    질의 리스트를 한 번에 임베딩하고 컬렉션에 한 번에 질의한다.
+
+    Returns:
+        list: 문서 id 기준으로 중복 제거된 결과 (distance 오름차순)
+              각 항목은 {"id", "content", "metadata", "distance", "query"}
+    """
+    queries = normalize_queries(queries)
+    if not queries:
+        return []
+
+    # embed_documents는 입력 전체를 하나의 배치로 인코딩한다
+    query_vectors = embeddings.embed_documents(queries)
+
+    with CHROMA_LATENCY.time(collection=vector_db._collection.name):
+        raw = vector_db._collection.query(
+            query_embeddings=query_vectors,
+            n_results=k,
+            include=["documents", "metadatas", "distances"],
+        )
+
+    # 같은 문서가 여러 질의에서 나오면 가장 가까운 것 하나만 남긴다
+    best: Dict[str, Dict[str, Any]] = {}
+    for qi, query in enumerate(queries):
+        ids = raw["ids"][qi]
+        for pos, doc_id in enumerate(ids):
+            distance = raw["distances"][qi][pos]
+            if doc_id in best and best[doc_id]["distance"] <= distance:
+                continue
+            best[doc_id] = {
+                "id": doc_id,
+                "content": raw["documents"][qi][pos],
+                "metadata": raw["metadatas"][qi][pos] or {},
+                "distance": distance,
+                "query": query,
+            }
+
+    return sorted(best.values(), key=lambda r: r["distance"])
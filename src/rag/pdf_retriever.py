@@ -4,17 +4,21 @@ from langchain_huggingface import HuggingFaceEmbeddings
 from langchain_chroma import Chroma
 from dotenv import load_dotenv
 
+from src.rag.multi_query import multi_query_search
+from src.observability import InstrumentedEmbeddings
+
 load_dotenv()
 
 CHROMA_PATH = "data/chromaDB/"
 COLLECTION_NAME = "food_knowledge"
+TOP_K = 3
 
 # 임베딩 모델 및 경로 설정
-embeddings = HuggingFaceEmbeddings(
+embeddings = InstrumentedEmbeddings(HuggingFaceEmbeddings(
     model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
     model_kwargs={'device': 'cpu'}, # mps, cuda, cpu
     encode_kwargs={'normalize_embeddings': True}
-)
+), backend="minilm")
 
 # retriever.py와 유사
 try:
@@ -23,18 +27,24 @@ try:
         embedding_function=embeddings,
         collection_name=COLLECTION_NAME
     )
-    retriever = vector_db.as_retriever(search_kwargs={"k": 3})
+    retriever = vector_db.as_retriever(search_kwargs={"k": TOP_K})
 except Exception as e:
     print(f"DB load failed: {e}")
+    vector_db = None
     retriever = None
 
 class KnowledgeSearchInput(BaseModel):
-    query: str = Field(description="요리 상식, 영양 정보, 식재료 효능 등에 대한 질문")
+    query: str = Field(default="", description="요리 상식, 영양 정보, 식재료 효능 등에 대한 질문")
+    queries: List[str] = Field(default=[], description="여러 표현으로 한 번에 검색할 질문 리스트 (예: ['마늘 효능', '마늘 영양 성분'])")
+
+    def all_queries(self) -> List[str]:
+        return [self.query] + list(self.queries)
 
 def search_food_knowledge(input: KnowledgeSearchInput) -> List[Dict[str, Any]]:
-    if not retriever:
+    if vector_db is None:
         return [{"error": "Knowledge DB not available"}]
     
-    docs = retriever.invoke(input.query) # invoke가 실행되면 사용자 질의는 벡터화되어 ChromaDB에서 유사한 문서 3개를 검색
+    # 모든 질의를 한 번에 벡터화해서 검색하고, 여러 질의에서 겹친 청크는 하나로 합친다
+    docs = multi_query_search(vector_db, embeddings, input.all_queries(), k=TOP_K)
     
-    return [{"content": doc.page_content, "source": doc.metadata.get("source")} for doc in docs]
+    return [{"content": doc["content"], "source": doc["metadata"].get("source")} for doc in docs]
@@ -4,15 +4,19 @@ from langchain_chroma import Chroma
 from dotenv import load_dotenv
 from langchain_huggingface import HuggingFaceEmbeddings
 
+from src.rag.multi_query import multi_query_search
+from src.observability import InstrumentedEmbeddings
+
 load_dotenv()
 
 # 임베딩 모델 및 경로 설정
 CHROMA_PATH = "data/chromaDB/" 
-embeddings = HuggingFaceEmbeddings(
+TOP_K = 3
+embeddings = InstrumentedEmbeddings(HuggingFaceEmbeddings(
     model_name="sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2",
     model_kwargs={'device': 'cpu'}, # mps, cuda, cpu
     encode_kwargs={'normalize_embeddings': True}
-)
+), backend="minilm")
 
 # ChromaDB 인스턴스 로드
 try:
@@ -22,29 +26,36 @@ try:
     )
 
     # 유사한 문서 3개만 검색하도록 설정
-    retriever = vector_db.as_retriever(search_kwargs={"k": 3})
+    retriever = vector_db.as_retriever(search_kwargs={"k": TOP_K})
     print(f"Total {vector_db._collection.count()} documents indexed")
 
 except Exception as e:
     print(e)
+    vector_db = None
     retriever = None
 
 # LLM이 Tool을 호출할 때 (query) 항상 문자열로 받도록 정의
+# 표현만 다른 질의가 여러 개일 때는 queries로 한 번에 넘겨서 임베딩/검색을 한 번에 처리한다
 class RecipeSearchInput(BaseModel):
-    query: str = Field(description="사용자가 레시피를 찾기 위해 입력한 자연어 질문 (예: '오늘 비오는데 얼큰한 국물 요리')")
+    query: str = Field(default="", description="사용자가 레시피를 찾기 위해 입력한 자연어 질문 (예: '오늘 비오는데 얼큰한 국물 요리')")
+    queries: List[str] = Field(default=[], description="여러 표현으로 한 번에 검색할 질문 리스트 (예: ['얼큰한 국물 요리', '비 오는 날 찌개'])")
+
+    def all_queries(self) -> List[str]:
+        return [self.query] + list(self.queries)
 
 # 실제 검색 함수 구현
 def search_recipe(input: RecipeSearchInput) -> List[Dict[str, Any]]:
-    if retriever is None:
+    if vector_db is None:
         return [{"error": "RAG Retriever not loaded"}]
     
-    results_docs = retriever.invoke(input.query) # invoke가 실행되면 사용자 질의는 벡터화되어 ChromaDB에서 유사한 문서 3개를 검색
+    # 모든 질의를 한 번에 벡터화하고, ChromaDB에서 질의마다 유사한 문서 3개를 찾은 뒤 중복을 제거
+    results_docs = multi_query_search(vector_db, embeddings, input.all_queries(), k=TOP_K)
     
     results_list = []
     for doc in results_docs:
         results_list.append({
-            "content": doc.page_content, # e.g., recipe text
-            "metadata": doc.metadata # e.g., source, recipe_id
+            "content": doc["content"], # e.g., recipe text
+            "metadata": doc["metadata"] # e.g., source, recipe_id
         }) # 문서의 내용과 메타데이터가 포함된 딕셔너리 생성
         
-    return results_list
\ No newline at end of file
+    return results_list
@@ -1,13 +1,30 @@
-from fastapi import FastAPI
+import json
+import threading
+from typing import Any, Dict, Iterator, Optional
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from starlette.background import BackgroundTask
+from starlette.concurrency import run_in_threadpool
 import uvicorn
 from dotenv import load_dotenv
 
+from src.admission import PRIORITY_BATCH, PRIORITY_CHAT, PRIORITY_RESUME, AdmissionRejected, Ticket, admission
+from src.agent.batch import BatchRequest
 from src.agent.bot import make_agent
+from src.observability import STREAM_REQUESTS, get_logger, log_event, render_prometheus
+from src.agent.tool_loop import tool_loop
+from src.tools.http_client import aclose_async_clients, close_session
+from src.tools.weather_tool import start_weather_prefetcher
+from src.tools.memory_maintenance import start_memory_compactor
+from src.tools.memory_tools import access_log
 
 load_dotenv()
 
+logger = get_logger("server")
+
 app = FastAPI(
     title="AI Chef Bot API",
     description="AI Chef Bot API",
@@ -26,13 +43,49 @@ app.add_middleware(
 class ChatRequest(BaseModel):
     message: str
     thread_id: str = "default_thread"
+    user_id: Optional[str] = None  # 장기 기억을 나눠 쓰는 사용자 ID (없으면 기본 사용자)
+    budget_seconds: Optional[float] = None  # 요청 전체 시간 예산 (없으면 REQUEST_BUDGET_SECONDS)
+
+class ResumeRequest(BaseModel):
+    response: str  # 인터럽트 질문에 대한 사용자 답 (예: "네", "아니")
+    thread_id: str = "default_thread"
+    user_id: Optional[str] = None
+    budget_seconds: Optional[float] = None
 
 class ChatResponse(BaseModel):
     message: str
     thread_id: str
+    interrupted: bool = False  # True면 /chat/resume 으로 이어서 진행
 
 agent = make_agent()
 
+# 동시 실행 수/대기열을 넘는 요청은 기다리게 두지 않고 바로 429/503 + Retry-After
+@app.exception_handler(AdmissionRejected)
+def admission_rejected(request: Request, exc: AdmissionRejected):
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"error": exc.message, "reason": exc.reason},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+# 매시 발표 직후 주요 도시 날씨를 미리 받아두고, 주기적으로 장기 기억을 정리한다
+@app.on_event("startup")
+def start_background_jobs():
+    start_weather_prefetcher()
+    start_memory_compactor()
+
+# 도구용 공용 HTTP 커넥션 풀 정리
+# 비동기 클라이언트는 도구 이벤트 루프에 묶여 있으므로 그 루프에서 닫고 루프를 멈춘다
+@app.on_event("shutdown")
+def shutdown_http_clients():
+    close_session()
+    tool_loop.shutdown(cleanup=aclose_async_clients)
+
+# 아직 저장소에 반영하지 않은 기억 사용 기록 반영
+@app.on_event("shutdown")
+def flush_memory_access():
+    access_log.stop()
+
 @app.get("/")
 def read_root():
     return {
@@ -40,7 +93,12 @@ def read_root():
         "service": "AI Chef Bot API",
         "endpoints": {
             "chat": "/chat",
-            "health": "/health"
+            "chat_stream": "/chat/stream",
+            "chat_resume": "/chat/resume",
+            "chat_resume_stream": "/chat/resume/stream",
+            "chat_batch": "/chat/batch",
+            "health": "/health",
+            "metrics": "/metrics"
         }
     }
 
@@ -48,22 +106,151 @@ def read_root():
 def health_check():
     return {
         "status": "healthy",
-        "service": "AI Chef Bot API"
+        "service": "AI Chef Bot API",
+        "admission": admission.snapshot()
     }
 
+# Prometheus 텍스트 포맷 메트릭
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return PlainTextResponse(render_prometheus(), media_type="text/plain; version=0.0.4")
+
+def _chat_response(message: str, thread_id: str) -> ChatResponse:
+    return ChatResponse(
+        message=message,
+        thread_id=thread_id,
+        interrupted=message.startswith("[INTERRUPT]")
+    )
+
+# 새 스레드의 첫 턴은 같은 질문의 동시 요청과 결과를 공유 (CHAT_COALESCING)
 @app.post("/chat")
 def chat(request: ChatRequest) -> ChatResponse:
+    ticket = admission.acquire(request.thread_id, PRIORITY_CHAT)
     try:
-        response = agent.chat(request.message, thread_id=request.thread_id)
+        response = agent.chat_coalesced(
+            request.message,
+            thread_id=request.thread_id,
+            budget=request.budget_seconds,
+            user_id=request.user_id,
+        )
+        return _chat_response(response, request.thread_id)
+    except Exception as e:
         return ChatResponse(
-            message=response,
+            message=f"Error: {str(e)}",
             thread_id=request.thread_id
         )
+    finally:
+        ticket.release()
+
+# 인터럽트(Google 검색 한도 확인) 후 사용자 답으로 재개
+@app.post("/chat/resume")
+def chat_resume(request: ResumeRequest) -> ChatResponse:
+    # 사용자가 이미 기다리고 있던 턴의 마무리라서 새 질문보다 먼저 입장
+    ticket = admission.acquire(request.thread_id, PRIORITY_RESUME)
+    try:
+        response = agent.resume_chat(
+            request.response,
+            thread_id=request.thread_id,
+            budget=request.budget_seconds,
+            user_id=request.user_id,
+        )
+        return _chat_response(response, request.thread_id)
     except Exception as e:
         return ChatResponse(
             message=f"Error: {str(e)}",
             thread_id=request.thread_id
         )
+    finally:
+        ticket.release()
+
+
+def _sse(event: Dict[str, Any]) -> str:
+    return f"data: {json.dumps(event, ensure_ascii=False, default=str)}\n\n"
+
+
+async def _stream_sse(http_request: Request, endpoint: str, events: Iterator[Dict[str, Any]], cancel: threading.Event, ticket: Ticket):
+    """
+    agent 스트림 이벤트를 SSE로 전달
+    - 그래프는 동기 제너레이터라 이벤트 하나씩 스레드풀에서 꺼낸다
+    - 클라이언트 연결이 끊기면 cancel을 설정해서 남은 노드/LLM 호출을 하지 않게 한다
+    - 마지막에 {"type": "done"} (또는 {"type": "error"}) 이벤트를 보낸다
+    """
+    outcome = None
+    interrupted = False
+    try:
+        while True:
+            if await http_request.is_disconnected():
+                break
+            event = await run_in_threadpool(next, events, None)
+            if event is None:
+                outcome = "interrupted" if interrupted else "completed"
+                yield _sse({"type": "done"})
+                break
+            if event["type"] == "interrupt":
+                interrupted = True
+            yield _sse(event)
+    except Exception as e:
+        outcome = "error"
+        yield _sse({"type": "error", "error": str(e)})
+    finally:
+        # 끝까지 못 간 경우(연결 끊김, 전송 중 태스크 취소)는 모두 cancelled
+        outcome = outcome or "cancelled"
+        cancel.set()
+        ticket.release()
+        STREAM_REQUESTS.inc(endpoint=endpoint, outcome=outcome)
+        if outcome == "cancelled":
+            log_event(logger, "stream_cancelled", endpoint=endpoint)
+
+
+def _sse_response(http_request: Request, endpoint: str, events: Iterator[Dict[str, Any]], cancel: threading.Event, ticket: Ticket) -> StreamingResponse:
+    # 자리는 스트림이 끝날 때 반납 (스트림이 시작되지 못한 경우를 위해 background에서도 반납, 중복 반납은 무시)
+    return StreamingResponse(
+        _stream_sse(http_request, endpoint, events, cancel, ticket),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=BackgroundTask(ticket.release),
+    )
+
+# chat_stream 이벤트(token / tool_call / tool_result / ai_message / interrupt ...)를 SSE로 전달
+@app.post("/chat/stream")
+def chat_stream(request: ChatRequest, http_request: Request) -> StreamingResponse:
+    ticket = admission.acquire(request.thread_id, PRIORITY_CHAT)
+    cancel = threading.Event()
+    events = agent.chat_stream(
+        request.message,
+        thread_id=request.thread_id,
+        budget=request.budget_seconds,
+        user_id=request.user_id,
+        cancel=cancel,
+    )
+    return _sse_response(http_request, "chat_stream", events, cancel, ticket)
+
+@app.post("/chat/resume/stream")
+def chat_resume_stream(request: ResumeRequest, http_request: Request) -> StreamingResponse:
+    ticket = admission.acquire(request.thread_id, PRIORITY_RESUME)
+    cancel = threading.Event()
+    events = agent.stream_resume(
+        request.response,
+        thread_id=request.thread_id,
+        budget=request.budget_seconds,
+        user_id=request.user_id,
+        cancel=cancel,
+    )
+    return _sse_response(http_request, "chat_resume_stream", events, cancel, ticket)
+
+# 여러 항목을 한 번에 실행하고 끝나는 대로 항목별 결과를 JSONL로 전달
+# 항목마다 낮은 우선순위로 admission 자리를 잡고(거절되면 Retry-After 후 재시도), 동시 실행은 전체 한도의 절반까지
+@app.post("/chat/batch")
+def chat_batch(request: BatchRequest) -> StreamingResponse:
+    concurrency = min(request.concurrency, max(1, admission.max_concurrency // 2))
+    records = agent.batch_chat(
+        request.items,
+        concurrency=concurrency,
+        budget=request.budget_seconds,
+        admit=lambda thread_id: admission.acquire_with_retry(thread_id, PRIORITY_BATCH),
+    )
+    lines = (json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in records)
+    return StreamingResponse(lines, media_type="application/x-ndjson")
 
 if __name__ == "__main__":
     print("FastAPI server starting...")
@@ -1,31 +1,276 @@
-from pydantic import BaseModel
+"""
+안전한 계산기 + 레시피 분량 파싱
+- eval 대신 AST를 직접 해석해서 숫자 연산만 허용
+- 분수("1/2쪽"), 대분수("1+1/2큰술"), 범위("1~1.5개"), 단위가 붙은 숫자를 그대로 받을 수 있다
+- 범위 값은 구간 연산으로 계산해서 {"min", "max"} 로 돌려준다
+- 서로 다른 무게/부피 단위는 g/ml로 환산하고, 종류가 다른 단위가 섞이면 에러
+"""
+import ast
 import operator
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel, Field
+
+from src.observability import get_logger, log_event
+
+logger = get_logger("tools.calculator")
+
+MAX_EXPRESSION_LENGTH = 200
+MAX_EXPONENT = 10
+
+# 숫자: 1, 1.5, 1/2
+NUMBER_PATTERN = r"\d+(?:\.\d+)?(?:/\d+)?"
+# 재료 분량에서는 대분수(1+1/2)도 하나의 숫자로 본다 (계산식에서는 덧셈 우선순위를 지키기 위해 제외)
+AMOUNT_NUMBER_PATTERN = r"\d+(?:\.\d+)?(?:\s*\+\s*\d+/\d+|/\d+)?"
+# 숫자 바로 뒤에 붙은 단위 (예: 개, 큰술, ml, T)
+UNIT_PATTERN = r"[A-Za-z가-힣]+"
+# 단위를 떼어낸 뒤의 범위 (a)~(b). 식의 처음이나 연산자/여는 괄호 뒤의 '-'는 범위 끝값의 부호로 본다
+# (예: -3~2 → __range__(-(3), (2)), 5-3~4 는 5 - (3~4))
+RANGE_PATTERN = re.compile(r"(?:(?:^|(?<=[(+\-*/~,]))\s*(-)\s*)?(\([^()]*\))\s*~\s*(-)?\s*(\([^()]*\))")
+
+# 서로 다른 단위가 섞이면 g/ml 기준으로 환산한다 (한국 레시피 기준: 1컵 200ml, 1큰술(T) 15ml, 1작은술(t) 5ml)
+# 여기 없는 단위(개, 쪽, 대 등)는 같은 단위끼리만 계산할 수 있다
+UNIT_CONVERSIONS: Dict[str, Tuple[str, float]] = {
+    "mg": ("g", 0.001),
+    "g": ("g", 1),
+    "그램": ("g", 1),
+    "kg": ("g", 1000),
+    "킬로": ("g", 1000),
+    "킬로그램": ("g", 1000),
+    "ml": ("ml", 1),
+    "mL": ("ml", 1),
+    "cc": ("ml", 1),
+    "l": ("ml", 1000),
+    "L": ("ml", 1000),
+    "리터": ("ml", 1000),
+    "컵": ("ml", 200),
+    "큰술": ("ml", 15),
+    "T": ("ml", 15),
+    "작은술": ("ml", 5),
+    "t": ("ml", 5),
+}
+
+# 크기/규격을 나타내서 인분에 따라 늘리면 안 되는 단위
+NON_SCALABLE_UNITS = {"cm", "센티", "호"}
+
 
 class CalculatorInput(BaseModel):
-    expression: str
+    expression: str = Field(description="계산식. 분수/범위/단위 사용 가능 (예: '(1~1.5개) * 5 / 2', '300g + 1/2 * 200g', '2.5T * 3')")
+
+
+class Interval:
+    """범위 값 [lo, hi] (단일 숫자는 lo == hi)"""
+
+    def __init__(self, lo: float, hi: Optional[float] = None):
+        hi = lo if hi is None else hi
+        self.lo, self.hi = min(lo, hi), max(lo, hi)
+
+    @property
+    def is_scalar(self) -> bool:
+        return self.lo == self.hi
+
+    def __add__(self, other: "Interval") -> "Interval":
+        return Interval(self.lo + other.lo, self.hi + other.hi)
+
+    def __sub__(self, other: "Interval") -> "Interval":
+        return Interval(self.lo - other.hi, self.hi - other.lo)
+
+    def __mul__(self, other: "Interval") -> "Interval":
+        products = [self.lo * other.lo, self.lo * other.hi, self.hi * other.lo, self.hi * other.hi]
+        return Interval(min(products), max(products))
+
+    def __truediv__(self, other: "Interval") -> "Interval":
+        if other.lo <= 0 <= other.hi:
+            raise ZeroDivisionError("division by zero")
+        return self * Interval(1 / other.lo, 1 / other.hi)
+
+    def __neg__(self) -> "Interval":
+        return Interval(-self.hi, -self.lo)
+
+
+def _scalar_only(op):
+    def apply(a: Interval, b: Interval) -> Interval:
+        if not (a.is_scalar and b.is_scalar):
+            raise ValueError("This operator does not support ranges")
+        return Interval(op(a.lo, b.lo))
+    return apply
+
+
+def _power(a: Interval, b: Interval) -> Interval:
+    if not b.is_scalar or abs(b.lo) > MAX_EXPONENT:
+        raise ValueError(f"Exponent must be a number between -{MAX_EXPONENT} and {MAX_EXPONENT}")
+    exponent = b.lo
+    integral = exponent == int(exponent)
+    # 음수의 소수 거듭제곱은 복소수가 되므로 허용하지 않는다
+    if a.lo < 0 and not integral:
+        raise ValueError("Negative base requires an integer exponent")
+    if exponent < 0 and a.lo <= 0 <= a.hi:
+        raise ZeroDivisionError("division by zero")
+    low, high = a.lo ** exponent, a.hi ** exponent
+    # 0을 포함하는 범위의 짝수 거듭제곱은 최솟값이 0 (예: (-2~1)**2 → 0~4)
+    if integral and int(exponent) % 2 == 0 and a.lo < 0 < a.hi:
+        return Interval(0.0, max(low, high))
+    return Interval(low, high)
+
+
+BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: _scalar_only(operator.floordiv),
+    ast.Mod: _scalar_only(operator.mod),
+    ast.Pow: _power,
+}
+
+
+def _eval_node(node: ast.AST) -> Interval:
+    if isinstance(node, ast.Expression):
+        return _eval_node(node.body)
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return Interval(float(node.value))
+    if isinstance(node, ast.BinOp) and type(node.op) in BINARY_OPS:
+        return BINARY_OPS[type(node.op)](_eval_node(node.left), _eval_node(node.right))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.UAdd, ast.USub)):
+        value = _eval_node(node.operand)
+        return -value if isinstance(node.op, ast.USub) else value
+    # 범위는 전처리 단계에서 __range__(lo, hi) 호출로 바뀐다
+    if (
+        isinstance(node, ast.Call)
+        and isinstance(node.func, ast.Name)
+        and node.func.id == "__range__"
+        and len(node.args) == 2
+        and not node.keywords
+    ):
+        lo, hi = _eval_node(node.args[0]), _eval_node(node.args[1])
+        return Interval(lo.lo, hi.hi)
+    raise ValueError(f"Unsupported expression: {ast.dump(node)[:60]}")
 
-def calculate(inp: CalculatorInput) -> dict[str, float | str]:
-    print(f"[Tool] calculate: {inp.expression}")
-    ops = {
-        "+": operator.add,
-        "-": operator.sub,
-        "*": operator.mul,
-        "/": operator.truediv,
-    }
 
+def _unit_factors(units: List[str]) -> Tuple[Dict[str, float], Optional[str]]:
+    """
+    식에 나온 단위들로 (단위별 환산 비율, 결과 단위)를 정한다
+    - 단위가 하나뿐이면 환산 없이 그 단위
+    - 여러 단위가 같은 종류(무게/부피)면 g 또는 ml로 환산
+    - 종류가 다르거나 환산할 수 없는 단위가 섞이면 ValueError (그냥 더하면 틀린 숫자가 나온다)
+    """
+    distinct = sorted(set(units))
+    if len(distinct) <= 1:
+        return {}, distinct[0] if distinct else None
+    bases = {UNIT_CONVERSIONS[unit][0] if unit in UNIT_CONVERSIONS else None for unit in distinct}
+    if None in bases or len(bases) > 1:
+        raise ValueError(f"Cannot combine different units: {', '.join(distinct)}")
+    return {unit: UNIT_CONVERSIONS[unit][1] for unit in distinct}, bases.pop()
+
+
+def _preprocess(expression: str) -> Tuple[str, Optional[str]]:
+    """
+    자연어에 가까운 식을 파이썬 식으로 정리
+    - 단위는 떼어내서 결과 단위를 정하고(필요하면 g/ml로 환산), 범위(a~b)는 __range__(a, b)로 바꾼다
+    """
+    text = expression.replace("×", "*").replace("÷", "/").replace("，", ",")
+    text = re.sub(r"(?<=\d),(?=\d{3}(?!\d))", "", text)            # 1,000 → 1000 (1,000원 포함)
+    text = re.sub(r"(?<=\d)\s*[xX]\s*(?=[\d(])", "*", text)        # 2 x 3 → 2*3
+
+    # 범위의 단위는 뒤쪽에만 붙여 쓰므로 앞쪽 끝값에도 붙인다 (1~2kg → 1kg~2kg)
+    text = re.sub(rf"({NUMBER_PATTERN})(\s*~\s*-?\s*{NUMBER_PATTERN}\s*)({UNIT_PATTERN})", r"\1\3\2\3", text)
+    number_with_unit = rf"({NUMBER_PATTERN})\s*({UNIT_PATTERN})?"
+    units = [unit for _, unit in re.findall(number_with_unit, text) if unit]
+    factors, unit = _unit_factors(units)
+
+    def strip_unit(match: re.Match) -> str:
+        number, unit = match.group(1), match.group(2)
+        factor = factors.get(unit, 1) if unit else 1
+        return f"({number})" if factor == 1 else f"({number}*{factor})"
+
+    text = re.sub(number_with_unit, strip_unit, text)
+
+    def to_range(match: re.Match) -> str:
+        lo_sign, lo, hi_sign, hi = match.groups()
+        return f"__range__({lo_sign or ''}{lo}, {hi_sign or ''}{hi})"
+
+    text = RANGE_PATTERN.sub(to_range, text)
+    return text, unit
+
+
+def evaluate_expression(expression: str) -> Tuple[Interval, Optional[str]]:
+    if len(expression) > MAX_EXPRESSION_LENGTH:
+        raise ValueError(f"Expression too long (max {MAX_EXPRESSION_LENGTH} chars)")
+
+    prepared, unit = _preprocess(expression)
     try:
-        parts = inp.expression.split()
-        if len(parts) != 3:
-            raise ValueError("Format: 'number operator number' (e.g., '5 * 2')")
+        tree = ast.parse(prepared, mode="eval")
+    except SyntaxError:
+        raise ValueError(f"Invalid expression: {expression}")
 
-        num1, op, num2 = parts
-        num1 = float(num1)
-        num2 = float(num2)
+    return _eval_node(tree), unit
 
-        if op not in ops:
-            raise ValueError(f"Unsupported operator: {op}")
 
-        result = ops[op](num1, num2)
-        return {"result": result}
-    except (ValueError, ZeroDivisionError) as e:
+def format_number(value: float) -> str:
+    if abs(value - round(value)) < 1e-9:
+        return str(int(round(value)))
+    # 요리 분량은 1/2, 1/3, 1/4 처럼 읽는 게 자연스럽다
+    if 0 < value < 1:
+        for denominator in (2, 3, 4):
+            numerator = value * denominator
+            if abs(numerator - round(numerator)) < 0.02:
+                return f"{int(round(numerator))}/{denominator}"
+    return f"{value:.2f}".rstrip("0").rstrip(".")
+
+
+def calculate(inp: CalculatorInput) -> dict[str, Any]:
+    log_event(logger, "tool_call", tool="calculate", expression=inp.expression)
+    try:
+        value, unit = evaluate_expression(inp.expression)
+    except (ValueError, TypeError, ZeroDivisionError, OverflowError) as e:
         return {"error": str(e)}
+
+    if value.is_scalar:
+        result: Dict[str, Any] = {"result": value.lo}
+    else:
+        result = {"result": f"{format_number(value.lo)}~{format_number(value.hi)}", "min": value.lo, "max": value.hi}
+    if unit:
+        result["unit"] = unit
+    return result
+
+
+# ---------------------------------------------------------------------------
+# 재료 분량 문자열 스케일링 (scale_recipe에서 사용)
+# ---------------------------------------------------------------------------
+
+# "1~1.5개", "1-2대", "1+1/2큰술", "1줌반", "400g(3컵)" 의 숫자 부분
+AMOUNT_PATTERN = re.compile(rf"({AMOUNT_NUMBER_PATTERN})(?:\s*[~\-]\s*({AMOUNT_NUMBER_PATTERN}))?(\s*{UNIT_PATTERN})?")
+
+
+def _number_value(text: str) -> float:
+    return evaluate_expression(text)[0].lo
+
+
+def scale_amount(amount: str, factor: float) -> Optional[str]:
+    """
+    분량 문자열 안의 숫자를 factor 배로 바꾼다
+    숫자가 없는 분량("약간", "적당량" 등)은 None
+    """
+    if not AMOUNT_PATTERN.search(amount or ""):
+        return None
+
+    def replace(match: re.Match) -> str:
+        unit = (match.group(3) or "").strip()
+        if unit in NON_SCALABLE_UNITS:
+            return match.group(0)
+
+        lo = _number_value(match.group(1))
+        hi = _number_value(match.group(2)) if match.group(2) else None
+        # "1줌반", "2컵반" → 1.5줌, 2.5컵
+        if len(unit) > 1 and unit.endswith("반"):
+            unit = unit[:-1]
+            lo += 0.5
+            hi = hi + 0.5 if hi is not None else None
+
+        scaled = format_number(lo * factor)
+        if hi is not None:
+            scaled += f"~{format_number(hi * factor)}"
+        return f"{scaled}{unit}"
+
+    return AMOUNT_PATTERN.sub(replace, amount)
@@ -0,0 +1,210 @@
+"""
+도구(tools)용 공용 HTTP 클라이언트
+- 프로세스 전체에서 keep-alive 세션을 재사용 (호출마다 TCP/TLS 핸드셰이크를 하지 않음)
+- 호스트별 커넥션 수 제한, 지터가 섞인 지수 백오프 재시도, 도구별 타임아웃
+- 타임아웃은 요청 마감시간(deadline)의 남은 예산을 넘지 않는다
+- 외부 API의 base URL은 환경 변수로 바꿀 수 있어서 로컬 스텁 서버로 테스트 가능
+
+사용 예:
+    response = http_get(GOOGLE_SEARCH_URL, tool="search_google", params=params)
+    response = await async_http_get(KMA_WEATHER_URL, tool="weather", params=params)
+"""
+import asyncio
+import os
+import random
+import threading
+import time
+import weakref
+from typing import Any, Dict, Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.agent.deadline import current_remaining, timeout_for
+from src.observability import get_logger, log_event
+
+logger = get_logger("tools.http")
+
+# 외부 API 주소 (로컬 스텁 서버로 교체 가능)
+GOOGLE_SEARCH_URL = os.getenv("GOOGLE_SEARCH_URL", "https://www.googleapis.com/customsearch/v1")
+KMA_WEATHER_URL = os.getenv(
+    "KMA_WEATHER_URL", "http://apis.data.go.kr/1360000/VilageFcstInfoService_2.0/getUltraSrtNcst"
+)
+
+# 도구별 기본 타임아웃 (초)
+TOOL_TIMEOUTS: Dict[str, float] = {
+    "search_google": float(os.getenv("HTTP_TIMEOUT_SEARCH_GOOGLE", "8")),
+    "weather": float(os.getenv("HTTP_TIMEOUT_WEATHER", "5")),
+}
+DEFAULT_TIMEOUT = 10.0
+
+# 도구별 최대 재시도 횟수 (첫 시도 제외). Google은 쿼터를 쓰므로 적게
+TOOL_RETRIES: Dict[str, int] = {
+    "search_google": 1,
+    "weather": 2,
+}
+DEFAULT_RETRIES = 1
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+BACKOFF_BASE = 0.2
+BACKOFF_CAP = 2.0
+
+# 호스트 하나에 동시에 열어둘 수 있는 최대 커넥션 수
+MAX_CONNECTIONS_PER_HOST = int(os.getenv("HTTP_MAX_CONNECTIONS_PER_HOST", "10"))
+
+
+def backoff_delay(attempt: int) -> float:
+    # 지수 백오프 + full jitter
+    return random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * (2 ** attempt)))
+
+
+def _retry_sleep_allowed(delay: float) -> bool:
+    left = current_remaining()
+    return left is None or left > delay
+
+
+# ---------------------------------------------------------------------------
+# 동기 세션
+# ---------------------------------------------------------------------------
+
+_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+# 호스트별 동시 요청 자리 (커넥션 풀 크기와 같음)
+# requests는 풀에서 커넥션을 기다리는 시간(pool timeout)을 넘길 수 없어서 pool_block=True면 무한정 기다린다.
+# 대신 여기서 타임아웃을 걸고 자리를 잡은 요청만 보내므로, 풀이 넘치지도(pool_block=False) 무한정 막히지도 않는다
+_host_slots: Dict[str, threading.BoundedSemaphore] = {}
+
+
+def _host_slot(url: str) -> threading.BoundedSemaphore:
+    host = urlsplit(url).netloc
+    with _session_lock:
+        slot = _host_slots.get(host)
+        if slot is None:
+            slot = _host_slots[host] = threading.BoundedSemaphore(MAX_CONNECTIONS_PER_HOST)
+        return slot
+
+
+def get_session() -> requests.Session:
+    global _session
+    with _session_lock:
+        if _session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=8,
+                pool_maxsize=MAX_CONNECTIONS_PER_HOST,
+                pool_block=False,
+                max_retries=0,
+            )
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            _session = session
+        return _session
+
+
+def http_get(url: str, tool: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> requests.Response:
+    """
+    공용 세션으로 GET 요청
+    - 연결 오류/타임아웃/재시도 대상 상태코드(429, 5xx)이면 백오프 후 재시도
+    - 마지막 시도의 응답은 상태코드와 관계없이 그대로 반환 (raise_for_status는 호출자가 결정)
+    """
+    retries = TOOL_RETRIES.get(tool, DEFAULT_RETRIES)
+    session = get_session()
+    slot = _host_slot(url)
+
+    for attempt in range(retries + 1):
+        timeout = timeout_for(TOOL_TIMEOUTS.get(tool, DEFAULT_TIMEOUT))
+        try:
+            # 호스트의 커넥션이 모두 사용 중이면 최대 timeout(남은 예산 이내)까지만 기다린다
+            if not slot.acquire(timeout=timeout):
+                raise requests.Timeout(f"No free connection to {urlsplit(url).netloc} within {timeout:.1f}s")
+            try:
+                response = session.get(url, params=params, timeout=timeout, **kwargs)
+            finally:
+                slot.release()
+        except (requests.ConnectionError, requests.Timeout) as e:
+            delay = backoff_delay(attempt)
+            if attempt >= retries or not _retry_sleep_allowed(delay):
+                raise
+            log_event(logger, "http_retry", tool=tool, host=urlsplit(url).netloc, attempt=attempt + 1, error=str(e)[:200])
+            time.sleep(delay)
+            continue
+
+        if response.status_code in RETRY_STATUS and attempt < retries:
+            delay = backoff_delay(attempt)
+            if _retry_sleep_allowed(delay):
+                log_event(logger, "http_retry", tool=tool, host=urlsplit(url).netloc, attempt=attempt + 1, status=response.status_code)
+                response.close()
+                time.sleep(delay)
+                continue
+        return response
+
+
+# ---------------------------------------------------------------------------
+# 비동기 클라이언트 (호스트별로 하나씩, 이벤트 루프마다 분리)
+# 보통은 도구 이벤트 루프(agent.tool_loop) 하나에서만 쓰인다
+# ---------------------------------------------------------------------------
+
+# 루프 객체를 약한 참조 키로 쓴다: 루프가 사라지면 그 루프에 묶인 클라이언트도 같이 사라지고,
+# id 재사용으로 죽은 루프의 클라이언트를 돌려주는 일이 없다
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, httpx.AsyncClient]]" = weakref.WeakKeyDictionary()
+_async_lock = threading.Lock()
+
+
+def get_async_client(url: str) -> httpx.AsyncClient:
+    loop = asyncio.get_running_loop()
+    host = urlsplit(url).netloc
+    with _async_lock:
+        clients = _async_clients.setdefault(loop, {})
+        client = clients.get(host)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS_PER_HOST,
+                    max_keepalive_connections=MAX_CONNECTIONS_PER_HOST,
+                ),
+            )
+            clients[host] = client
+        return client
+
+
+async def async_http_get(url: str, tool: str, params: Optional[Dict[str, Any]] = None, **kwargs) -> httpx.Response:
+    retries = TOOL_RETRIES.get(tool, DEFAULT_RETRIES)
+    client = get_async_client(url)
+
+    for attempt in range(retries + 1):
+        timeout = timeout_for(TOOL_TIMEOUTS.get(tool, DEFAULT_TIMEOUT))
+        try:
+            response = await client.get(url, params=params, timeout=timeout, **kwargs)
+        except (httpx.ConnectError, httpx.TimeoutException, httpx.RemoteProtocolError) as e:
+            delay = backoff_delay(attempt)
+            if attempt >= retries or not _retry_sleep_allowed(delay):
+                raise
+            log_event(logger, "http_retry", tool=tool, host=urlsplit(url).netloc, attempt=attempt + 1, error=str(e)[:200])
+            await asyncio.sleep(delay)
+            continue
+
+        if response.status_code in RETRY_STATUS and attempt < retries:
+            delay = backoff_delay(attempt)
+            if _retry_sleep_allowed(delay):
+                log_event(logger, "http_retry", tool=tool, host=urlsplit(url).netloc, attempt=attempt + 1, status=response.status_code)
+                await asyncio.sleep(delay)
+                continue
+        return response
+
+
+async def aclose_async_clients():
+    # 클라이언트는 만든 루프에서만 닫을 수 있으므로 지금 실행 중인 루프의 것만 정리
+    with _async_lock:
+        clients = _async_clients.pop(asyncio.get_running_loop(), {})
+    for client in clients.values():
+        await client.aclose()
+
+
+def close_session():
+    global _session
+    with _session_lock:
+        if _session is not None:
+            _session.close()
+            _session = None
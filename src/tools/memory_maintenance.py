@@ -0,0 +1,368 @@
+"""
+장기 기억(memory_store) 관리 명령
+- migrate: 한 임베딩 백엔드의 컬렉션을 다른 백엔드로 다시 임베딩해서 옮긴다
+  원본 벡터는 쓰지 않고 문서/메타데이터만 읽으므로 원본 백엔드(OpenAI) 호출이 없다
+- assign-user: user_id가 없는(사용자 구분 도입 전) 기억에 사용자 ID를 채운다
+- compact: 사용자별로 비슷한 기억을 묶어 하나로 합치고 나머지 벡터를 지운다
+- evict: 오래 쓰이지 않은 episodic 기억(TTL)과 사용자별 개수 상한을 넘는 episodic 기억을 지운다
+  compact/evict는 user_id가 없는 기억을 기본 사용자에 먼저 배정하므로 assign-user 실행 순서에 의존하지 않는다
+  서버에서는 MemoryCompactor 스레드가 compact + evict 를 주기적으로 실행한다
+
+실행 예:
+    python -m src.tools.memory_maintenance migrate --source openai --target local
+    python -m src.tools.memory_maintenance assign-user --user-id default
+    python -m src.tools.memory_maintenance compact --similarity 0.85
+    python -m src.tools.memory_maintenance evict --ttl-days 30 --max-episodic 200
+"""
+import argparse
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from src.observability import MEMORY_COMPACTED, MEMORY_EVICTED, get_logger, log_event
+from src.tools.memory_tools import (
+    COLLECTION_NAMES, DEFAULT_USER_ID, MEMORY_EMBEDDING_BACKEND, access_log, embeddings,
+    make_memory_embeddings, merge_tags, open_memory_store, recency, user_filter, vector_store,
+)
+
+logger = get_logger("tools.memory_maintenance")
+
+MIGRATION_BATCH_SIZE = 64
+# 같은 묶음으로 볼 코사인 유사도 (쓰기 시점 중복 검사보다 느슨하게)
+COMPACTION_SIMILARITY = float(os.getenv("MEMORY_COMPACTION_SIMILARITY", "0.85"))
+# episodic 기억: 마지막 사용 후 보관 기간 / 사용자별 최대 개수
+EPISODIC_TTL_DAYS = float(os.getenv("MEMORY_EPISODIC_TTL_DAYS", "30"))
+EPISODIC_MAX_PER_USER = int(os.getenv("MEMORY_EPISODIC_MAX_PER_USER", "200"))
+# 주기 실행 간격 (0이면 서버에서 실행하지 않음)
+COMPACTION_INTERVAL_HOURS = float(os.getenv("MEMORY_COMPACTION_INTERVAL_HOURS", "6"))
+
+
+class _NoEmbeddings(Embeddings):
+    """원본 컬렉션은 읽기만 하므로 임베딩 모델을 로드하지 않는다"""
+
+    def embed_documents(self, texts):
+        raise RuntimeError("source collection is read-only during migration")
+
+    def embed_query(self, text):
+        raise RuntimeError("source collection is read-only during migration")
+
+
+def _with_user(metadatas: List[Optional[Dict[str, Any]]], user_id: str) -> List[Dict[str, Any]]:
+    return [{**(m or {}), "user_id": (m or {}).get("user_id") or user_id} for m in metadatas]
+
+
+def migrate_memories(
+    source: str, target: str, batch_size: int = MIGRATION_BATCH_SIZE, default_user_id: str = DEFAULT_USER_ID
+) -> Dict[str, Any]:
+    """
+    source 컬렉션의 모든 기억을 target 백엔드로 임베딩해서 같은 id로 upsert
+    - 여러 번 실행해도 결과가 같다 (id 기준 덮어쓰기)
+    - user_id가 없는 기억은 default_user_id로 채운다
+    """
+    if source == target:
+        raise ValueError("source and target backends must differ")
+
+    source_collection = open_memory_store(source, embedding_function=_NoEmbeddings())._collection
+    target_embeddings = make_memory_embeddings(target)
+    target_collection = open_memory_store(target, embedding_function=target_embeddings)._collection
+
+    total = source_collection.count()
+    migrated = 0
+    for offset in range(0, total, batch_size):
+        batch = source_collection.get(offset=offset, limit=batch_size, include=["documents", "metadatas"])
+        if not batch["ids"]:
+            break
+        vectors = target_embeddings.embed_documents(batch["documents"])
+        target_collection.upsert(
+            ids=batch["ids"],
+            documents=batch["documents"],
+            metadatas=_with_user(batch["metadatas"], default_user_id),
+            embeddings=vectors,
+        )
+        migrated += len(batch["ids"])
+        log_event(logger, "memory_migrate_batch", migrated=migrated, total=total)
+
+    result = {
+        "source": COLLECTION_NAMES[source],
+        "target": COLLECTION_NAMES[target],
+        "migrated": migrated,
+        "target_count": target_collection.count(),
+    }
+    log_event(logger, "memory_migrated", **result)
+    return result
+
+
+def _fill_missing_user(collection, user_id: str) -> int:
+    data = collection.get(include=["metadatas"])
+    missing = [(i, m) for i, m in zip(data["ids"], data["metadatas"]) if not (m or {}).get("user_id")]
+    if missing:
+        ids = [i for i, _ in missing]
+        collection.update(ids=ids, metadatas=_with_user([m for _, m in missing], user_id))
+        log_event(logger, "memory_user_assigned", user_id=user_id, updated=len(missing))
+    return len(missing)
+
+
+def assign_user(user_id: str = DEFAULT_USER_ID, backend: str = MEMORY_EMBEDDING_BACKEND) -> int:
+    """user_id가 없는 기억에 user_id를 채운다 (메타데이터만 갱신, 다시 임베딩하지 않음)"""
+    collection = open_memory_store(backend, embedding_function=_NoEmbeddings())._collection
+    return _fill_missing_user(collection, user_id)
+
+
+def _scope_user(collection, user_id: str):
+    # user_id가 없는 예전 기억은 기본 사용자의 것으로 본다 (list_user_ids와 같은 규칙)
+    # where={"user_id": ...} 필터에 잡히지 않으므로 compact/evict 전에 기본 사용자로 채운다
+    # assign-user를 먼저 실행했는지와 관계없이 같은 결과가 나온다
+    if user_id == DEFAULT_USER_ID:
+        _fill_missing_user(collection, DEFAULT_USER_ID)
+
+
+# ---------------------------------------------------------------------------
+# 압축(compaction)
+# ---------------------------------------------------------------------------
+
+def cluster_memories(vectors: np.ndarray, metadatas: List[Dict[str, Any]], threshold: float) -> List[List[int]]:
+    """
+    중요도가 높은 기억부터 씨앗으로 삼아, 같은 타입이면서 유사도가 threshold 이상인 기억을 묶는다
+    - 벡터는 정규화되어 있으므로 내적이 곧 코사인 유사도
+    """
+    order = sorted(range(len(metadatas)), key=lambda i: -int(metadatas[i].get("importance") or 0))
+    similarity = vectors @ vectors.T
+    assigned = set()
+    clusters = []
+    for seed in order:
+        if seed in assigned:
+            continue
+        members = [
+            j for j in order
+            if j not in assigned
+            and metadatas[j].get("type") == metadatas[seed].get("type")
+            and similarity[seed, j] >= threshold
+        ]
+        assigned.update(members)
+        clusters.append(members)
+    return clusters
+
+
+def modified_at(metadata: Dict[str, Any]) -> float:
+    return float(metadata.get("updated_at") or metadata.get("created_at") or 0)
+
+
+def representative_summary(documents: List[str]) -> str:
+    # 기본 요약: 가장 최근 기억의 문장을 그대로 사용 (LLM 호출 없음, 바뀐 사실이 예전 사실에 덮이지 않게)
+    return documents[0]
+
+
+def compact_user(
+    user_id: str,
+    threshold: float = COMPACTION_SIMILARITY,
+    summarize: Callable[[List[str]], str] = representative_summary,
+) -> int:
+    """
+    한 사용자의 기억을 묶어서 묶음마다 하나만 남긴다
+    - 남는 기억은 묶음에서 가장 최근에 만들어졌거나 수정된 기억 (id와 문장), 중요도는 최댓값 / 태그는 합집합
+    - summarize에는 최신 순으로 정렬된 문장을 넘긴다
+    - user_id가 없는 예전 기억은 기본 사용자(DEFAULT_USER_ID)의 기억으로 채운 뒤 함께 다룬다
+    Returns:
+        int: 지운 기억 수
+    """
+    collection = vector_store._collection
+    _scope_user(collection, user_id)
+    data = collection.get(where={"user_id": user_id}, include=["documents", "metadatas", "embeddings"])
+    if len(data["ids"]) < 2:
+        return 0
+
+    vectors = np.asarray(data["embeddings"], dtype=float)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    metadatas = [m or {} for m in data["metadatas"]]
+
+    removed: List[str] = []
+    for members in cluster_memories(vectors, metadatas, threshold):
+        if len(members) < 2:
+            continue
+        # 반대되는 사실도 같은 묶음에 들어오므로 중요도가 아니라 최신 기억을 남긴다
+        members = sorted(members, key=lambda i: -modified_at(metadatas[i]))
+        seed = members[0]
+        documents = [data["documents"][i] for i in members]
+        content = summarize(documents)
+        metadata = {
+            **metadatas[seed],
+            "importance": max(int(metadatas[i].get("importance") or 0) for i in members),
+            "tags": merge_tags(*(metadatas[i].get("tags") for i in members)),
+            # 다른 프로세스의 profile_version도 바뀌도록 수정 시각 기록
+            "updated_at": time.time(),
+        }
+        # 요약 문장이 바뀐 경우에만 다시 임베딩
+        vector = vectors[seed].tolist() if content == documents[0] else embeddings.embed_documents([content])[0]
+        collection.upsert(ids=[data["ids"][seed]], documents=[content], metadatas=[metadata], embeddings=[vector])
+        removed.extend(data["ids"][i] for i in members[1:])
+
+    if removed:
+        collection.delete(ids=removed)
+        MEMORY_COMPACTED.inc(len(removed))
+    log_event(logger, "memory_compacted", user_id=user_id, before=len(data["ids"]), removed=len(removed))
+    return len(removed)
+
+
+def list_user_ids() -> List[str]:
+    # 메타데이터만 훑어서 사용자 목록을 만든다 (이후 작업은 한 번에 한 사용자씩)
+    metadatas = vector_store._collection.get(include=["metadatas"])["metadatas"]
+    return sorted({(m or {}).get("user_id") or DEFAULT_USER_ID for m in metadatas})
+
+
+def compact_memories(
+    threshold: float = COMPACTION_SIMILARITY,
+    summarize: Callable[[List[str]], str] = representative_summary,
+) -> Dict[str, int]:
+    # 묶음에서 남길 기억을 고르기 전에 이 프로세스에 쌓인 사용 기록부터 반영
+    access_log.flush()
+    return {user_id: compact_user(user_id, threshold, summarize) for user_id in list_user_ids()}
+
+
+# ---------------------------------------------------------------------------
+# episodic 기억 정리 (eviction)
+# ---------------------------------------------------------------------------
+
+def retention_score(metadata: Dict[str, Any], now: float) -> float:
+    # 남길 가치: 중요도 + 최근성 + 자주 꺼내 쓴 정도 (상한을 넘을 때 낮은 것부터 지운다)
+    importance = int(metadata.get("importance") or 0) / 5
+    accesses = min(int(metadata.get("access_count") or 0), 10) / 10
+    return importance + recency(metadata, now) + 0.5 * accesses
+
+
+def evict_user(
+    user_id: str,
+    ttl_days: float = EPISODIC_TTL_DAYS,
+    max_episodic: int = EPISODIC_MAX_PER_USER,
+    now: Optional[float] = None,
+) -> Dict[str, int]:
+    now = now or time.time()
+    collection = vector_store._collection
+    _scope_user(collection, user_id)
+    data = collection.get(where=user_filter(user_id, type="episodic"), include=["metadatas"])
+    entries = list(zip(data["ids"], [m or {} for m in data["metadatas"]]))
+
+    # 시각 정보가 없는 예전 기억은 지금부터 나이를 센다
+    unstamped = [(i, m) for i, m in entries if not m.get("last_accessed_at")]
+    if unstamped:
+        stamped = [{**m, "created_at": m.get("created_at") or now, "last_accessed_at": now} for _, m in unstamped]
+        collection.update(ids=[i for i, _ in unstamped], metadatas=stamped)
+        entries = [(i, m) for i, m in entries if m.get("last_accessed_at")] + list(zip([i for i, _ in unstamped], stamped))
+
+    ttl_seconds = ttl_days * 86400
+    expired = [i for i, m in entries if now - float(m["last_accessed_at"]) > ttl_seconds]
+    expired_ids = set(expired)
+    alive = sorted(
+        [(i, m) for i, m in entries if i not in expired_ids],
+        key=lambda e: -retention_score(e[1], now),
+    )
+    over_cap = [i for i, _ in alive[max_episodic:]]
+
+    if expired or over_cap:
+        collection.delete(ids=expired + over_cap)
+    if expired:
+        MEMORY_EVICTED.inc(len(expired), reason="ttl")
+    if over_cap:
+        MEMORY_EVICTED.inc(len(over_cap), reason="cap")
+    result = {"ttl": len(expired), "cap": len(over_cap)}
+    log_event(logger, "memory_evicted", user_id=user_id, episodic=len(entries), **result)
+    return result
+
+
+def evict_memories(ttl_days: float = EPISODIC_TTL_DAYS, max_episodic: int = EPISODIC_MAX_PER_USER) -> Dict[str, Dict[str, int]]:
+    # 최근에 꺼내 쓴 기억이 TTL로 지워지지 않도록 사용 기록부터 반영
+    access_log.flush()
+    return {user_id: evict_user(user_id, ttl_days, max_episodic) for user_id in list_user_ids()}
+
+
+def llm_summary(documents: List[str]) -> str:
+    """비슷한 기억들을 한 문장으로 요약 (--llm 옵션)"""
+    from src.agent.memory_extractor import EXTRACTOR_MODEL, get_client
+
+    completion = get_client().chat.completions.create(
+        model=EXTRACTOR_MODEL,
+        messages=[
+            {"role": "system", "content": "다음은 같은 사용자에 대한 비슷한 기억들이며 최신 순으로 주어집니다. 빠지는 사실 없이 한 문장으로 합쳐 주세요. 서로 어긋나는 내용은 먼저 나온(최신) 기억을 따르세요. 문장만 출력하세요."},
+            {"role": "user", "content": "\n".join(f"- {d}" for d in documents)},
+        ],
+    )
+    return completion.choices[0].message.content.strip() or documents[0]
+
+
+class MemoryCompactor(threading.Thread):
+    def __init__(self, interval_hours: float = COMPACTION_INTERVAL_HOURS):
+        super().__init__(name="memory-compactor", daemon=True)
+        self.interval = interval_hours * 3600
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                compact_memories()
+                evict_memories()
+            except Exception as e:
+                log_event(logger, "memory_compaction_error", error=str(e))
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_compactor: Optional[MemoryCompactor] = None
+_compactor_lock = threading.Lock()
+
+
+def start_memory_compactor() -> Optional[MemoryCompactor]:
+    # MEMORY_COMPACTION_INTERVAL_HOURS=0 이면 시작하지 않음 (프로세스당 하나)
+    global _compactor
+    if COMPACTION_INTERVAL_HOURS <= 0:
+        return None
+    with _compactor_lock:
+        if _compactor is None:
+            _compactor = MemoryCompactor()
+            _compactor.start()
+        return _compactor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="장기 기억 저장소 관리")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    migrate = sub.add_parser("migrate", help="다른 임베딩 백엔드로 기억을 다시 임베딩")
+    migrate.add_argument("--source", choices=sorted(COLLECTION_NAMES), default="openai")
+    migrate.add_argument("--target", choices=sorted(COLLECTION_NAMES), default="local")
+    migrate.add_argument("--batch-size", type=int, default=MIGRATION_BATCH_SIZE)
+    migrate.add_argument("--default-user-id", default=DEFAULT_USER_ID, help="user_id가 없는 기억에 채울 사용자")
+
+    assign = sub.add_parser("assign-user", help="user_id가 없는 기억에 사용자 ID 채우기")
+    assign.add_argument("--user-id", default=DEFAULT_USER_ID)
+    assign.add_argument("--backend", choices=sorted(COLLECTION_NAMES), default=MEMORY_EMBEDDING_BACKEND)
+
+    compact = sub.add_parser("compact", help="사용자별로 비슷한 기억을 하나로 합치기")
+    compact.add_argument("--similarity", type=float, default=COMPACTION_SIMILARITY)
+    compact.add_argument("--llm", action="store_true", help="묶인 기억을 LLM으로 한 문장 요약 (기본: 가장 중요한 기억 문장 유지)")
+
+    evict = sub.add_parser("evict", help="오래되었거나 상한을 넘는 episodic 기억 지우기")
+    evict.add_argument("--ttl-days", type=float, default=EPISODIC_TTL_DAYS)
+    evict.add_argument("--max-episodic", type=int, default=EPISODIC_MAX_PER_USER)
+
+    args = parser.parse_args()
+    if args.command == "evict":
+        evicted = evict_memories(args.ttl_days, args.max_episodic)
+        total = sum(r["ttl"] + r["cap"] for r in evicted.values())
+        print(f"{total}개 episodic 기억을 지웠습니다 ({len(evicted)}명)")
+    elif args.command == "compact":
+        removed = compact_memories(args.similarity, llm_summary if args.llm else representative_summary)
+        print(f"{sum(removed.values())}개 기억을 정리했습니다 ({len(removed)}명)")
+    elif args.command == "migrate":
+        result = migrate_memories(args.source, args.target, args.batch_size, args.default_user_id)
+        print(f"{result['migrated']}개 기억을 {result['source']} → {result['target']}로 옮겼습니다 (총 {result['target_count']}개)")
+    elif args.command == "assign-user":
+        updated = assign_user(args.user_id, args.backend)
+        print(f"{updated}개 기억에 user_id={args.user_id}를 채웠습니다")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,333 @@
+import json
+import os
+import threading
+import time
 import uuid
-from typing import List, Optional, Literal
+from typing import Dict, List, Optional, Literal, Tuple
 from pydantic import BaseModel, Field
-from langchain_openai import OpenAIEmbeddings
+from pydantic.json_schema import SkipJsonSchema
+from langchain_core.embeddings import Embeddings
 from langchain_chroma import Chroma
 from dotenv import load_dotenv
 
+from src.observability import CHROMA_LATENCY, MEMORY_WRITES, InstrumentedEmbeddings, get_logger, log_event
+
 load_dotenv()
 
+logger = get_logger("tools.memory")
+
 CHROMA_PATH = "data/chromaDB"
-COLLECTION_NAME = "memory_store"
 
-embeddings = OpenAIEmbeddings()
+# 메모리 임베딩 백엔드
+# - local: RAG에서 이미 로드한 MiniLM 모델을 같이 사용 (네트워크 호출 없음, 기본값)
+# - openai: OpenAIEmbeddings (예전 방식)
+# 벡터 차원이 달라서 백엔드마다 컬렉션을 따로 쓴다 (옮길 때는 memory_maintenance migrate)
+MEMORY_EMBEDDING_BACKEND = os.getenv("MEMORY_EMBEDDING_BACKEND", "local")
+COLLECTION_NAMES = {
+    "local": "memory_store_local",
+    "openai": "memory_store",
+}
+COLLECTION_NAME = COLLECTION_NAMES[MEMORY_EMBEDDING_BACKEND]
+# user_id 없이 저장/조회할 때 쓰는 기본 사용자 (user_id 도입 전 기억도 여기로 옮긴다)
+DEFAULT_USER_ID = "default"
+# 대화 시작 시 시스템 프롬프트에 미리 넣어둘 프로필 기억 최대 개수
+PROFILE_MEMORY_LIMIT = int(os.getenv("PROFILE_MEMORY_LIMIT", "20"))
+# 저장하려는 기억과 코사인 유사도가 이 이상인 기존 기억이 있으면 새로 추가하지 않고 합친다
+MEMORY_DEDUP_SIMILARITY = float(os.getenv("MEMORY_DEDUP_SIMILARITY", "0.92"))
+
+# read_memory 점수 = 유사도 / 중요도 / 최근성 가중합
+# 유사도 순으로 top_k * MEMORY_CANDIDATE_MULTIPLIER 개를 뽑은 뒤 점수로 다시 정렬
+MEMORY_SCORE_WEIGHTS = {"similarity": 0.6, "importance": 0.25, "recency": 0.15}
+MEMORY_CANDIDATE_MULTIPLIER = 4
+# 마지막으로 쓰인 지 이만큼 지나면 최근성 점수가 절반 (profile은 감쇠 없음)
+MEMORY_RECENCY_HALF_LIFE_DAYS = float(os.getenv("MEMORY_RECENCY_HALF_LIFE_DAYS", "14"))
+# read_memory가 꺼낸 기억의 사용 기록을 저장소에 모아서 반영하는 주기 (0이면 조회할 때마다 바로 반영)
+MEMORY_ACCESS_FLUSH_SECONDS = float(os.getenv("MEMORY_ACCESS_FLUSH_SECONDS", "30"))
+
+
+def make_memory_embeddings(backend: str) -> Embeddings:
+    if backend == "local":
+        from src.rag.retriever import embeddings as local_embeddings
+        return local_embeddings
+    if backend == "openai":
+        from langchain_openai import OpenAIEmbeddings
+        return InstrumentedEmbeddings(OpenAIEmbeddings(), backend="openai")
+    raise ValueError(f"Unknown memory embedding backend: {backend}")
+
 
-vector_store = Chroma(
-    collection_name=COLLECTION_NAME,
-    persist_directory=CHROMA_PATH,
-    embedding_function=embeddings
-)
+def open_memory_store(backend: str, embedding_function: Optional[Embeddings] = None) -> Chroma:
+    return Chroma(
+        collection_name=COLLECTION_NAMES[backend],
+        persist_directory=CHROMA_PATH,
+        embedding_function=embedding_function or make_memory_embeddings(backend),
+    )
+
+
+embeddings = make_memory_embeddings(MEMORY_EMBEDDING_BACKEND)
+vector_store = open_memory_store(MEMORY_EMBEDDING_BACKEND, embeddings)
 
+
+# user_id는 LLM에 노출하지 않고 에이전트가 스레드 설정에서 채워 넣는다 (ToolRegistry.call의 injected)
 class WriteMemoryInput(BaseModel):
     content: str = Field(description="저장할 메모리의 내용")
     memory_type: Literal["profile", "episodic", "knowledge"] = Field(description="메모리 타입")
     importance: int = Field(description="중요도 (1~5)")
     tags: List[str] = Field(default=[], description="관련 태그")
+    user_id: SkipJsonSchema[str] = DEFAULT_USER_ID
+
+def profile_version(user_id: str = DEFAULT_USER_ID) -> str:
+    """
+    사용자의 프로필 기억 상태를 나타내는 버전 (스레드 상태의 프로필 캐시 무효화용)
+    - 저장소에서 메타데이터만 읽어 개수 + 가장 최근 created_at/updated_at 으로 만든다
+    - 다른 워커 프로세스, backfill, compact 가 바꾼 것도 그대로 반영된다
+    """
+    with CHROMA_LATENCY.time(collection=COLLECTION_NAME):
+        metadatas = vector_store.get(where=user_filter(user_id, type="profile"), include=["metadatas"])["metadatas"]
+    latest = max(
+        (float(m.get(key) or 0) for m in metadatas if m for key in ("created_at", "updated_at")),
+        default=0.0,
+    )
+    return f"{len(metadatas)}:{latest:.6f}"
+
 
 class ReadMemoryInput(BaseModel):
     query: str = Field(description="기억에서 검색할 키워드나 질문")
     top_k: int = Field(default=3, description="반환할 기억 개수")
+    user_id: SkipJsonSchema[str] = DEFAULT_USER_ID
+
+def user_filter(user_id: str, **conditions) -> Dict:
+    # Chroma where 절: 해당 사용자의 기억만 (조건이 여럿이면 $and)
+    clauses = [{"user_id": user_id}] + [{key: value} for key, value in conditions.items()]
+    return clauses[0] if len(clauses) == 1 else {"$and": clauses}
+
+
+def distance_to_similarity(distance: float, space: str) -> float:
+    # 임베딩은 모두 정규화되어 있으므로 l2 거리(제곱)도 코사인 유사도로 바꿀 수 있다
+    if space == "l2":
+        return 1 - distance / 2
+    return 1 - distance
+
+
+def collection_space(collection) -> str:
+    return (collection.metadata or {}).get("hnsw:space", "l2")
+
+
+def merge_tags(*tag_strings: str) -> str:
+    tags: List[str] = []
+    for tag_string in tag_strings:
+        for tag in (tag_string or "").split(","):
+            tag = tag.strip()
+            if tag and tag not in tags:
+                tags.append(tag)
+    return ", ".join(tags)
+
+
+def find_duplicate(vector: List[float], user_id: str, memory_type: str) -> Optional[Tuple[str, str, Dict]]:
+    """같은 사용자/타입의 기억 중 MEMORY_DEDUP_SIMILARITY 이상으로 가까운 것 (id, document, metadata)"""
+    collection = vector_store._collection
+    with CHROMA_LATENCY.time(collection=COLLECTION_NAME):
+        raw = collection.query(
+            query_embeddings=[vector],
+            n_results=1,
+            where=user_filter(user_id, type=memory_type),
+            include=["documents", "metadatas", "distances"],
+        )
+    if not raw["ids"] or not raw["ids"][0]:
+        return None
+    if distance_to_similarity(raw["distances"][0][0], collection_space(collection)) < MEMORY_DEDUP_SIMILARITY:
+        return None
+    return raw["ids"][0][0], raw["documents"][0][0], raw["metadatas"][0][0] or {}
+
+
+def recency(metadata: Dict, now: float) -> float:
+    if metadata.get("type") == "profile":
+        return 1.0
+    last_used = metadata.get("last_accessed_at") or metadata.get("created_at")
+    if not last_used:
+        return 0.5
+    age_days = max(0.0, now - float(last_used)) / 86400
+    return 0.5 ** (age_days / MEMORY_RECENCY_HALF_LIFE_DAYS)
+
+
+def memory_score(similarity: float, metadata: Dict, now: float) -> float:
+    importance = int(metadata.get("importance") or 0) / 5
+    return (
+        MEMORY_SCORE_WEIGHTS["similarity"] * similarity
+        + MEMORY_SCORE_WEIGHTS["importance"] * importance
+        + MEMORY_SCORE_WEIGHTS["recency"] * recency(metadata, now)
+    )
+
+
+def touch(metadata: Dict, now: float) -> Dict:
+    # 조회/재확인된 기억의 최근 사용 시각과 사용 횟수 갱신
+    return {**metadata, "last_accessed_at": now, "access_count": int(metadata.get("access_count") or 0) + 1}
+
+
+class AccessLog:
+    """
+    read_memory가 꺼낸 기억의 사용 기록(last_accessed_at / access_count) 버퍼
+    - 조회 경로에서는 id별 (마지막 사용 시각, 횟수)만 메모리에 누적하고, 백그라운드 스레드가 주기적으로 한 번에 반영
+    - 반영은 한 번에 하나씩, 저장소의 현재 access_count에 더하는 방식이라 동시 조회끼리 횟수를 덮어쓰지 않는다
+    - 반영 전에 프로세스가 죽으면 마지막 주기의 기록은 사라진다 (최근성 점수/eviction 기준이라 근사치로 충분)
+    """
+
+    def __init__(self, interval: float = MEMORY_ACCESS_FLUSH_SECONDS):
+        self.interval = interval
+        self._pending: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop_event = threading.Event()
+
+    def record(self, ids: List[str], now: float):
+        with self._lock:
+            for memory_id in ids:
+                _, count = self._pending.get(memory_id, (now, 0))
+                self._pending[memory_id] = (now, count + 1)
+            if self.interval > 0 and self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="memory-access-flusher", daemon=True)
+                self._thread.start()
+        if self.interval <= 0:
+            self.flush()
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.flush()
+            except Exception as e:
+                log_event(logger, "memory_access_flush_error", error=str(e))
+
+    def flush(self) -> int:
+        """쌓인 사용 기록을 저장소에 반영하고 반영한 기억 수를 반환 (그 사이 지워진 기억은 건너뜀)"""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending = self._pending, {}
+            if not pending:
+                return 0
+            collection = vector_store._collection
+            current = collection.get(ids=list(pending), include=["metadatas"])
+            if not current["ids"]:
+                return 0
+            # update는 메타데이터를 키 단위로 합치므로 사용 기록 두 필드만 보낸다
+            metadatas = []
+            for memory_id, metadata in zip(current["ids"], current["metadatas"]):
+                metadata = metadata or {}
+                last, count = pending[memory_id]
+                metadatas.append({
+                    "last_accessed_at": max(last, float(metadata.get("last_accessed_at") or 0)),
+                    "access_count": int(metadata.get("access_count") or 0) + count,
+                })
+            collection.update(ids=current["ids"], metadatas=metadatas)
+            return len(current["ids"])
+
+    def stop(self):
+        self._stop_event.set()
+        self.flush()
+
+
+access_log = AccessLog()
+
 
 def write_memory(input: WriteMemoryInput) -> str:
-    print(f"[Tool] write_memory: {input.content[:30]}...")
+    log_event(logger, "tool_call", tool="write_memory", user_id=input.user_id, content=input.content[:30])
+    tags = ", ".join(input.tags)
+    now = time.time()
+    # 한 번만 임베딩해서 중복 검사와 저장에 같이 쓴다
+    vector = embeddings.embed_documents([input.content])[0]
+
+    duplicate = find_duplicate(vector, input.user_id, input.memory_type)
+    if duplicate is not None:
+        # 거의 같은 기억이 이미 있으면 새로 쌓지 않고 그 자리에 합친다
+        # 반대되는 사실도 임베딩이 매우 가깝기 때문에("땅콩 알레르기 있음"/"없음") 문장과 벡터는 새 내용으로 덮어쓴다
+        memory_id, document, metadata = duplicate
+        importance = max(int(metadata.get("importance") or 0), input.importance)
+        merged = {
+            **touch(metadata, now),
+            "importance": importance,
+            "tags": merge_tags(metadata.get("tags"), tags),
+        }
+        update: Dict = {"ids": [memory_id], "metadatas": [merged]}
+        if document != input.content:
+            update.update(documents=[input.content], embeddings=[vector])
+        # 프로필에 보이는 값(문장, 중요도 순서)이 바뀐 경우에만 profile_version이 바뀌도록 updated_at 기록
+        if document != input.content or importance != metadata.get("importance"):
+            merged["updated_at"] = now
+        vector_store._collection.update(**update)
+        MEMORY_WRITES.inc(outcome="merged")
+        return f"Similar memory already exists. Merged. (ID: {memory_id})"
+
     memory_id = str(uuid.uuid4())
-    
     metadata = {
+        "user_id": input.user_id,
         "type": input.memory_type,
         "importance": input.importance,
-        "tags": ", ".join(input.tags)
+        "tags": tags,
+        "created_at": now,
+        "last_accessed_at": now,
+        "access_count": 0
     }
     
-    vector_store.add_texts(
-        texts=[input.content],
+    vector_store._collection.add(
+        ids=[memory_id],
+        documents=[input.content],
         metadatas=[metadata],
-        ids=[memory_id]
+        embeddings=[vector]
     )
+    MEMORY_WRITES.inc(outcome="inserted")
     
     return f"Memory saved. (ID: {memory_id})"
 
+
+def load_profile_memories(user_id: str = DEFAULT_USER_ID, limit: int = PROFILE_MEMORY_LIMIT) -> List[str]:
+    """
+    사용자의 profile 타입 기억을 중요도 순으로 가져온다
+    - 임베딩 없이 메타데이터 필터(get)만 사용하므로 OpenAI 호출이 없다
+    """
+    with CHROMA_LATENCY.time(collection=COLLECTION_NAME):
+        data = vector_store.get(where=user_filter(user_id, type="profile"), include=["documents", "metadatas"])
+    entries = sorted(
+        zip(data["documents"], data["metadatas"]),
+        key=lambda item: -int((item[1] or {}).get("importance") or 0),
+    )
+    return [doc for doc, _ in entries[:limit]]
+
 def read_memory(input: ReadMemoryInput) -> str:
-    print(f"[Tool] read_memory: {input.query}")
-    results = vector_store.similarity_search(input.query, k=input.top_k)
+    log_event(logger, "tool_call", tool="read_memory", user_id=input.user_id, query=input.query)
+    query_vector = embeddings.embed_query(input.query)
+    collection = vector_store._collection
+    # 다른 사용자의 기억은 인덱스 단계에서 걸러서 이 사용자의 기억 안에서만 순위를 매긴다
+    with CHROMA_LATENCY.time(collection=COLLECTION_NAME):
+        raw = collection.query(
+            query_embeddings=[query_vector],
+            n_results=input.top_k * MEMORY_CANDIDATE_MULTIPLIER,
+            where=user_filter(input.user_id),
+            include=["documents", "metadatas", "distances"],
+        )
     
-    if not results:
+    if not raw["ids"] or not raw["ids"][0]:
         return "No related memories found."
+
+    # 유사도만이 아니라 중요도와 최근성까지 반영해서 다시 정렬
+    now = time.time()
+    space = collection_space(collection)
+    candidates = []
+    for memory_id, doc, metadata, distance in zip(raw["ids"][0], raw["documents"][0], raw["metadatas"][0], raw["distances"][0]):
+        metadata = metadata or {}
+        score = memory_score(distance_to_similarity(distance, space), metadata, now)
+        candidates.append((score, memory_id, doc, metadata))
+    top = sorted(candidates, key=lambda c: -c[0])[:input.top_k]
+
+    # 꺼내 쓴 기억은 최근 사용 시각/횟수 갱신 (감쇠와 eviction 기준, 저장소에는 access_log가 모아서 반영)
+    access_log.record([c[1] for c in top], now)
     
     memory_list = []
-    for doc in results:
+    for score, _, doc, metadata in top:
         memory_list.append({
-            "content": doc.page_content,
-            "type": doc.metadata.get("type"),
-            "tags": doc.metadata.get("tags"),
-            "importance": doc.metadata.get("importance")
+            "content": doc,
+            "type": metadata.get("type"),
+            "tags": metadata.get("tags"),
+            "importance": metadata.get("importance"),
+            "score": round(score, 3)
         })
         
-    import json
-    return json.dumps(memory_list, ensure_ascii=False)
\ No newline at end of file
+    return json.dumps(memory_list, ensure_ascii=False)
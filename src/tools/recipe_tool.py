@@ -4,9 +4,12 @@
 """
 기분 + 날씨 기반 레시피 추천
 """
-from typing import Any, Dict
+from typing import Any, Dict, List, Tuple
 from pydantic import BaseModel, Field
 
+from src.observability import get_logger, log_event
+
+logger = get_logger("tools.recipe")
 
 class RecommendRecipeInput(BaseModel):
     """레시피 추천 입력 스키마"""
@@ -14,126 +17,137 @@ class RecommendRecipeInput(BaseModel):
     weather: Dict[str, Any] = Field(..., description="날씨 정보")
 
 
-def recommend_recipe(input: RecommendRecipeInput) -> Dict[str, Any]:
-    print(f"[Tool] recommend_recipe: mood={input.mood}")
-    mood = input.mood.lower()
-    weather = input.weather
-    
-    # 날씨 정보 추출
-    temp_str = weather.get('temperature', '20°C')
-    precipitation = weather.get('precipitation', '없음')
-    
-    # 온도 파싱
-    try:
-        temp = float(temp_str.replace('°C', ''))
-    except:
-        temp = 20
+class RecommendForMoodInput(BaseModel):
+    """날씨 조회 + 기분 기반 추천 + 레시피 검색을 한 번에 하는 파이프라인 입력"""
+    city: str = Field(default="Seoul", description="도시 (Seoul, Busan, Daegu, Incheon, Gwangju, Daejeon, Ulsan, Suwon, Jeju)")
+    mood: str = Field(..., description="사용자의 기분 (예: '우울', '피곤', '행복')")
+
+
+# 레시피 규칙 (모듈 로딩 시 한 번만 생성)
+RECIPE_RULES: Dict[Tuple[str, str], Dict[str, Any]] = {
+    # 추운 날 (15도 미만)
+    ("추움", "행복"): {
+        "name": "따뜻한 핫초코",
+        "ingredients": ["우유", "초콜릿", "마시멜로"],
+        "description": "추운 날 기분 좋을 때 즐기는 달콤한 음료",
+        "time": "10분"
+    },
+    ("추움", "우울"): {
+        "name": "따뜻한 미역국",
+        "ingredients": ["미역", "소고기", "참기름", "마늘"],
+        "description": "마음을 따뜻하게 해주는 국물 요리",
+        "time": "40분"
+    },
+    ("추움", "피곤"): {
+        "name": "보양 삼계탕",
+        "ingredients": ["닭", "인삼", "대추", "마늘", "찹쌀"],
+        "description": "피로 회복에 좋은 보양식",
+        "time": "90분"
+    },
     
-    # 레시피 데이터베이스
-    recipes = {
-        # 추운 날 (15도 미만)
-        ("추움", "행복"): {
-            "name": "따뜻한 핫초코",
-            "ingredients": ["우유", "초콜릿", "마시멜로"],
-            "description": "추운 날 기분 좋을 때 즐기는 달콤한 음료",
-            "time": "10분"
-        },
-        ("추움", "우울"): {
-            "name": "따뜻한 미역국",
-            "ingredients": ["미역", "소고기", "참기름", "마늘"],
-            "description": "마음을 따뜻하게 해주는 국물 요리",
-            "time": "40분"
-        },
-        ("추움", "피곤"): {
-            "name": "보양 삼계탕",
-            "ingredients": ["닭", "인삼", "대추", "마늘", "찹쌀"],
-            "description": "피로 회복에 좋은 보양식",
-            "time": "90분"
-        },
-        
-        # 따뜻한 날 (15-25도)
-        ("따뜻", "행복"): {
-            "name": "신선한 포케볼",
-            "ingredients": ["연어", "아보카도", "밥", "망고"],
-            "description": "상큼한 하와이안 요리",
-            "time": "25분"
-        },
-        ("따뜻", "피곤"): {
-            "name": "영양 비빔밥",
-            "ingredients": ["밥", "시금치", "콩나물", "고사리", "계란"],
-            "description": "영양 가득한 한 그릇",
-            "time": "35분"
-        },
-        
-        # 더운 날 (25도 이상)
-        ("더움", "행복"): {
-            "name": "과일 샐러드",
-            "ingredients": ["수박", "파인애플", "블루베리", "민트"],
-            "description": "시원하고 상큼한 디저트",
-            "time": "15분"
-        },
-        ("더움", "피곤"): {
-            "name": "시원한 콩국수",
-            "ingredients": ["소면", "콩국물", "오이", "토마토"],
-            "description": "더위를 이기는 여름 별미",
-            "time": "20분"
-        },
-        
-        # 비 오는 날
-        ("비", "우울"): {
-            "name": "따뜻한 토마토 수프",
-            "ingredients": ["토마토", "양파", "마늘", "바질", "크림"],
-            "description": "비 오는 날 우울함을 달래는 수프",
-            "time": "35분"
-        },
-        ("비", "default"): {
-            "name": "바삭한 파전",
-            "ingredients": ["부침가루", "파", "해물", "계란"],
-            "description": "비 오는 날의 정석",
-            "time": "25분"
-        }
-    }
+    # 따뜻한 날 (15-25도)
+    ("따뜻", "행복"): {
+        "name": "신선한 포케볼",
+        "ingredients": ["연어", "아보카도", "밥", "망고"],
+        "description": "상큼한 하와이안 요리",
+        "time": "25분"
+    },
+    ("따뜻", "피곤"): {
+        "name": "영양 비빔밥",
+        "ingredients": ["밥", "시금치", "콩나물", "고사리", "계란"],
+        "description": "영양 가득한 한 그릇",
+        "time": "35분"
+    },
     
-    # 날씨 카테고리 결정
-    if "비" in precipitation or "비" in weather.get('sky_status', ''):
-        weather_category = "비"
-    elif temp < 15:
-        weather_category = "추움"
-    elif temp < 25:
-        weather_category = "따뜻"
-    else:
-        weather_category = "더움"
+    # 더운 날 (25도 이상)
+    ("더움", "행복"): {
+        "name": "과일 샐러드",
+        "ingredients": ["수박", "파인애플", "블루베리", "민트"],
+        "description": "시원하고 상큼한 디저트",
+        "time": "15분"
+    },
+    ("더움", "피곤"): {
+        "name": "시원한 콩국수",
+        "ingredients": ["소면", "콩국물", "오이", "토마토"],
+        "description": "더위를 이기는 여름 별미",
+        "time": "20분"
+    },
     
-    # 기분 매칭
-    mood_map = {
-        "행복": ["행복", "기쁨", "즐거움"],
-        "우울": ["우울", "슬픔"],
-        "피곤": ["피곤", "지침"],
-        "스트레스": ["스트레스", "긴장"]
+    # 비 오는 날
+    ("비", "우울"): {
+        "name": "따뜻한 토마토 수프",
+        "ingredients": ["토마토", "양파", "마늘", "바질", "크림"],
+        "description": "비 오는 날 우울함을 달래는 수프",
+        "time": "35분"
+    },
+    ("비", "default"): {
+        "name": "바삭한 파전",
+        "ingredients": ["부침가루", "파", "해물", "계란"],
+        "description": "비 오는 날의 정석",
+        "time": "25분"
     }
-    
-    matched_mood = "default"
-    for key, keywords in mood_map.items():
+}
+
+# 기분 키워드 → 대표 기분
+MOOD_KEYWORDS: Dict[str, List[str]] = {
+    "행복": ["행복", "기쁨", "즐거움"],
+    "우울": ["우울", "슬픔"],
+    "피곤": ["피곤", "지침"],
+    "스트레스": ["스트레스", "긴장"]
+}
+
+DEFAULT_RECIPE = {
+    "name": "건강한 야채 볶음",
+    "ingredients": ["브로콜리", "당근", "파프리카"],
+    "description": "언제나 좋은 건강 요리",
+    "time": "20분"
+}
+
+
+def parse_temperature(temp_str: Any) -> float:
+    # 날씨 도구는 "15C", 예전 형식은 "15°C"
+    try:
+        return float(str(temp_str).replace('°C', '').replace('C', ''))
+    except (TypeError, ValueError):
+        return 20
+
+
+def weather_category(weather: Dict[str, Any]) -> str:
+    temp = parse_temperature(weather.get('temperature', '20°C'))
+    precipitation = str(weather.get('precipitation') or '없음')
+    sky_status = str(weather.get('sky_status') or '')
+
+    if any("비" in v or "rain" in v.lower() for v in (precipitation, sky_status)):
+        return "비"
+    if temp < 15:
+        return "추움"
+    if temp < 25:
+        return "따뜻"
+    return "더움"
+
+
+def match_mood(mood: str) -> str:
+    mood = mood.lower()
+    for key, keywords in MOOD_KEYWORDS.items():
         if any(k in mood for k in keywords):
-            matched_mood = key
-            break
+            return key
+    return "default"
+
+
+def recommend_recipe(input: RecommendRecipeInput) -> Dict[str, Any]:
+    log_event(logger, "tool_call", tool="recommend_recipe", mood=input.mood)
+    category = weather_category(input.weather)
+    matched_mood = match_mood(input.mood)
     
     # 레시피 선택
-    recipe_key = (weather_category, matched_mood)
-    if recipe_key in recipes:
-        recipe = recipes[recipe_key]
-    elif (weather_category, "default") in recipes:
-        recipe = recipes[(weather_category, "default")]
-    else:
-        recipe = {
-            "name": "건강한 야채 볶음",
-            "ingredients": ["브로콜리", "당근", "파프리카"],
-            "description": "언제나 좋은 건강 요리",
-            "time": "20분"
-        }
+    recipe = (
+        RECIPE_RULES.get((category, matched_mood))
+        or RECIPE_RULES.get((category, "default"))
+        or DEFAULT_RECIPE
+    )
     
     return {
         "status": "success",
         "recipe": recipe,
-        "reasoning": f"{weather_category} + {matched_mood} → {recipe['name']}"
+        "reasoning": f"{category} + {matched_mood} → {recipe['name']}"
     }
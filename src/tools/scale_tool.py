@@ -0,0 +1,58 @@
+"""
+레시피 인분 조절
+- recipes.json의 재료 분량 문자열("1~1.5개", "1/2쪽", "2큰술" 등)을 파싱해서 한 번에 배수 적용
+- LLM이 재료마다 calculate를 따로 부르지 않아도 된다
+"""
+import json
+from functools import lru_cache
+from typing import Any, Dict
+
+from pydantic import BaseModel, Field
+
+from src.rag.schema import Recipe
+from src.tools.calculator_tool import format_number, scale_amount
+from src.observability import get_logger, log_event
+
+logger = get_logger("tools.scale")
+
+RECIPE_DATA_PATH = "data/raw/recipes.json"
+
+
+class ScaleRecipeInput(BaseModel):
+    recipe_id: str = Field(description="레시피 ID (search_recipe 결과의 metadata.recipe_id)")
+    servings: float = Field(description="만들고 싶은 인분 수", gt=0)
+    base_servings: float = Field(default=2, description="원래 레시피의 인분 수 (레시피 데이터에 정보가 없어 기본 2인분으로 가정)", gt=0)
+
+
+@lru_cache(maxsize=1)
+def _recipes_by_id() -> Dict[str, Recipe]:
+    with open(RECIPE_DATA_PATH, "r", encoding="utf-8") as f:
+        return {item["recipe_id"]: Recipe(**item) for item in json.load(f)}
+
+
+def scale_recipe(input: ScaleRecipeInput) -> Dict[str, Any]:
+    log_event(logger, "tool_call", tool="scale_recipe", recipe_id=input.recipe_id, servings=input.servings)
+    recipe = _recipes_by_id().get(input.recipe_id)
+    if recipe is None:
+        return {"error": f"Recipe {input.recipe_id} not found"}
+
+    factor = input.servings / input.base_servings
+    ingredients = []
+    unscaled = []
+    for ing in recipe.ingredients:
+        scaled = scale_amount(ing.amount, factor)
+        if scaled is None:
+            # "약간", "적당량" 처럼 숫자가 없는 분량은 그대로 둔다
+            unscaled.append(ing.name)
+            scaled = ing.amount
+        ingredients.append({"name": ing.name, "amount": ing.amount, "scaled_amount": scaled})
+
+    return {
+        "recipe_id": recipe.recipe_id,
+        "name": recipe.name,
+        "base_servings": input.base_servings,
+        "servings": input.servings,
+        "factor": format_number(factor),
+        "ingredients": ingredients,
+        "unscaled": unscaled,
+    }
@@ -0,0 +1,168 @@
+"""
+Google 검색 결과 캐시 + 프로세스 공용 일일 쿼터 관리
+- SQLite 파일 하나를 여러 스레드/워커 프로세스가 같이 사용한다
+- 캐시: 정규화된 질의를 키로 결과 문자열을 TTL 동안 보관 (같은 질문에 쿼터를 다시 쓰지 않음)
+- 쿼터: 토큰 버킷(순간 폭주 제한) + 일일 사용량 카운터(하루 100회 한도)
+"""
+import os
+import re
+import sqlite3
+import time
+import unicodedata
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Optional, Tuple
+
+SEARCH_CACHE_PATH = os.getenv("SEARCH_CACHE_PATH", "data/cache/search_cache.sqlite3")
+SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL_SECONDS", str(24 * 3600)))
+
+# Custom Search API 무료 한도
+GOOGLE_DAILY_QUOTA = int(os.getenv("GOOGLE_DAILY_QUOTA", "100"))
+# 한도가 이만큼 남으면 새 검색을 멈추고 캐시로만 응답 (다른 워커/급한 요청 몫으로 남겨둠)
+GOOGLE_QUOTA_RESERVE = int(os.getenv("GOOGLE_QUOTA_RESERVE", "5"))
+# 토큰 버킷: 순간적으로 쓸 수 있는 최대치와 초당 충전량 (하루 한도를 하루에 고르게 분배)
+GOOGLE_QUOTA_BURST = float(os.getenv("GOOGLE_QUOTA_BURST", "10"))
+GOOGLE_QUOTA_RATE = GOOGLE_DAILY_QUOTA / 86400
+
+try:
+    from zoneinfo import ZoneInfo
+    # Google API 쿼터는 태평양 시간 자정에 초기화된다
+    QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:
+    QUOTA_TZ = timezone.utc
+
+
+def normalize_query(query: str) -> str:
+    # 전각/반각, 대소문자, 공백, 끝의 문장부호 차이는 같은 질의로 취급
+    text = unicodedata.normalize("NFKC", query or "").lower()
+    text = re.sub(r"\s+", " ", text).strip()
+    return text.rstrip("?!.~ ")
+
+
+@contextmanager
+def _connect(path: str):
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    conn = sqlite3.connect(path, timeout=10, isolation_level=None)
+    try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        yield conn
+    finally:
+        conn.close()
+
+
+class SearchCache:
+    def __init__(self, path: str = SEARCH_CACHE_PATH, ttl: float = SEARCH_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        with _connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS search_cache ("
+                " query_key TEXT PRIMARY KEY, result TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+
+    def _lookup(self, query: str) -> Optional[Tuple[str, float]]:
+        with _connect(self.path) as conn:
+            row = conn.execute(
+                "SELECT result, created_at FROM search_cache WHERE query_key = ?", (normalize_query(query),)
+            ).fetchone()
+        return row
+
+    def get(self, query: str) -> Optional[str]:
+        row = self._lookup(query)
+        if row and time.time() - row[1] <= self.ttl:
+            return row[0]
+        return None
+
+    def get_stale(self, query: str) -> Optional[str]:
+        # TTL이 지났더라도 쿼터가 없을 때는 오래된 결과라도 돌려준다
+        row = self._lookup(query)
+        return row[0] if row else None
+
+    def set(self, query: str, result: str):
+        with _connect(self.path) as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO search_cache (query_key, result, created_at) VALUES (?, ?, ?)",
+                (normalize_query(query), result, time.time()),
+            )
+
+    def purge_expired(self) -> int:
+        with _connect(self.path) as conn:
+            cur = conn.execute("DELETE FROM search_cache WHERE created_at < ?", (time.time() - self.ttl,))
+            return cur.rowcount
+
+
+class QuotaManager:
+    """
+    여러 프로세스가 공유하는 API 쿼터
+    - BEGIN IMMEDIATE 트랜잭션으로 읽기-수정-쓰기를 원자적으로 처리
+    """
+
+    def __init__(
+        self,
+        name: str = "google_search",
+        path: str = SEARCH_CACHE_PATH,
+        daily_quota: int = GOOGLE_DAILY_QUOTA,
+        reserve: int = GOOGLE_QUOTA_RESERVE,
+        burst: float = GOOGLE_QUOTA_BURST,
+        rate: float = GOOGLE_QUOTA_RATE,
+    ):
+        self.name = name
+        self.path = path
+        self.daily_quota = daily_quota
+        self.reserve = reserve
+        self.burst = burst
+        self.rate = rate
+        with _connect(self.path) as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS quota ("
+                " name TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL,"
+                " day TEXT NOT NULL, used INTEGER NOT NULL)"
+            )
+
+    def _today(self) -> str:
+        return datetime.now(QUOTA_TZ).strftime("%Y-%m-%d")
+
+    def try_acquire(self) -> bool:
+        now = time.time()
+        today = self._today()
+        with _connect(self.path) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT tokens, updated_at, day, used FROM quota WHERE name = ?", (self.name,)
+                ).fetchone()
+                if row is None:
+                    tokens, used = self.burst, 0
+                else:
+                    tokens = min(self.burst, row[0] + (now - row[1]) * self.rate)
+                    used = row[3] if row[2] == today else 0
+
+                allowed = tokens >= 1 and used < self.daily_quota - self.reserve
+                if allowed:
+                    tokens -= 1
+                    used += 1
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO quota (name, tokens, updated_at, day, used) VALUES (?, ?, ?, ?, ?)",
+                    (self.name, tokens, now, today, used),
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return allowed
+
+    def used_today(self) -> int:
+        with _connect(self.path) as conn:
+            row = conn.execute("SELECT day, used FROM quota WHERE name = ?", (self.name,)).fetchone()
+        if row is None or row[0] != self._today():
+            return 0
+        return row[1]
+
+    def remaining_today(self) -> int:
+        return max(0, self.daily_quota - self.used_today())
+
+
+search_cache = SearchCache()
+google_quota = QuotaManager()
@@ -1,46 +1,92 @@
+import asyncio
 import os
-import requests
+from typing import Any, Dict, Optional
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
+from src.observability import GOOGLE_QUOTA_DENIED, GOOGLE_SEARCH_REQUESTS, get_logger, log_event, record_cache
+from src.tools.http_client import GOOGLE_SEARCH_URL, async_http_get, http_get
+from src.tools.search_cache import google_quota, search_cache
+
 load_dotenv()
 
+logger = get_logger("tools.search")
+
 GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
 GOOGLE_CSE_ID = os.getenv("GOOGLE_CSE_ID")
 
 class SearchInput(BaseModel):
     query: str = Field(description="검색할 키워드 (예: '버터 대체 재료', '오늘 서울 날씨')")
 
-def search_google(input: SearchInput) -> str:
-    print(f"[Tool] search_google: {input.query}")
+# 캐시/쿼터 확인. 바로 돌려줄 응답이 있으면 문자열, API를 호출해야 하면 None
+def _precheck(query: str) -> Optional[str]:
     if not GOOGLE_API_KEY or not GOOGLE_CSE_ID:
         return "Error: Google API key not configured."
 
-    url = "https://www.googleapis.com/customsearch/v1"
-    params = {
+    # 같은 질의는 캐시에서 바로 응답 (쿼터 사용 없음)
+    cached = search_cache.get(query)
+    record_cache("google_search", cached is not None)
+    if cached is not None:
+        return cached
+
+    # 프로세스 공용 쿼터가 부족하면 새 검색 대신 오래된 캐시나 안내 메시지로 대체
+    if not google_quota.try_acquire():
+        GOOGLE_QUOTA_DENIED.inc()
+        log_event(logger, "google_quota_denied", query=query, remaining_today=google_quota.remaining_today())
+        stale = search_cache.get_stale(query)
+        if stale is not None:
+            return f"(이전에 검색한 결과입니다)\n\n{stale}"
+        return "Search unavailable: 오늘의 검색 한도가 거의 소진되었습니다. 검색 없이 알고 있는 정보와 레시피 DB로 답변하세요."
+    return None
+
+def _params(query: str) -> Dict[str, Any]:
+    return {
         "key": GOOGLE_API_KEY,
         "cx": GOOGLE_CSE_ID,
-        "q": input.query,
+        "q": query,
         "num": 3
     }
+
+def _format_results(query: str, data: Dict[str, Any]) -> str:
+    search_results = []
+    if "items" in data:
+        for item in data["items"]:
+            title = item.get("title")
+            snippet = item.get("snippet")
+            
+            search_results.append(f"- {title}: {snippet}")
+    
+    result = "\n\n".join(search_results) if search_results else "No search results found."
+    search_cache.set(query, result)
+    return result
+
+def search_google(input: SearchInput) -> str:
+    log_event(logger, "tool_call", tool="search_google", query=input.query)
+    early = _precheck(input.query)
+    if early is not None:
+        return early
     
     try:
-        response = requests.get(url, params=params)
+        GOOGLE_SEARCH_REQUESTS.inc()
+        response = http_get(GOOGLE_SEARCH_URL, tool="search_google", params=_params(input.query))
         response.raise_for_status()
-        data = response.json()
-        
-        search_results = []
-        if "items" in data:
-            for item in data["items"]:
-                title = item.get("title")
-                snippet = item.get("snippet")
-                
-                search_results.append(f"- {title}: {snippet}")
-        
-        if not search_results:
-            return "No search results found."
-            
-        return "\n\n".join(search_results)
+        return _format_results(input.query, response.json())
+
+    except Exception as e:
+        return f"Search error: {str(e)}"
+
+async def async_search_google(input: SearchInput) -> str:
+    log_event(logger, "tool_call", tool="search_google", query=input.query)
+    # 캐시/쿼터는 SQLite라 짧게 끝나지만 이벤트 루프를 막지 않도록 스레드로 넘긴다
+    early = await asyncio.to_thread(_precheck, input.query)
+    if early is not None:
+        return early
+
+    try:
+        GOOGLE_SEARCH_REQUESTS.inc()
+        response = await async_http_get(GOOGLE_SEARCH_URL, tool="search_google", params=_params(input.query))
+        response.raise_for_status()
+        return await asyncio.to_thread(_format_results, input.query, response.json())
 
     except Exception as e:
-        return f"Search error: {str(e)}"
\ No newline at end of file
+        return f"Search error: {str(e)}"
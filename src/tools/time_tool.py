@@ -1,10 +1,14 @@
 from datetime import datetime
 from pydantic import BaseModel
 
+from src.observability import get_logger, log_event
+
+logger = get_logger("tools.time")
+
 class GetTimeInput(BaseModel):
     pass
 
 def get_current_time(inp: GetTimeInput) -> dict[str, str]:
-    print("[Tool] get_current_time")
+    log_event(logger, "tool_call", tool="get_current_time")
     now = datetime.now()
     return {"current_time": now.strftime("%Y-%m-%d %H:%M:%S")}
\ No newline at end of file
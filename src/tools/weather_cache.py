@@ -0,0 +1,84 @@
+"""
+기상청 초단기실황(getUltraSrtNcst) 결과 캐시
+- 관측값은 매시 정각 기준으로 한 시간에 한 번만 바뀌고, 보통 정시 40분 이후에 제공된다
+- (nx, ny, base_date, base_time) 을 키로 원본 item 목록을 보관해서 같은 시간대의 호출은 API를 타지 않는다
+"""
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    from zoneinfo import ZoneInfo
+    KST = ZoneInfo("Asia/Seoul")
+except Exception:
+    KST = None
+
+# 정시 관측값이 API에 올라오기까지 걸리는 시간 (분)
+PUBLISH_DELAY_MINUTES = int(os.getenv("WEATHER_PUBLISH_DELAY_MINUTES", "40"))
+# 캐시 보관 시간: 현재 시각 + 직전 시각 두 개만 쓰므로 2시간이면 충분
+WEATHER_CACHE_TTL = float(os.getenv("WEATHER_CACHE_TTL_SECONDS", str(2 * 3600)))
+# 아직 발표되지 않은(NO_DATA) 시각은 잠시 동안 다시 조회하지 않는다
+WEATHER_MISSING_TTL = float(os.getenv("WEATHER_MISSING_TTL_SECONDS", "120"))
+
+CacheKey = Tuple[int, int, str, str]
+
+
+def now_kst() -> datetime:
+    return datetime.now(KST) if KST else datetime.now()
+
+
+def candidate_base_times(now: Optional[datetime] = None) -> List[Tuple[str, str]]:
+    """
+    조회할 (base_date, base_time) 후보를 우선순위 순서로 반환
+    - 발표 시각(정시+40분) 전이면 직전 시각부터 조회
+    - 발표가 늦어지는 경우를 대비해 한 시간 전 값도 후보에 포함
+    """
+    now = now or now_kst()
+    latest = now.replace(minute=0, second=0, microsecond=0)
+    if now.minute < PUBLISH_DELAY_MINUTES:
+        latest -= timedelta(hours=1)
+    previous = latest - timedelta(hours=1)
+    return [(t.strftime("%Y%m%d"), t.strftime("%H00")) for t in (latest, previous)]
+
+
+class WeatherCache:
+    def __init__(self, ttl: float = WEATHER_CACHE_TTL, missing_ttl: float = WEATHER_MISSING_TTL):
+        self.ttl = ttl
+        self.missing_ttl = missing_ttl
+        self._entries: Dict[CacheKey, Tuple[float, List[Dict[str, Any]]]] = {}
+        self._missing: Dict[CacheKey, float] = {}
+        self._lock = threading.Lock()
+
+    def get(self, nx: int, ny: int, base_date: str, base_time: str) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get((nx, ny, base_date, base_time))
+        if entry and time.time() - entry[0] <= self.ttl:
+            return entry[1]
+        return None
+
+    def set(self, nx: int, ny: int, base_date: str, base_time: str, items: List[Dict[str, Any]]):
+        now = time.time()
+        with self._lock:
+            self._entries[(nx, ny, base_date, base_time)] = (now, items)
+            # 오래된 시간대 항목 정리
+            expired = [key for key, (stored_at, _) in self._entries.items() if now - stored_at > self.ttl]
+            for key in expired:
+                del self._entries[key]
+
+    def mark_missing(self, nx: int, ny: int, base_date: str, base_time: str):
+        with self._lock:
+            self._missing[(nx, ny, base_date, base_time)] = time.time()
+
+    def is_missing(self, nx: int, ny: int, base_date: str, base_time: str) -> bool:
+        with self._lock:
+            marked_at = self._missing.get((nx, ny, base_date, base_time))
+        return marked_at is not None and time.time() - marked_at <= self.missing_ttl
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+
+weather_cache = WeatherCache()
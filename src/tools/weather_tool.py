@@ -1,11 +1,17 @@
 """
 기상청 초단기실황 API - 현재 날씨 조회
 """
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 from pydantic import BaseModel, Field
-import requests
-from datetime import datetime
+from datetime import timedelta
 import os
+import threading
+
+from src.observability import get_logger, log_event, record_cache
+from src.tools.http_client import KMA_WEATHER_URL, http_get
+from src.tools.weather_cache import PUBLISH_DELAY_MINUTES, candidate_base_times, now_kst, weather_cache
+
+logger = get_logger("tools.weather")
 
 class GetWeatherInput(BaseModel):
     location: str = Field(default="Seoul", description="지역명")
@@ -13,27 +19,28 @@ class GetWeatherInput(BaseModel):
     ny: int = Field(default=127, description="격자 Y 좌표")
 
 
-def get_current_weather(input: GetWeatherInput) -> Dict[str, Any]:
-    print(f"[Tool] get_current_weather: {input.location}")
-    api_key = os.getenv("WEATHER_API_KEY")
-    
-    if not api_key:
-        return {
-            "status": "mock",
-            "location": input.location,
-            "temperature": "15C",
-            "humidity": "60%",
-            "precipitation": "None",
-            "wind_speed": "2.5m/s",
-            "sky_status": "Clear"
-        }
-    
-    now = datetime.now()
-    base_date = now.strftime("%Y%m%d")
-    base_time = now.strftime("%H00")
-    
-    url = "http://apis.data.go.kr/1360000/VilageFcstInfoService_2.0/getUltraSrtNcst"
-    
+class WeatherAPIError(Exception):
+    pass
+
+
+def _fallback(status: str, location: str, **extra) -> Dict[str, Any]:
+    return {
+        "status": status,
+        "location": location,
+        "temperature": "15C",
+        "humidity": "60%",
+        "precipitation": "None",
+        "wind_speed": "2.5m/s",
+        "sky_status": "Clear",
+        **extra
+    }
+
+
+def fetch_observation(nx: int, ny: int, base_date: str, base_time: str, api_key: str) -> Optional[List[Dict[str, Any]]]:
+    """
+    기상청 API 한 번 호출
+    - 해당 시각 자료가 아직 없으면(NO_DATA 등) None
+    """
     params = {
         'serviceKey': api_key,
         'pageNo': 1,
@@ -41,69 +48,92 @@ def get_current_weather(input: GetWeatherInput) -> Dict[str, Any]:
         'dataType': 'JSON',
         'base_date': base_date,
         'base_time': base_time,
-        'nx': input.nx,
-        'ny': input.ny
+        'nx': nx,
+        'ny': ny
     }
-    
-    try:
-        response = requests.get(url, params=params, timeout=10)
-        data = response.json()
+    response = http_get(KMA_WEATHER_URL, tool="weather", params=params)
+    if response.status_code != 200:
+        raise WeatherAPIError(f"HTTP {response.status_code}")
+
+    data = response.json()
+    if data['response']['header'].get('resultCode') != '00':
+        return None
+    return data['response']['body']['items']['item']
+
+
+def load_observation(nx: int, ny: int, api_key: str) -> Optional[Tuple[List[Dict[str, Any]], str, str]]:
+    """
+    캐시 → API 순서로 가장 최근 관측값을 찾는다
+    - 최신 발표 시각 자료가 없으면 한 시간 전 자료로 대체
+    """
+    for base_date, base_time in candidate_base_times():
+        if weather_cache.is_missing(nx, ny, base_date, base_time):
+            continue
+        items = weather_cache.get(nx, ny, base_date, base_time)
+        record_cache("weather", items is not None)
+        if items is None:
+            items = fetch_observation(nx, ny, base_date, base_time, api_key)
+            if items:
+                weather_cache.set(nx, ny, base_date, base_time, items)
+            else:
+                weather_cache.mark_missing(nx, ny, base_date, base_time)
+        if items:
+            return items, base_date, base_time
+    return None
+
+
+def parse_observation(items: List[Dict[str, Any]], location: str) -> Dict[str, Any]:
+    weather_info = {
+        "status": "success",
+        "location": location,
+        "temperature": None,
+        "humidity": None,
+        "precipitation": None,
+        "wind_speed": None,
+        "sky_status": "Clear"
+    }
+    for item in items:
+        category = item.get('category')
+        value = item.get('obsrValue')
         
-        if response.status_code == 200:
-            items = data['response']['body']['items']['item']
-            
-            weather_info = {
-                "status": "success",
-                "location": input.location,
-                "temperature": None,
-                "humidity": None,
-                "precipitation": None,
-                "wind_speed": None,
-                "sky_status": "Clear"
-            }
-            for item in items:
-                category = item.get('category')
-                value = item.get('obsrValue')
-                
-                if category == 'T1H':
-                    weather_info['temperature'] = f"{value}C"
-                elif category == 'REH':
-                    weather_info['humidity'] = f"{value}%"
-                elif category == 'RN1':
-                    weather_info['precipitation'] = "Rain" if float(value) > 0 else "None"
-                elif category == 'WSD':
-                    weather_info['wind_speed'] = f"{value}m/s"
-                elif category == 'PTY':
-                    if value == '1':
-                        weather_info['sky_status'] = "Rain"
-                    elif value == '2':
-                        weather_info['sky_status'] = "Rain/Snow"
-                    elif value == '3':
-                        weather_info['sky_status'] = "Snow"
-            
-            return weather_info
-        else:
-            return {
-                "status": "error_fallback",
-                "location": input.location,
-                "temperature": "15C",
-                "humidity": "60%",
-                "precipitation": "None",
-                "wind_speed": "2.5m/s",
-                "sky_status": "Clear"
-            }
+        if category == 'T1H':
+            weather_info['temperature'] = f"{value}C"
+        elif category == 'REH':
+            weather_info['humidity'] = f"{value}%"
+        elif category == 'RN1':
+            weather_info['precipitation'] = "Rain" if float(value) > 0 else "None"
+        elif category == 'WSD':
+            weather_info['wind_speed'] = f"{value}m/s"
+        elif category == 'PTY':
+            if value == '1':
+                weather_info['sky_status'] = "Rain"
+            elif value == '2':
+                weather_info['sky_status'] = "Rain/Snow"
+            elif value == '3':
+                weather_info['sky_status'] = "Snow"
+    
+    return weather_info
+
+
+def get_current_weather(input: GetWeatherInput) -> Dict[str, Any]:
+    log_event(logger, "tool_call", tool="get_current_weather", location=input.location)
+    api_key = os.getenv("WEATHER_API_KEY")
+    
+    if not api_key:
+        return _fallback("mock", input.location)
     
+    try:
+        observation = load_observation(input.nx, input.ny, api_key)
     except Exception as e:
-        return {
-            "status": "exception_fallback",
-            "location": input.location,
-            "temperature": "15C",
-            "humidity": "60%",
-            "precipitation": "None",
-            "wind_speed": "2.5m/s",
-            "sky_status": "Clear",
-            "error": str(e)
-        }
+        return _fallback("exception_fallback", input.location, error=str(e))
+
+    if observation is None:
+        return _fallback("error_fallback", input.location)
+
+    items, base_date, base_time = observation
+    weather_info = parse_observation(items, input.location)
+    weather_info["observed_at"] = f"{base_date} {base_time}"
+    return weather_info
 
 
 LOCATION_COORDS = {
@@ -126,3 +156,62 @@ def get_weather_by_city(city: str) -> Dict[str, Any]:
         nx=coords[0],
         ny=coords[1]
     ))
+
+
+
+# 매시 발표 직후(정시 + 발표 지연 + 여유) 전 지역 관측값을 미리 받아둔다
+PREFETCH_MARGIN_MINUTES = int(os.getenv("WEATHER_PREFETCH_MARGIN_MINUTES", "3"))
+
+
+def prefetch_all_locations() -> int:
+    api_key = os.getenv("WEATHER_API_KEY")
+    if not api_key:
+        return 0
+
+    warmed = 0
+    for city, (nx, ny) in LOCATION_COORDS.items():
+        try:
+            if load_observation(nx, ny, api_key):
+                warmed += 1
+        except Exception as e:
+            log_event(logger, "weather_prefetch_error", city=city, error=str(e))
+    log_event(logger, "weather_prefetched", locations=warmed, cached_entries=len(weather_cache))
+    return warmed
+
+
+def seconds_until_next_prefetch() -> float:
+    now = now_kst()
+    target = now.replace(minute=0, second=0, microsecond=0) + timedelta(minutes=PUBLISH_DELAY_MINUTES + PREFETCH_MARGIN_MINUTES)
+    if target <= now:
+        target += timedelta(hours=1)
+    return (target - now).total_seconds()
+
+
+class WeatherPrefetcher(threading.Thread):
+    def __init__(self):
+        super().__init__(name="weather-prefetcher", daemon=True)
+        self._stop_event = threading.Event()
+
+    def run(self):
+        prefetch_all_locations()
+        while not self._stop_event.wait(seconds_until_next_prefetch()):
+            prefetch_all_locations()
+
+    def stop(self):
+        self._stop_event.set()
+
+
+_prefetcher: Optional[WeatherPrefetcher] = None
+_prefetcher_lock = threading.Lock()
+
+
+def start_weather_prefetcher() -> Optional[WeatherPrefetcher]:
+    # API 키가 없거나 WEATHER_PREFETCH=0 이면 시작하지 않음 (프로세스당 하나)
+    global _prefetcher
+    if not os.getenv("WEATHER_API_KEY") or os.getenv("WEATHER_PREFETCH", "1") == "0":
+        return None
+    with _prefetcher_lock:
+        if _prefetcher is None:
+            _prefetcher = WeatherPrefetcher()
+            _prefetcher.start()
+        return _prefetcher